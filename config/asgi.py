@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# sob ASGI as páginas de leitura usam as views assíncronas
+os.environ.setdefault("DIARIO_VIEWS_ASYNC", "1")
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # primeiro, para medir todo o resto; só é usado com DIARIO_INSTRUMENTACAO
+    "diario.instrumentacao.InstrumentacaoMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -52,6 +55,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "diario.replicas.janela_primario_middleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -78,13 +82,121 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+def opcoes_sqlite():
+    """Opções de conexão do SQLite, ajustáveis por variáveis de ambiente.
+
+    Os PRAGMAs rodam a cada nova conexão. O WAL deixa leitores e um escritor
+    trabalharem ao mesmo tempo, e o modo de transação IMMEDIATE pega a trava
+    de escrita já no BEGIN, então escritores concorrentes esperam o
+    `busy_timeout` em vez de falharem com "database is locked".
+    """
+    pragmas = {
+        "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": os.environ.get("SQLITE_BUSY_TIMEOUT", "5000"),  # ms
+        "cache_size": os.environ.get("SQLITE_CACHE_SIZE", "-20000"),  # KiB se < 0
+        "mmap_size": os.environ.get("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)),
+        "temp_store": os.environ.get("SQLITE_TEMP_STORE", "MEMORY"),
+    }
+    return {
+        "init_command": ";".join(f"PRAGMA {nome}={valor}" for nome, valor in pragmas.items()),
+        "transaction_mode": os.environ.get("SQLITE_TRANSACTION_MODE", "IMMEDIATE"),
+    }
+
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": opcoes_sqlite(),
+        # conexões persistentes evitam reabrir o arquivo e refazer os PRAGMAs
+        "CONN_MAX_AGE": int(os.environ.get("DJANGO_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.environ.get("DJANGO_CONN_HEALTH_CHECKS", "1") == "1",
+    }
+}
+
+# Réplicas de leitura: caminhos de arquivos SQLite separados por vírgula, ex.:
+# SQLITE_REPLICAS=/srv/diario/replica1.sqlite3,/srv/diario/replica2.sqlite3.
+# Elas precisam ser mantidas em dia por fora (ex.: litestream ou `.backup`).
+for numero, caminho in enumerate(
+    filter(None, os.environ.get("SQLITE_REPLICAS", "").split(",")), start=1
+):
+    DATABASES[f"replica{numero}"] = {**DATABASES["default"], "NAME": caminho.strip()}
+
+DIARIO_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
+DATABASE_ROUTERS = ["diario.replicas.RoteadorReplicas"]
+
+# Segundos que alguém continua lendo do principal depois de escrever algo
+DIARIO_JANELA_PRIMARIO = int(os.environ.get("DIARIO_JANELA_PRIMARIO", 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# LocMem por padrão; para compartilhar entre processos basta apontar para
+# outro backend, ex.: DJANGO_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# e DJANGO_CACHE_LOCATION=/var/tmp/diario-cache
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "diario"),
     }
 }
 
+# Cache dos fragmentos HTML das listas (veja `diario/cache.py`)
+DIARIO_CACHE_ALIAS = "default"
+
+DIARIO_CACHE_FRAGMENTOS = os.environ.get("DIARIO_CACHE_FRAGMENTOS", "1") == "1"
+
+DIARIO_CACHE_TIMEOUT = int(os.environ.get("DIARIO_CACHE_TIMEOUT", 600))
+
+# Onde ficam as sessões: "db" (uma consulta por requisição), "cached_db" (lidas
+# do cache, gravadas também no banco) ou "cookie" (assinadas, sem servidor;
+# não dá para encerrar uma sessão específica pelo servidor)
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cookie": "django.contrib.sessions.backends.signed_cookies",
+}[os.environ.get("DIARIO_SESSOES", "cached_db")]
+
+# Guarda o usuário logado no cache por alguns segundos (veja
+# `diario/autenticacao.py`); 0 desliga. Só é seguro com um cache compartilhado
+# entre os processos, então o padrão é 0 com os caches locais
+AUTHENTICATION_BACKENDS = ["diario.autenticacao.BackendUsuarioEmCache"]
+
+_cache_local = CACHES[DIARIO_CACHE_ALIAS]["BACKEND"].endswith(
+    (".LocMemCache", ".DummyCache")
+)
+
+DIARIO_CACHE_USUARIO_TIMEOUT = int(
+    os.environ.get("DIARIO_CACHE_USUARIO_TIMEOUT", 0 if _cache_local else 60)
+)
+
+# Views de leitura com ORM assíncrono (veja `diario/views_async.py`); ligado
+# por padrão em `config/asgi.py`
+DIARIO_VIEWS_ASYNC = os.environ.get("DIARIO_VIEWS_ASYNC", "0") == "1"
+
+# Medição por requisição (veja `diario/instrumentacao.py`): cabeçalho
+# Server-Timing, log de requisições e consultas lentas e histogramas por rota
+DIARIO_INSTRUMENTACAO = os.environ.get("DIARIO_INSTRUMENTACAO", "0") == "1"
+
+DIARIO_LIMITE_REQUISICAO_LENTA_MS = int(
+    os.environ.get("DIARIO_LIMITE_REQUISICAO_LENTA_MS", 500)
+)
+
+DIARIO_LIMITE_CONSULTA_LENTA_MS = int(
+    os.environ.get("DIARIO_LIMITE_CONSULTA_LENTA_MS", 100)
+)
+
+# Os histogramas por rota são somados em memória e gravados a cada tantas
+# requisições ou segundos, o que vier antes
+DIARIO_METRICAS_LOTE = int(os.environ.get("DIARIO_METRICAS_LOTE", 100))
+
+DIARIO_METRICAS_INTERVALO_S = int(os.environ.get("DIARIO_METRICAS_INTERVALO_S", 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -122,6 +234,33 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+STATIC_ROOT = os.environ.get("DJANGO_STATIC_ROOT", BASE_DIR / "staticfiles")
+
+# nomes com o hash do conteúdo e versões .gz/.br gravadas pelo `collectstatic`
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "diario.estaticos.ArmazenamentoEstaticos"},
+}
+
+# Serve STATIC_ROOT pelo próprio Django (veja `diario.estaticos.servir`), para
+# quando não há um servidor web na frente cuidando disso
+DIARIO_SERVIR_ESTATICOS = os.environ.get("DIARIO_SERVIR_ESTATICOS", "1") == "1"
+
+# Acima disso, as listas sem filtro do admin estimam o total em vez de contar
+# as linhas (veja `diario.admin.PaginadorEstimado`)
+DIARIO_ADMIN_LIMITE_CONTAGEM = int(
+    os.environ.get("DIARIO_ADMIN_LIMITE_CONTAGEM", 10000)
+)
+
+# Grava o texto das entradas comprimido ("zlib" ou "zstd", que precisa do
+# pacote `zstandard`) a partir de um tamanho em bytes; vazio desliga (veja
+# `diario.compressao`). Depois de mudar, rode `comprimir_entradas`
+DIARIO_COMPRESSAO = os.environ.get("DIARIO_COMPRESSAO", "")
+DIARIO_COMPRESSAO_MINIMO = int(os.environ.get("DIARIO_COMPRESSAO_MINIMO", 1024))
+
+# Caracteres aceitos no texto de uma entrada pelos formulários do site
+DIARIO_TAMANHO_MAXIMO_ENTRADA = int(os.environ.get("DIARIO_TAMANHO_MAXIMO_ENTRADA", 50000))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
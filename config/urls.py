@@ -15,17 +15,60 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.views import PasswordChangeView, PasswordChangeDoneView
-from django.urls import path, include
+from django.urls import path, include, re_path
 
-from diario import views
+from diario import api, estaticos, views, views_async
+
+# páginas de leitura: versões com ORM assíncrono quando servidas via ASGI
+leitura = views_async if settings.DIARIO_VIEWS_ASYNC else views
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("django.contrib.auth.urls")),
     path("", views.IndexView.as_view(), name="index"),
-    path("topicos/", views.TopicoList.as_view(), name="topicos"),
+    path("topicos/", leitura.TopicoList.as_view(), name="topicos"),
+    path("busca/", views.BuscaEntradas.as_view(), name="busca"),
+    path("atividades/", views.Atividades.as_view(), name="atividades"),
+    path(
+        "atividades/seguidas",
+        views.AtividadesSeguidas.as_view(),
+        name="atividades_seguidas"
+    ),
+    path("api/topicos", api.ApiTopicos.as_view(), name="api_topicos"),
+    path(
+        "api/topicos/<slug:topico>/entradas",
+        api.ApiEntradasTopico.as_view(),
+        name="api_entradas_topico"
+    ),
+    path("api/entradas/<int:pk>", api.ApiEntrada.as_view(), name="api_entrada"),
+    path(
+        "api/usuarios/<str:username>",
+        api.ApiUsuario.as_view(),
+        name="api_usuario"
+    ),
+    path(
+        "api/usuarios/<str:username>/entradas",
+        api.ApiEntradasUsuario.as_view(),
+        name="api_entradas_usuario"
+    ),
+    path(
+        "monitoramento/cache",
+        views.EstatisticasCache.as_view(),
+        name="estatisticas_cache"
+    ),
+    path(
+        "monitoramento/rotas",
+        views.EstatisticasRotas.as_view(),
+        name="estatisticas_rotas"
+    ),
+    path(
+        "monitoramento/tarefas",
+        views.EstatisticasTarefas.as_view(),
+        name="estatisticas_tarefas"
+    ),
     path(
         "criar-conta/",
         views.UsuarioCreate.as_view(),
@@ -38,7 +81,7 @@ urlpatterns = [
     ),
     path(
         "accounts/perfil/<str:username>",
-        views.Perfil.as_view(),
+        leitura.Perfil.as_view(),
         name="ver_perfil"
     ),
     path(
@@ -52,7 +95,17 @@ urlpatterns = [
         name="alterar_senha"
     ),
     path(
-        "entradas/<slug:topico>", views.EntradaList.as_view(), name="entradas"
+        "entradas/<slug:topico>", leitura.EntradaList.as_view(), name="entradas"
+    ),
+    path(
+        "entradas/<slug:topico>/busca",
+        views.BuscaEntradas.as_view(),
+        name="busca_topico"
+    ),
+    path(
+        "entradas/<slug:topico>/seguir",
+        views.SeguirTopico.as_view(),
+        name="seguir_topico"
     ),
     path(
         "entradas/<slug:topico>/criar",
@@ -61,7 +114,7 @@ urlpatterns = [
     ),
     path(
         "entradas/<slug:topico>/ver/<int:pk>",
-        views.EntradaDetail.as_view(),
+        leitura.EntradaDetail.as_view(),
         name="ver_entrada"
     ),
     path(
@@ -75,3 +128,12 @@ urlpatterns = [
         name="apagar_entrada"
     ),
 ]
+
+if settings.DIARIO_SERVIR_ESTATICOS:
+    urlpatterns.append(
+        re_path(
+            rf"^{settings.STATIC_URL.lstrip('/')}(?P<caminho>.+)$",
+            estaticos.servir,
+            name="estaticos"
+        )
+    )
@@ -1,24 +1,131 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db.models import Max, Min, QuerySet
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from django.utils.text import Truncator
 
-from .models import Entrada, Topico, Usuario
+from .busca import TABELA_FTS, preparar_consulta
+from .models import Entrada, Remocao, Tarefa, Topico, Usuario
+from .remocao import marcar_topico, marcar_usuario
 
 # Register your models here.
 
+TAMANHO_PREVIA_ADMIN = 80
 
-class TopicoAdmin(admin.ModelAdmin):
+
+class PaginadorEstimado(Paginator):
+    """Paginador que não conta as linhas das listas sem filtro em tabelas grandes.
+
+    O total vem do maior e do menor `id` (duas buscas no índice da chave
+    primária) e só é usado acima de `DIARIO_ADMIN_LIMITE_CONTAGEM`; abaixo
+    disso, ou com algum filtro ou busca, conta de verdade. Como `id`s de linhas
+    apagadas também entram, a estimativa pode passar um pouco do total e as
+    últimas páginas podem vir incompletas.
+    """
+
+    @cached_property
+    def count(self):
+        consulta = self.object_list
+        if isinstance(consulta, QuerySet) and not consulta.query.where:
+            consulta = consulta.order_by()
+            maior = consulta.aggregate(maior=Max("pk"))["maior"]
+            if maior is not None:
+                estimativa = maior - consulta.aggregate(menor=Min("pk"))["menor"] + 1
+                if estimativa > settings.DIARIO_ADMIN_LIMITE_CONTAGEM:
+                    return estimativa
+        return super().count
+
+
+class RemocaoEmSegundoPlanoMixin:
+    """Apagar só marca o objeto; as entradas saem depois, por `purgar_removidos`"""
+
+    marcar = None
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(apagado_em__isnull=True)
+
+    def get_deleted_objects(self, objs, request):
+        # a página de confirmação do Django listaria cada entrada que seria
+        # apagada, carregando todas elas
+        objetos = list(objs)
+        quantidade = {self.model._meta.verbose_name_plural: len(objetos)}
+        return [str(objeto) for objeto in objetos], quantidade, set(), []
+
+    def delete_model(self, request, obj):
+        type(self).marcar(obj)
+
+    def delete_queryset(self, request, queryset):
+        for objeto in queryset:
+            type(self).marcar(objeto)
+
+
+class TopicoAdmin(RemocaoEmSegundoPlanoMixin, admin.ModelAdmin):
     model = Topico
+    marcar = marcar_topico
     fields = ["topico", "slug"]
-    list_display = ["topico", "data_pub", "slug"]
+    list_display = ["topico", "data_pub", "slug", "num_entradas"]
     list_filter = ["data_pub"]
+    ordering = ["-data_pub"]
+    search_fields = ["topico", "slug"]
+    show_full_result_count = False
     prepopulated_fields = {"slug": ["topico"]}
 
 
 class EntradaAdmin(admin.ModelAdmin):
     model = Entrada
     fields = ["topico", "texto_entrada", "usuario"]
-    list_display = ["texto_entrada", "topico", "data_pub", "data_edicao", "usuario"]
-    list_filter = ["topico", "data_pub", "data_edicao"]
+    # com milhões de entradas, selects com todos os tópicos e usuários não
+    # cabem na página
+    autocomplete_fields = ["topico", "usuario"]
+    list_display = ["resumo", "link_topico", "data_pub", "data_edicao", "link_usuario"]
+    list_select_related = ["topico", "usuario"]
+    # um filtro por tópico listaria todos eles; clicar no tópico ou no usuário
+    # de uma linha filtra por ele. `data_pub` usa o `entrada_data_idx`
+    list_filter = ["data_pub"]
+    ordering = ["-data_pub", "-id"]
+    # ordenar por outra coluna ordenaria a tabela inteira
+    sortable_by = ["data_pub"]
+    search_fields = ["texto_entrada"]
+    search_help_text = "Busca pelas palavras inteiras, no índice textual."
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_queryset(self, request):
+        # a lista só mostra a prévia; no formulário o texto é lido quando usado
+        return super().get_queryset(request).defer("texto_entrada", "texto_html")
+
+    def get_search_results(self, request, queryset, search_term):
+        # `icontains` em `texto_entrada` leria a tabela inteira
+        consulta = preparar_consulta(search_term)
+        if not consulta:
+            return queryset, False
+        encontradas = RawSQL(
+            f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s", [consulta]
+        )
+        return queryset.filter(pk__in=encontradas), False
+
+    @admin.display(description="prévia")
+    def resumo(self, obj):
+        return Truncator(obj.previa).chars(TAMANHO_PREVIA_ADMIN)
+
+    def _link_filtrando(self, campo, objeto):
+        url = reverse("admin:diario_entrada_changelist")
+        return format_html('<a href="{}?{}={}">{}</a>', url, campo, objeto.pk, objeto)
+
+    @admin.display(description="tópico")
+    def link_topico(self, obj):
+        return self._link_filtrando("topico__id__exact", obj.topico)
+
+    @admin.display(description="usuário")
+    def link_usuario(self, obj):
+        return self._link_filtrando("usuario__id__exact", obj.usuario)
 
     def save_model(self, request, obj, form, change):
         if not obj.usuario and request.user.is_authenticated:
@@ -26,6 +133,46 @@ class EntradaAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
-admin.site.register(Usuario, UserAdmin)
+class UsuarioAdmin(RemocaoEmSegundoPlanoMixin, UserAdmin):
+    marcar = marcar_usuario
+    show_full_result_count = False
+
+
+class RemocaoAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "apagadas", "total", "criada_em", "concluida_em"]
+    list_filter = ["tipo", "concluida_em"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "estado", "tentativas", "executar_em", "trabalhador"]
+    list_filter = ["estado", "nome"]
+    readonly_fields = [
+        campo.name for campo in Tarefa._meta.fields if campo.name != "executar_em"
+    ]
+    actions = ["tentar_de_novo"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Tentar de novo as tarefas selecionadas")
+    def tentar_de_novo(self, request, queryset):
+        # a chave de uma tarefa pendente não pode se repetir
+        pendentes = Tarefa.objects.filter(estado=Tarefa.PENDENTE).exclude(chave="")
+        queryset.filter(estado=Tarefa.FALHOU).exclude(
+            chave__in=pendentes.values("chave")
+        ).update(
+            estado=Tarefa.PENDENTE, tentativas=0, executar_em=timezone.now()
+        )
+
+
+admin.site.register(Usuario, UsuarioAdmin)
 admin.site.register(Topico, TopicoAdmin)
 admin.site.register(Entrada, EntradaAdmin)
+admin.site.register(Remocao, RemocaoAdmin)
+admin.site.register(Tarefa, TarefaAdmin)
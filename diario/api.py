@@ -0,0 +1,307 @@
+"""API JSON somente leitura para tópicos, entradas e perfis.
+
+As consultas usam `values_list()`, sem instanciar modelos, e as listas são
+paginadas por cursor em `(data_pub, id)`, como as páginas HTML. O parâmetro
+`fields=` escolhe os campos de cada objeto e `limite=` o tamanho da página.
+As listas são enviadas em fluxo, objeto por objeto, e todas as respostas têm
+ETag, então quem consulta a API periodicamente pode usar `If-None-Match`.
+"""
+
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.db.models import Count, F, Max, Q, Sum
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views import generic
+
+from .models import Entrada, Topico, Usuario
+from .paginacao import codificar_cursor, decodificar_cursor
+from .views import GetCondicionalMixin, LeituraEmReplicaMixin
+
+CAMPOS_TOPICO = {
+    "id": "pk",
+    "slug": "slug",
+    "topico": "topico",
+    "data_pub": "data_pub",
+    "num_entradas": "num_entradas",
+}
+
+CAMPOS_ENTRADA = {
+    "id": "pk",
+    "topico": "topico__slug",
+    "usuario": "usuario__username",
+    "texto": "texto_entrada",
+    "previa": "previa",
+    "data_pub": "data_pub",
+    "data_edicao": "data_edicao",
+}
+
+
+class ErroApi(Exception):
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _json(dados) -> str:
+    return json.dumps(dados, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+class ApiView(LeituraEmReplicaMixin, GetCondicionalMixin, generic.View):
+    """Base das views da API: campos, erros em JSON e GET condicional"""
+
+    campos = {}
+    http_method_names = ["get", "head", "options"]
+    # as respostas não dependem de quem pede; sem ler a sessão, o
+    # `SessionMiddleware` não acrescenta `Vary: Cookie`
+    resolver_usuario = False
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except Http404 as erro:
+            return JsonResponse({"erro": str(erro) or "Não encontrado."}, status=404)
+        except ErroApi as erro:
+            return JsonResponse({"erro": str(erro)}, status=erro.status)
+
+    def get_campos(self) -> list[str]:
+        pedidos = self.request.GET.get("fields")
+        if not pedidos:
+            return list(self.campos)
+        campos = [campo.strip() for campo in pedidos.split(",") if campo.strip()]
+        desconhecidos = [campo for campo in campos if campo not in self.campos]
+        if desconhecidos:
+            raise ErroApi(
+                f"Campos desconhecidos: {', '.join(desconhecidos)}. "
+                f"Disponíveis: {', '.join(self.campos)}."
+            )
+        return campos
+
+    def get_etag(self, ultima_edicao, total):
+        # as respostas não têm nada do usuário, então o ETag vale para todos
+        partes = [
+            ultima_edicao.isoformat() if ultima_edicao else "",
+            str(total),
+            self.request.GET.urlencode(),
+        ]
+        resumo = hashlib.md5("|".join(partes).encode(), usedforsecurity=False)
+        return quote_etag(resumo.hexdigest())
+
+    def completar_cabecalhos(self, resposta):
+        resposta.headers.setdefault("ETag", self.etag)
+        if self.last_modified is not None:
+            resposta.headers.setdefault("Last-Modified", http_date(self.last_modified))
+        patch_cache_control(resposta, no_cache=True, public=True)
+        return resposta
+
+    def get(self, request, *args, **kwargs):
+        self.campos_pedidos = self.get_campos()
+        resposta = self.verificar_condicional(*self.get_validadores())
+        if resposta is None:
+            resposta = self.responder()
+        return self.completar_cabecalhos(resposta)
+
+    def responder(self):
+        raise NotImplementedError
+
+
+class ApiObjeto(ApiView):
+    """Um único objeto, lido junto com os validadores em uma consulta"""
+
+    campo_edicao = "data_edicao"
+
+    def get_linha(self):
+        raise NotImplementedError
+
+    def get_validadores(self):
+        self.linha = self.get_linha()
+        return self.linha[self.campo_edicao], 1
+
+    def responder(self):
+        return JsonResponse(
+            {campo: self.linha[campo] for campo in self.campos_pedidos},
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+
+class ApiLista(ApiView):
+    """Lista paginada por cursor, do mais recente para o mais antigo"""
+
+    limite_padrao = 50
+    limite_maximo = 1000
+    tamanho_bloco = 200
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        self.limite = self.get_limite()
+        return super().get(request, *args, **kwargs)
+
+    def get_limite(self) -> int:
+        try:
+            limite = int(self.request.GET.get("limite", self.limite_padrao))
+        except ValueError:
+            raise ErroApi("`limite` deve ser um número inteiro.")
+        if not 1 <= limite <= self.limite_maximo:
+            raise ErroApi(f"`limite` deve estar entre 1 e {self.limite_maximo}.")
+        return limite
+
+    def get_linhas(self, limite):
+        queryset = self.get_queryset()
+        cursor = self.request.GET.get("cursor")
+        if cursor:
+            data, pk = decodificar_cursor(cursor)
+            queryset = queryset.filter(
+                Q(data_pub__lt=data) | Q(data_pub=data, pk__lt=pk)
+            )
+        caminhos = [self.campos[campo] for campo in self.campos_pedidos]
+        # o banco é escolhido agora porque a lista só é lida durante o envio,
+        # depois que a view (e o contexto da réplica) já terminou
+        banco = router.db_for_read(queryset.model) or queryset.db
+        return (
+            queryset.using(banco)
+            .order_by("-data_pub", "-pk")
+            .values_list("data_pub", "pk", *caminhos)[: limite + 1]
+            .iterator(chunk_size=self.tamanho_bloco)
+        )
+
+    def url_proxima(self, data_pub, pk):
+        parametros = self.request.GET.copy()
+        parametros["cursor"] = codificar_cursor(data_pub, pk)
+        return self.request.build_absolute_uri(f"?{parametros.urlencode()}")
+
+    def gerar(self, linhas, limite):
+        yield '{"resultados": ['
+        ultima = None
+        mais = False
+        for numero, (data_pub, pk, *valores) in enumerate(linhas):
+            if numero == limite:
+                # a linha a mais só diz que existe outra página
+                mais = True
+                break
+            separador = "," if numero else ""
+            yield separador + _json(dict(zip(self.campos_pedidos, valores)))
+            ultima = (data_pub, pk)
+        proxima = self.url_proxima(*ultima) if mais else None
+        yield f'], "proximo": {_json(proxima)}}}'
+
+    def responder(self):
+        linhas = self.get_linhas(self.limite)
+        return StreamingHttpResponse(
+            self.gerar(linhas, self.limite), content_type="application/json"
+        )
+
+
+class ApiTopicos(ApiLista):
+    campos = CAMPOS_TOPICO
+
+    def get_validadores(self):
+        dados = Topico.objects.visiveis().aggregate(
+            ultimo=Max("data_edicao"),
+            total=Count("pk"),
+            entradas=Sum("num_entradas"),
+            # mover uma entrada de tópico não muda a soma dos contadores, mas
+            # muda esta, ponderada pelo id, pela diferença entre os dois ids
+            ponderada=Sum(F("num_entradas") * F("pk")),
+        )
+        # sem Last-Modified: uma entrada nova muda `num_entradas` de um tópico
+        # sem mudar a data de nenhum, e só o ETag percebe isso
+        return None, "|".join(map(str, dados.values()))
+
+    def get_queryset(self):
+        return Topico.objects.visiveis()
+
+
+class ApiEntradasTopico(ApiLista):
+    campos = CAMPOS_ENTRADA
+
+    def get_topico(self):
+        if not hasattr(self, "topico"):
+            self.topico = get_object_or_404(
+                Topico.objects.visiveis(), slug=self.kwargs["topico"]
+            )
+        return self.topico
+
+    def get_validadores(self):
+        dados = self.get_topico().entrada_set.visiveis().aggregate(
+            ultima_edicao=Max("data_edicao"), total=Count("pk")
+        )
+        return dados["ultima_edicao"], dados["total"]
+
+    def get_queryset(self):
+        return Entrada.objects.visiveis().filter(topico=self.get_topico())
+
+
+class ApiEntradasUsuario(ApiLista):
+    campos = CAMPOS_ENTRADA
+
+    def get_usuario(self):
+        if not hasattr(self, "usuario"):
+            self.usuario = get_object_or_404(
+                Usuario.objects.visiveis(), username=self.kwargs["username"]
+            )
+        return self.usuario
+
+    def get_validadores(self):
+        dados = self.get_usuario().entradas.visiveis().aggregate(
+            ultima_edicao=Max("data_edicao"), total=Count("pk")
+        )
+        return dados["ultima_edicao"], dados["total"]
+
+    def get_queryset(self):
+        return Entrada.objects.visiveis().filter(usuario=self.get_usuario())
+
+
+class ApiEntrada(ApiObjeto):
+    campos = CAMPOS_ENTRADA
+
+    def get_linha(self):
+        # só os campos pedidos e a data de edição, para os validadores; sem
+        # `texto`, por exemplo, o texto inteiro não é lido
+        campos = list(dict.fromkeys([*self.campos_pedidos, self.campo_edicao]))
+        caminhos = [self.campos[campo] for campo in campos]
+        valores = (
+            Entrada.objects.visiveis()
+            .filter(pk=self.kwargs["pk"])
+            .values_list(*caminhos)
+            .first()
+        )
+        if valores is None:
+            raise Http404("Entrada não encontrada.")
+        return dict(zip(campos, valores))
+
+
+class ApiUsuario(ApiObjeto):
+    campos = {
+        "username": "username",
+        "date_joined": "date_joined",
+        "num_entradas": None,
+        "ultima_edicao": None,
+    }
+    campo_edicao = "ultima_edicao"
+
+    def get_linha(self):
+        try:
+            # entradas em tópicos apagados não aparecem mais
+            visivel = Q(entradas__topico__apagado_em__isnull=True)
+            return (
+                Usuario.objects.visiveis()
+                .values("username", "date_joined")
+                .annotate(
+                    num_entradas=Count("entradas", filter=visivel),
+                    ultima_edicao=Max("entradas__data_edicao", filter=visivel),
+                )
+                .get(username=self.kwargs["username"])
+            )
+        except Usuario.DoesNotExist:
+            raise Http404("Usuário não encontrado.")
+
+    def get_validadores(self):
+        ultima_edicao, _ = super().get_validadores()
+        return ultima_edicao, self.linha["num_entradas"]
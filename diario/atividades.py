@@ -0,0 +1,156 @@
+"""Linha do tempo das entradas criadas e editadas, geral e dos tópicos seguidos.
+
+Montar a linha do tempo a partir de `Entrada` exigiria ordenar entradas de
+todos os tópicos juntos. Em vez disso, cada entrada criada ou editada ganha
+uma linha em `Atividade` (pelos sinais em `diario.signals`, ou por
+`registrar_criadas()` nas importações em massa), e a tabela só cresce no fim.
+
+A ordem do `id` é a ordem da linha do tempo, então as páginas usam o próprio
+`id` como cursor:
+
+- a linha do tempo geral percorre a chave primária de trás para frente e para
+  quando a página enche;
+- a dos tópicos seguidos busca, para cada tópico, só as primeiras linhas pelo
+  `atividade_topico_idx` e junta tudo em uma única consulta com `UNION ALL`.
+
+Nos dois casos o custo depende do tamanho da página (e do número de tópicos
+seguidos), não do tamanho do diário.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import Http404
+
+from .models import Atividade, Topico, Usuario
+from .paginacao import PaginaCursor, codificar_valores, decodificar_valores
+
+POR_PAGINA = 24
+
+# cada tópico seguido é uma subconsulta na linha do tempo
+LIMITE_SEGUIDOS = 100
+
+
+def registrar(entrada, tipo, using=DEFAULT_DB_ALIAS) -> Atividade:
+    """Acrescenta a criação ou a edição de `entrada` à linha do tempo"""
+    return Atividade.objects.using(using).create(
+        entrada=entrada,
+        topico_id=entrada.topico_id,
+        usuario_id=entrada.usuario_id,
+        tipo=tipo,
+        data=entrada.data_pub if tipo == Atividade.CRIADA else entrada.data_edicao,
+    )
+
+
+def registrar_criadas(entradas, using=DEFAULT_DB_ALIAS):
+    """Versão em massa de `registrar()`, para entradas gravadas com `bulk_create()`"""
+    Atividade.objects.using(using).bulk_create(
+        Atividade(
+            entrada_id=entrada.pk,
+            topico_id=entrada.topico_id,
+            usuario_id=entrada.usuario_id,
+            tipo=Atividade.CRIADA,
+            data=entrada.data_pub,
+        )
+        for entrada in sorted(entradas, key=lambda entrada: entrada.data_pub)
+    )
+
+
+def _visiveis(atividades):
+    # as mesmas subconsultas de `EntradaQuerySet.visiveis()`
+    return atividades.exclude(
+        usuario__in=Usuario.objects.filter(apagado_em__isnull=False)
+    ).exclude(topico__in=Topico.objects.filter(apagado_em__isnull=False))
+
+
+def _decodificar(cursor: str) -> int:
+    (pk,) = decodificar_valores(cursor, 1)
+    try:
+        return int(pk)
+    except ValueError:
+        raise Http404("Cursor de paginação inválido.")
+
+
+def _ids_da_pagina(consultas, antes, depois, limite) -> list[int]:
+    """Os `limite` primeiros ids de todas as `consultas` juntas, na ordem da página"""
+    partes = []
+    for consulta in consultas:
+        if depois is not None:
+            consulta = consulta.filter(pk__gt=depois).order_by("pk")
+        else:
+            if antes is not None:
+                consulta = consulta.filter(pk__lt=antes)
+            consulta = consulta.order_by("-pk")
+        partes.append(consulta.values_list("pk", flat=True)[:limite])
+
+    if len(partes) <= 1:
+        return [pk for parte in partes for pk in parte]
+
+    # o SQLite não aceita LIMIT nas partes de um UNION, só em subconsultas
+    banco = router.db_for_read(Atividade) or DEFAULT_DB_ALIAS
+    sqls, parametros = [], []
+    for parte in partes:
+        sql, params = parte.query.sql_with_params()
+        sqls.append(f"SELECT * FROM ({sql})")
+        parametros += params
+    ordem = "ASC" if depois is not None else "DESC"
+    sql = " UNION ALL ".join(sqls) + f" ORDER BY 1 {ordem} LIMIT {int(limite)}"
+    with connections[banco].cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [linha[0] for linha in cursor.fetchall()]
+
+
+def paginar_atividades(consultas, parametros, por_pagina=POR_PAGINA) -> PaginaCursor:
+    """Pagina as atividades de `consultas` (uma ou mais), da mais recente para trás.
+
+    `parametros` segue `paginar_por_cursor()`: `antes=<cursor>` traz as mais
+    antigas e `depois=<cursor>` as mais recentes. Cada atividade vem com a
+    entrada, o tópico e o autor, sem o texto inteiro.
+    """
+    antes = parametros.get("antes")
+    depois = parametros.get("depois")
+    antes = _decodificar(antes) if antes else None
+    depois = _decodificar(depois) if depois else None
+
+    ids = _ids_da_pagina(consultas, antes, depois, por_pagina + 1)
+    mais = len(ids) > por_pagina
+    ids = ids[:por_pagina]
+    if depois is not None:
+        ids.reverse()
+        tem_anteriores, tem_recentes = True, mais
+    else:
+        tem_anteriores, tem_recentes = mais, antes is not None
+
+    carregadas = (
+        Atividade.objects.select_related(
+            "entrada__topico", "entrada__usuario"
+        ).defer("entrada__texto_entrada", "entrada__texto_html")
+    ).in_bulk(ids)
+    atividades = [
+        carregadas[pk]
+        for pk in ids
+        # a entrada pode ter mudado para um tópico que está sendo apagado
+        if pk in carregadas
+        and carregadas[pk].entrada.topico.apagado_em is None
+        and carregadas[pk].entrada.usuario.apagado_em is None
+    ]
+
+    pagina = PaginaCursor(atividades)
+    if ids:
+        if tem_anteriores:
+            pagina.cursor_anteriores = codificar_valores(ids[-1])
+        if tem_recentes:
+            pagina.cursor_recentes = codificar_valores(ids[0])
+    return pagina
+
+
+def linha_do_tempo(parametros, por_pagina=POR_PAGINA) -> PaginaCursor:
+    """Uma página da linha do tempo de todo o diário"""
+    return paginar_atividades([_visiveis(Atividade.objects.all())], parametros, por_pagina)
+
+
+def linha_do_tempo_seguidos(topicos, parametros, por_pagina=POR_PAGINA) -> PaginaCursor:
+    """Uma página da linha do tempo só dos `topicos` (ids) seguidos"""
+    consultas = [
+        _visiveis(Atividade.objects.filter(topico_id=topico))
+        for topico in topicos[:LIMITE_SEGUIDOS]
+    ]
+    return paginar_atividades(consultas, parametros, por_pagina)
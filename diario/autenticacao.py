@@ -0,0 +1,47 @@
+"""Backend de autenticação que guarda o usuário logado em cache.
+
+O `AuthenticationMiddleware` busca o usuário da sessão em toda requisição, e
+o `base.html` usa `user` em todas as páginas. Com as sessões em `cached_db`
+ou em cookies, essa é a última consulta que sobra para quem está logado, e
+aqui ela é trocada por uma leitura do cache por `DIARIO_CACHE_USUARIO_TIMEOUT`
+segundos.
+
+Os sinais em `diario.signals` apagam a cópia quando o usuário é salvo (ex.:
+ao trocar a senha, para que sessões antigas deixem de valer) ou apagado. Isso
+só vale para todos os processos se o cache for compartilhado entre eles: com
+o LocMem, cada processo tem a sua cópia, e os outros continuariam aceitando a
+sessão antiga ou o usuário desativado até ela expirar. Por isso o padrão de
+`DIARIO_CACHE_USUARIO_TIMEOUT` é 0 com caches locais, e `diario.checks` avisa
+se ele for ligado assim. Alterações que não passam por `save()`, como
+`QuerySet.update()`, só aparecem depois que a cópia expira.
+
+A cópia inclui o hash da senha (usado para validar a sessão), então o cache
+precisa ser tão protegido quanto o banco.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from . import cache
+
+
+class BackendUsuarioEmCache(ModelBackend):
+    def get_user(self, user_id):
+        if not settings.DIARIO_CACHE_USUARIO_TIMEOUT:
+            return super().get_user(user_id)
+        usuario = cache.buscar_usuario(user_id)
+        if usuario is None:
+            usuario = super().get_user(user_id)
+            if usuario is not None:
+                cache.guardar_usuario(usuario)
+        return usuario
+
+    async def aget_user(self, user_id):
+        if not settings.DIARIO_CACHE_USUARIO_TIMEOUT:
+            return await super().aget_user(user_id)
+        usuario = await cache.abuscar_usuario(user_id)
+        if usuario is None:
+            usuario = await super().aget_user(user_id)
+            if usuario is not None:
+                await cache.aguardar_usuario(usuario)
+        return usuario
@@ -0,0 +1,257 @@
+"""Benchmark das páginas principais com volumes de dados realistas.
+
+Usado pelo comando `benchmark`. `popular()` gera usuários, tópicos e entradas
+com `bulk_create()`, `medir()` faz as requisições de um cenário pelo cliente
+de testes do Django e `comparar()` confere os resultados com uma linha de base
+salva em JSON.
+"""
+
+import random
+import statistics
+import tracemalloc
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .atividades import registrar_criadas
+from .models import Entrada, Topico, Usuario, gerar_previa, preservando_datas
+from .resumos import somar_entradas
+from .paginacao import codificar_cursor
+
+SENHA = "benchmark"
+
+_PALAVRAS = (
+    "hoje amanhã ontem café código teste banco consulta página tópico entrada "
+    "lista cache réplica índice django python sqlite desempenho memória tempo "
+    "leitura escrita usuário perfil diário nota ideia projeto erro correção"
+).split()
+
+
+@dataclass
+class Volumes:
+    usuarios: int
+    topicos: int
+    entradas: int
+
+
+@dataclass
+class Cenario:
+    nome: str
+    url: str
+    metodo: str = "get"
+    dados: dict | None = None
+    logado: bool = False
+
+
+@dataclass
+class Resultado:
+    p50: float
+    p95: float
+    p99: float
+    consultas: int
+    memoria_kib: float
+    repeticoes: int
+
+
+def _texto(rng):
+    return " ".join(rng.choices(_PALAVRAS, k=rng.randint(10, 120)))
+
+
+def popular(volumes: Volumes, semente=0, lote=2000, using=DEFAULT_DB_ALIAS):
+    """Cria os dados do benchmark, sem disparar sinais.
+
+    A distribuição das entradas é desigual como a de um diário real: poucos
+    tópicos e usuários concentram a maior parte delas.
+    """
+    rng = random.Random(semente)
+    agora = timezone.now()
+    senha = make_password(SENHA)
+
+    usuarios = [
+        Usuario(username=f"usuario{i}", email=f"usuario{i}@teste.com", password=senha)
+        for i in range(volumes.usuarios)
+    ]
+    topicos = [
+        Topico(
+            topico=f"Tópico {i}",
+            slug=f"topico-{i}",
+            data_pub=agora - timedelta(days=volumes.topicos - i),
+            data_edicao=agora - timedelta(days=volumes.topicos - i),
+        )
+        for i in range(volumes.topicos)
+    ]
+    with transaction.atomic(using=using), preservando_datas():
+        Usuario.objects.using(using).bulk_create(usuarios, batch_size=lote)
+        Topico.objects.using(using).bulk_create(topicos, batch_size=lote)
+
+    ids_usuarios = list(
+        Usuario.objects.using(using).order_by("pk").values_list("pk", flat=True)
+    )
+    ids_topicos = list(
+        Topico.objects.using(using).order_by("pk").values_list("pk", flat=True)
+    )
+    pesos_usuarios = [1 / (i + 1) for i in range(len(ids_usuarios))]
+    pesos_topicos = [1 / (i + 1) for i in range(len(ids_topicos))]
+
+    por_topico = Counter()
+    inicio = agora - timedelta(days=365)
+    passo = timedelta(days=365) / max(volumes.entradas, 1)
+    for comeco in range(0, volumes.entradas, lote):
+        quantidade = min(lote, volumes.entradas - comeco)
+        entradas = []
+        for i in range(comeco, comeco + quantidade):
+            data = inicio + passo * i
+            texto = _texto(rng)
+            entrada = Entrada(
+                topico_id=rng.choices(ids_topicos, pesos_topicos)[0],
+                usuario_id=rng.choices(ids_usuarios, pesos_usuarios)[0],
+                texto_entrada=texto,
+                previa=gerar_previa(texto),
+                data_pub=data,
+                data_edicao=data,
+            )
+            por_topico[entrada.topico_id] += 1
+            entradas.append(entrada)
+        with transaction.atomic(using=using), preservando_datas():
+            Entrada.objects.using(using).bulk_create(entradas)
+            registrar_criadas(entradas, using)
+            somar_entradas(entradas, using)
+
+    with transaction.atomic(using=using):
+        for topico_id, total in por_topico.items():
+            Topico.objects.using(using).filter(pk=topico_id).update(
+                num_entradas=F("num_entradas") + total
+            )
+
+
+def montar_cenarios(using=DEFAULT_DB_ALIAS) -> list[Cenario]:
+    """Cenários sobre os maiores tópico e perfil, onde as páginas custam mais"""
+    topico = Topico.objects.using(using).order_by("-num_entradas").first()
+    usuario = (
+        Usuario.objects.using(using)
+        .annotate(total=Count("entradas"))
+        .order_by("-total")
+        .first()
+    )
+    cenarios = [
+        Cenario("topicos", reverse("topicos")),
+        Cenario("entradas", topico.get_absolute_url()),
+        Cenario("perfil", usuario.get_absolute_url()),
+        Cenario("atividades", reverse("atividades")),
+        Cenario(
+            "criar_entrada",
+            reverse("criar_entrada", kwargs={"topico": topico.slug}),
+            metodo="post",
+            dados={"texto_entrada": "entrada do benchmark"},
+            logado=True,
+        ),
+    ]
+
+    # uma página perto do fim da lista mostra que o custo não cresce com a
+    # profundidade
+    profunda = (
+        topico.entrada_set.using(using)
+        .order_by("-data_pub", "-pk")
+        .values_list("data_pub", "pk")[topico.num_entradas * 9 // 10 :]
+        .first()
+    )
+    if profunda is not None:
+        cenarios.insert(
+            2,
+            Cenario(
+                "entradas_pagina_profunda",
+                f"{topico.get_absolute_url()}?antes={codificar_cursor(*profunda)}",
+            ),
+        )
+    return cenarios
+
+
+def _percentis(valores):
+    if len(valores) < 2:
+        return valores * 3
+    cortes = statistics.quantiles(valores, n=100, method="inclusive")
+    return cortes[49], cortes[94], cortes[98]
+
+
+def medir(
+    cliente, cenario: Cenario, repeticoes=30, aquecimento=2, using=DEFAULT_DB_ALIAS
+):
+    """Executa o cenário `repeticoes` vezes e resume latência, consultas e memória"""
+    requisitar = getattr(cliente, cenario.metodo)
+
+    def executar():
+        resposta = requisitar(cenario.url, cenario.dados)
+        if resposta.status_code >= 400:
+            raise RuntimeError(
+                f"{cenario.nome}: {cenario.url} respondeu {resposta.status_code}"
+            )
+
+    for _ in range(aquecimento):
+        executar()
+
+    latencias = []
+    consultas = 0
+    for _ in range(repeticoes):
+        with CaptureQueriesContext(connections[using]) as contexto:
+            inicio = perf_counter()
+            executar()
+            latencias.append((perf_counter() - inicio) * 1000)
+        consultas = max(consultas, len(contexto.captured_queries))
+
+    # medido à parte porque o tracemalloc deixa tudo mais lento
+    tracemalloc.start()
+    try:
+        executar()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = _percentis(latencias)
+    return Resultado(
+        p50=round(p50, 3),
+        p95=round(p95, 3),
+        p99=round(p99, 3),
+        consultas=consultas,
+        memoria_kib=round(pico / 1024, 1),
+        repeticoes=repeticoes,
+    )
+
+
+def comparar(
+    resultados: dict, base: dict, tolerancia: float, folga_ms: float = 0
+) -> list[str]:
+    """Lista as regressões de `resultados` em relação à linha de base.
+
+    A latência mediana e a memória podem piorar até `tolerancia` (ex.: 0.25
+    para 25%), e a latência ainda mais `folga_ms`, para o ruído de páginas
+    rápidas não contar como regressão. p95 e p99 só são informados: com poucas
+    dezenas de amostras eles variam demais entre execuções para servirem de
+    critério. O número de consultas é determinístico e não pode aumentar.
+    """
+    regressoes = []
+    for nome, resultado in resultados.items():
+        anterior = base.get(nome)
+        if anterior is None:
+            continue
+        resultado = asdict(resultado) if isinstance(resultado, Resultado) else resultado
+        for metrica, folga in (("p50", folga_ms), ("memoria_kib", 0)):
+            limite = anterior[metrica] * (1 + tolerancia) + folga
+            if resultado[metrica] > limite:
+                regressoes.append(
+                    f"{nome}: {metrica} {resultado[metrica]} > {limite:.1f} "
+                    f"(base {anterior[metrica]})"
+                )
+        if resultado["consultas"] > anterior["consultas"]:
+            regressoes.append(
+                f"{nome}: consultas {resultado['consultas']} > "
+                f"{anterior['consultas']}"
+            )
+    return regressoes
@@ -0,0 +1,159 @@
+"""Busca textual nas entradas usando o índice FTS5 do SQLite.
+
+O índice `diario_entrada_fts` é criado pela migração `0004_busca_textual` e
+mantido por gatilhos, então aqui só há leitura. Desde a `0012`, ele lê o texto
+pela view `diario_entrada_texto`, que descomprime as entradas comprimidas
+(veja `diario.compressao`). Os resultados vêm ordenados
+pela relevância (bm25) e são paginados por cursor em `(relevância, id)`.
+"""
+
+import re
+from dataclasses import dataclass
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import Http404
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Entrada
+from .paginacao import codificar_valores, decodificar_valores
+
+TABELA_FTS = "diario_entrada_fts"
+
+# marcadores que não aparecem em texto digitado, trocados por <mark> depois
+# que o trecho é escapado
+_INICIO_DESTAQUE = "\x02"
+_FIM_DESTAQUE = "\x03"
+
+
+@dataclass
+class ResultadoBusca:
+    """Uma página de resultados da busca e o cursor para a próxima"""
+
+    entradas: list
+    cursor_proximo: str | None = None
+
+    def __iter__(self):
+        return iter(self.entradas)
+
+    def __len__(self):
+        return len(self.entradas)
+
+
+def preparar_consulta(texto: str) -> str:
+    """Converte o texto digitado em uma consulta FTS5 segura.
+
+    Cada palavra vira uma frase entre aspas, o que desativa a sintaxe de
+    operadores do FTS5 (`AND`, `NEAR`, `*`, ...) e evita erros de sintaxe com
+    entradas arbitrárias. Todas as palavras precisam aparecer na entrada.
+    """
+    palavras = re.findall(r"\w+", texto)
+    return " ".join(f'"{palavra}"' for palavra in palavras)
+
+
+def _destacar(trecho: str) -> str:
+    trecho = escape(trecho)
+    trecho = trecho.replace(_INICIO_DESTAQUE, "<mark>")
+    return mark_safe(trecho.replace(_FIM_DESTAQUE, "</mark>"))
+
+
+def buscar_entradas(
+    texto, topico=None, cursor=None, por_pagina=20, using=DEFAULT_DB_ALIAS
+) -> ResultadoBusca:
+    """Busca entradas que contenham todas as palavras de `texto`.
+
+    Se `topico` for passado, só as entradas dele são consideradas. Cada
+    entrada retornada ganha o atributo `trecho`, com os termos encontrados
+    marcados com `<mark>`.
+    """
+    consulta = preparar_consulta(texto)
+    if not consulta:
+        return ResultadoBusca([])
+
+    # usuários e tópicos apagados somem antes de as entradas serem removidas
+    filtros = [
+        f"{TABELA_FTS} MATCH %s",
+        "u.apagado_em IS NULL",
+        "t.apagado_em IS NULL",
+    ]
+    parametros = [consulta]
+    if topico is not None:
+        filtros.append("e.topico_id = %s")
+        parametros.append(topico.pk)
+
+    filtro_cursor = ""
+    if cursor:
+        relevancia, pk = decodificar_valores(cursor, 2)
+        try:
+            relevancia, pk = float(relevancia), int(pk)
+        except ValueError:
+            raise Http404("Cursor de paginação inválido.")
+        filtro_cursor = "WHERE relevancia > %s OR (relevancia = %s AND id > %s)"
+
+    sql = f"""
+        SELECT id, trecho, relevancia FROM (
+            SELECT
+                e.id AS id,
+                snippet({TABELA_FTS}, 0, %s, %s, '…', 16) AS trecho,
+                bm25({TABELA_FTS}) AS relevancia
+            FROM {TABELA_FTS}
+            JOIN diario_entrada e ON e.id = {TABELA_FTS}.rowid
+            JOIN diario_usuario u ON u.id = e.usuario_id
+            JOIN diario_topico t ON t.id = e.topico_id
+            WHERE {" AND ".join(filtros)}
+        )
+        {filtro_cursor}
+        ORDER BY relevancia, id
+        LIMIT %s
+    """
+    parametros = [_INICIO_DESTAQUE, _FIM_DESTAQUE, *parametros]
+    if cursor:
+        parametros += [relevancia, relevancia, pk]
+    parametros.append(por_pagina + 1)
+
+    with connections[using].cursor() as c:
+        c.execute(sql, parametros)
+        linhas = c.fetchall()
+
+    mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    por_pk = (
+        Entrada.objects.using(using)
+        .select_related("usuario", "topico")
+        .defer("texto_html")
+        .in_bulk([linha[0] for linha in linhas])
+    )
+
+    entradas = []
+    for pk, trecho, _ in linhas:
+        entrada = por_pk.get(pk)
+        if entrada is None:  # apagada entre as duas consultas
+            continue
+        entrada.trecho = _destacar(trecho)
+        entradas.append(entrada)
+
+    resultado = ResultadoBusca(entradas)
+    if mais and linhas:
+        pk, _, relevancia = linhas[-1]
+        resultado.cursor_proximo = codificar_valores(repr(relevancia), pk)
+    return resultado
+
+
+def reconstruir_indice(using=DEFAULT_DB_ALIAS):
+    """Reconstrói o índice inteiro a partir da tabela de entradas"""
+    with connections[using].cursor() as c:
+        c.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')")
+
+
+def otimizar_indice(using=DEFAULT_DB_ALIAS):
+    """Junta os segmentos do índice em um só, deixando as buscas mais rápidas"""
+    with connections[using].cursor() as c:
+        c.execute(f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('optimize')")
+
+
+def verificar_indice(using=DEFAULT_DB_ALIAS):
+    """Levanta `DatabaseError` se o índice não bater com a tabela de entradas"""
+    with connections[using].cursor() as c:
+        c.execute(
+            f"INSERT INTO {TABELA_FTS}({TABELA_FTS}, rank) VALUES ('integrity-check', 1)"
+        )
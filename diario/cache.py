@@ -0,0 +1,264 @@
+"""Cache de fragmentos HTML com invalidação por versão.
+
+Em vez de apagar chaves quando algo muda, cada escopo (um tópico, um usuário,
+a lista de tópicos) tem um contador de versão guardado no cache. As chaves dos
+fragmentos incluem as versões dos escopos de que dependem, então incrementar
+uma versão faz com que as chaves antigas simplesmente deixem de ser lidas e
+expirem sozinhas.
+
+As funções com prefixo `a` são as versões para o loop de eventos (views
+assíncronas e `aget_user`): usam a API assíncrona do cache, que em backends
+sem suporte nativo (ex.: o cache no banco) roda em uma thread à parte.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+PREFIXO = "diario"
+
+
+def _cache():
+    return caches[getattr(settings, "DIARIO_CACHE_ALIAS", "default")]
+
+
+def _chave_versao(escopo: tuple) -> str:
+    return ":".join([PREFIXO, "versao", *map(str, escopo)])
+
+
+def _nova_versao() -> int:
+    # baseada no relógio para que uma versão perdida (ex.: cache reiniciado)
+    # nunca volte a um valor que já tenha sido usado em alguma chave
+    return time.time_ns()
+
+
+def obter_versoes(*escopos: tuple) -> list[int]:
+    """Retorna a versão atual de cada escopo, criando as que não existirem"""
+    cache = _cache()
+    chaves = [_chave_versao(escopo) for escopo in escopos]
+    encontradas = cache.get_many(chaves)
+    versoes = []
+    for chave in chaves:
+        if chave not in encontradas:
+            cache.add(chave, _nova_versao(), timeout=None)
+            encontradas[chave] = cache.get(chave)
+        versoes.append(encontradas[chave])
+    return versoes
+
+
+async def aobter_versoes(*escopos: tuple) -> list[int]:
+    cache = _cache()
+    chaves = [_chave_versao(escopo) for escopo in escopos]
+    encontradas = await cache.aget_many(chaves)
+    versoes = []
+    for chave in chaves:
+        if chave not in encontradas:
+            await cache.aadd(chave, _nova_versao(), timeout=None)
+            encontradas[chave] = await cache.aget(chave)
+        versoes.append(encontradas[chave])
+    return versoes
+
+
+def invalidar(*escopos: tuple, using=DEFAULT_DB_ALIAS):
+    """Incrementa a versão dos escopos, tornando seus fragmentos obsoletos.
+
+    Dentro de uma transação, só incrementa depois do commit: antes disso uma
+    requisição concorrente ainda lê os dados antigos e os guardaria na versão
+    nova, onde ficariam até expirar. Fora de uma transação, incrementa na hora.
+    """
+    escopos = set(escopos)
+    transaction.on_commit(lambda: _incrementar_versoes(escopos), using=using)
+
+
+def _incrementar_versoes(escopos):
+    cache = _cache()
+    for escopo in escopos:
+        chave = _chave_versao(escopo)
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, _nova_versao(), timeout=None)
+
+
+def _chave_metrica(nome: str) -> str:
+    return f"{PREFIXO}:metricas:{nome}"
+
+
+def incrementar_metrica(nome: str, quantidade: int = 1) -> int:
+    """Soma `quantidade` ao contador `nome` e retorna o novo valor"""
+    cache = _cache()
+    chave = _chave_metrica(nome)
+    try:
+        return cache.incr(chave, quantidade)
+    except ValueError:
+        if cache.add(chave, quantidade, timeout=None):
+            return quantidade
+        return cache.incr(chave, quantidade)
+
+
+async def aincrementar_metrica(nome: str, quantidade: int = 1) -> int:
+    cache = _cache()
+    chave = _chave_metrica(nome)
+    try:
+        return await cache.aincr(chave, quantidade)
+    except ValueError:
+        if await cache.aadd(chave, quantidade, timeout=None):
+            return quantidade
+        return await cache.aincr(chave, quantidade)
+
+
+def obter_metricas(*nomes: str) -> dict:
+    """Valores dos contadores `nomes`, com 0 para os que não existirem"""
+    chaves = {nome: _chave_metrica(nome) for nome in nomes}
+    valores = _cache().get_many(chaves.values())
+    return {nome: valores.get(chave, 0) for nome, chave in chaves.items()}
+
+
+def _contar(evento: str):
+    incrementar_metrica(f"cache:{evento}")
+
+
+def estatisticas() -> dict:
+    """Acertos e falhas do cache de fragmentos desde que o cache foi iniciado"""
+    valores = obter_metricas("cache:acertos", "cache:falhas")
+    dados = {"acertos": valores["cache:acertos"], "falhas": valores["cache:falhas"]}
+    total = dados["acertos"] + dados["falhas"]
+    dados["taxa_acertos"] = dados["acertos"] / total if total else None
+    return dados
+
+
+def _chave_fragmento(nome: str, versoes: list, variacao: str) -> str:
+    resumo = hashlib.md5(variacao.encode(), usedforsecurity=False).hexdigest()
+    return ":".join([PREFIXO, "fragmento", nome, *map(str, versoes), resumo])
+
+
+def buscar_fragmento(nome: str, escopos: list, variacao: str):
+    """Retorna `(chave, fragmento)`, com `fragmento` `None` se não estiver no cache.
+
+    `escopos` são os escopos cujas versões invalidam o fragmento e `variacao`
+    diferencia fragmentos do mesmo escopo (ex.: a query string da página).
+    """
+    chave = _chave_fragmento(nome, obter_versoes(*escopos), variacao)
+    fragmento = _cache().get(chave)
+    _contar("falhas" if fragmento is None else "acertos")
+    return chave, fragmento
+
+
+async def abuscar_fragmento(nome: str, escopos: list, variacao: str):
+    chave = _chave_fragmento(nome, await aobter_versoes(*escopos), variacao)
+    fragmento = await _cache().aget(chave)
+    await aincrementar_metrica(
+        "cache:falhas" if fragmento is None else "cache:acertos"
+    )
+    return chave, fragmento
+
+
+def guardar_fragmento(chave: str, fragmento: str):
+    _cache().set(chave, fragmento, getattr(settings, "DIARIO_CACHE_TIMEOUT", 600))
+
+
+async def aguardar_fragmento(chave: str, fragmento: str):
+    await _cache().aset(
+        chave, fragmento, getattr(settings, "DIARIO_CACHE_TIMEOUT", 600)
+    )
+
+
+def fragmento_em_cache(nome: str, escopos: list, variacao: str, gerar):
+    """Retorna o fragmento `nome` do cache ou o gera com `gerar()` e o guarda"""
+    chave, fragmento = buscar_fragmento(nome, escopos, variacao)
+    if fragmento is None:
+        fragmento = gerar()
+        guardar_fragmento(chave, fragmento)
+    return fragmento
+
+
+def _chave_card(partes: tuple) -> str:
+    resumo = hashlib.md5(
+        "|".join(map(str, partes)).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"{PREFIXO}:card:{resumo}"
+
+
+def buscar_cards(*partes: tuple) -> dict:
+    """Busca de uma vez os cards identificados por cada tupla de `partes`.
+
+    Ao contrário dos fragmentos, os cards não usam versões: as partes já mudam
+    quando o card muda (ex.: a data de edição da entrada), e uma chave antiga
+    só deixa de ser lida.
+    """
+    chaves = {_chave_card(parte): parte for parte in partes}
+    encontrados = _cache().get_many(chaves)
+    return {chaves[chave]: html for chave, html in encontrados.items()}
+
+
+def guardar_card(partes: tuple, html: str):
+    _cache().set(
+        _chave_card(partes), html, getattr(settings, "DIARIO_CACHE_TIMEOUT", 600)
+    )
+
+
+def buscar_html(hash_do_texto: str):
+    """HTML de um texto em Markdown, pelo hash do texto (veja `diario.formatacao`)"""
+    return _cache().get(f"{PREFIXO}:html:{hash_do_texto}")
+
+
+async def abuscar_html(hash_do_texto: str):
+    return await _cache().aget(f"{PREFIXO}:html:{hash_do_texto}")
+
+
+def guardar_html(hash_do_texto: str, html: str):
+    _cache().set(
+        f"{PREFIXO}:html:{hash_do_texto}",
+        html,
+        getattr(settings, "DIARIO_CACHE_TIMEOUT", 600),
+    )
+
+
+async def aguardar_html(hash_do_texto: str, html: str):
+    await _cache().aset(
+        f"{PREFIXO}:html:{hash_do_texto}",
+        html,
+        getattr(settings, "DIARIO_CACHE_TIMEOUT", 600),
+    )
+
+
+def cache_compartilhado() -> bool:
+    """Diz se o cache é o mesmo para todos os processos (o LocMem é um por processo)"""
+    return not isinstance(_cache(), (LocMemCache, DummyCache))
+
+
+def _chave_usuario(pk) -> str:
+    return f"{PREFIXO}:usuario:{pk}"
+
+
+def buscar_usuario(pk):
+    return _cache().get(_chave_usuario(pk))
+
+
+async def abuscar_usuario(pk):
+    return await _cache().aget(_chave_usuario(pk))
+
+
+def guardar_usuario(usuario):
+    _cache().set(
+        _chave_usuario(usuario.pk),
+        usuario,
+        getattr(settings, "DIARIO_CACHE_USUARIO_TIMEOUT", 60),
+    )
+
+
+async def aguardar_usuario(usuario):
+    await _cache().aset(
+        _chave_usuario(usuario.pk),
+        usuario,
+        getattr(settings, "DIARIO_CACHE_USUARIO_TIMEOUT", 60),
+    )
+
+
+def esquecer_usuario(pk):
+    _cache().delete(_chave_usuario(pk))
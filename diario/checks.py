@@ -0,0 +1,42 @@
+"""Verificações do `manage.py check` (e do `runserver`/`collectstatic`)"""
+
+from django.conf import settings
+from django.core import checks
+
+from .cache import cache_compartilhado
+from .estaticos import vendorizados_faltando
+
+
+@checks.register(checks.Tags.staticfiles)
+def verificar_vendorizados(app_configs, **kwargs):
+    # os arquivos estão no repositório, mas sem algum deles as páginas perdem o
+    # estilo e o `collectstatic` falha nas URLs de `stylesheet.css`
+    faltando = vendorizados_faltando()
+    if not faltando:
+        return []
+    return [
+        checks.Warning(
+            f"{len(faltando)} arquivo(s) de terceiros ainda não foram baixados "
+            f"para diario/static/vendor (ex.: {faltando[0]}).",
+            hint="Rode `python manage.py vendorizar_estaticos`.",
+            id="diario.W001",
+        )
+    ]
+
+
+@checks.register(checks.Tags.caches)
+def verificar_cache_usuario(app_configs, **kwargs):
+    # apagar a cópia de um usuário (ao trocar a senha, desativar a conta...)
+    # só alcança o processo que fez a mudança se o cache não for compartilhado
+    if not settings.DIARIO_CACHE_USUARIO_TIMEOUT or cache_compartilhado():
+        return []
+    return [
+        checks.Warning(
+            "DIARIO_CACHE_USUARIO_TIMEOUT está ligado com um cache local: outros "
+            "processos continuam aceitando sessões antigas e usuários "
+            "desativados até a cópia expirar.",
+            hint="Use um cache compartilhado (ex.: Redis, Memcached ou banco) ou "
+            "DIARIO_CACHE_USUARIO_TIMEOUT=0.",
+            id="diario.W002",
+        )
+    ]
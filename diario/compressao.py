@@ -0,0 +1,243 @@
+"""Compressão opcional do texto das entradas no banco.
+
+Com `DIARIO_COMPRESSAO` (`zlib` ou `zstd`), `texto_entrada` com pelo menos
+`DIARIO_COMPRESSAO_MINIMO` bytes é gravado comprimido. O valor gravado é um
+BLOB que começa com um byte de formato (`FORMATOS`) seguido dos dados; textos
+curtos, ou que não ficam menores, continuam como TEXT. A coluna é a mesma
+`TEXT` de antes: o SQLite guarda o BLOB sem convertê-lo. A leitura reconhece
+o formato pelo byte, então ligar, desligar ou trocar o algoritmo não exige
+reescrever as linhas antigas (veja o comando `comprimir_entradas`).
+
+`TextoComprimidoField` faz a conversão, então formulários, admin, templates e
+a API sempre veem o texto. No SQL, a função `diario_texto()`, registrada em
+toda conexão, devolve o texto de um valor comprimido ou não; a busca textual
+lê as entradas por ela. Filtros do ORM sobre o texto (`icontains`, ...) não
+enxergam o conteúdo das linhas comprimidas, e ferramentas fora do Django
+(ex.: o shell do `sqlite3`) não conseguem gravar entradas, porque os gatilhos
+da busca usam a função.
+"""
+
+import zlib
+from time import perf_counter, sleep
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Count, Sum, TextField
+from django.db.models.expressions import RawSQL
+
+try:
+    import zstandard
+except ImportError:  # opcional: sem ele, só o zlib está disponível
+    zstandard = None
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+# primeiro byte do valor gravado
+FORMATOS = {ZLIB: b"\x01", ZSTD: b"\x02"}
+_POR_CABECALHO = {cabecalho: nome for nome, cabecalho in FORMATOS.items()}
+# como o SQL devolve o cabeçalho, com `hex()`
+_POR_HEX = {cabecalho.hex().upper(): nome for nome, cabecalho in FORMATOS.items()}
+
+NIVEL_ZLIB = 6
+NIVEL_ZSTD = 3
+
+TAMANHO_LOTE = 500
+
+
+def formatos_disponiveis() -> list[str]:
+    return [ZLIB, ZSTD] if zstandard is not None else [ZLIB]
+
+
+def _comprimir_com(formato: str, dados: bytes) -> bytes:
+    if formato == ZLIB:
+        return zlib.compress(dados, NIVEL_ZLIB)
+    if formato == ZSTD:
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                "DIARIO_COMPRESSAO=zstd precisa do pacote `zstandard`."
+            )
+        return zstandard.ZstdCompressor(level=NIVEL_ZSTD).compress(dados)
+    raise ImproperlyConfigured(f"Formato de compressão desconhecido: {formato}")
+
+
+def _descomprimir_com(formato: str, dados: bytes) -> bytes:
+    if formato == ZLIB:
+        return zlib.decompress(dados)
+    if zstandard is None:
+        raise ImproperlyConfigured(
+            "Há entradas comprimidas com zstd, que precisa do pacote `zstandard`."
+        )
+    return zstandard.ZstdDecompressor().decompress(dados)
+
+
+def comprimir(texto: str, formato=None, minimo=None):
+    """O valor a gravar para `texto`: `bytes` com o cabeçalho ou o próprio texto"""
+    formato = settings.DIARIO_COMPRESSAO if formato is None else formato
+    minimo = settings.DIARIO_COMPRESSAO_MINIMO if minimo is None else minimo
+    if not formato:
+        return texto
+    dados = texto.encode()
+    if len(dados) < minimo:
+        return texto
+    comprimido = _comprimir_com(formato, dados)
+    comprimido = FORMATOS[formato] + comprimido
+    # textos curtos ou já comprimidos podem crescer
+    return comprimido if len(comprimido) < len(dados) else texto
+
+
+def descomprimir(valor):
+    """O texto de um valor lido do banco, comprimido ou não"""
+    if not isinstance(valor, (bytes, memoryview)):
+        return valor
+    valor = bytes(valor)
+    try:
+        formato = _POR_CABECALHO[valor[:1]]
+    except KeyError:
+        raise ValueError(f"Cabeçalho de compressão desconhecido: {valor[:1]!r}")
+    return _descomprimir_com(formato, valor[1:]).decode()
+
+
+def formato_de(valor) -> str:
+    """O formato de um valor gravado, ou `""` se ele não está comprimido"""
+    if isinstance(valor, (bytes, memoryview)):
+        return _POR_CABECALHO.get(bytes(valor[:1]), "")
+    return ""
+
+
+class TextoComprimidoField(TextField):
+    """`TextField` que grava o texto comprimido, segundo `DIARIO_COMPRESSAO`"""
+
+    def from_db_value(self, value, expression, connection):
+        return descomprimir(value)
+
+    def to_python(self, value):
+        return super().to_python(descomprimir(value))
+
+    def get_db_prep_save(self, value, connection):
+        value = super().get_db_prep_save(value, connection)
+        # expressões (ex.: o `Case` do `bulk_update()`) passam os valores de
+        # volta por aqui ao gerar o SQL
+        if value is None or hasattr(value, "as_sql"):
+            return value
+        return comprimir(value)
+
+
+def _registrar_funcao(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        connection.connection.create_function(
+            "diario_texto", 1, descomprimir, deterministic=True
+        )
+
+
+connection_created.connect(_registrar_funcao, dispatch_uid="diario_compressao")
+
+
+def _com_cabecalho(entradas):
+    # o byte de formato e o tamanho em bytes, sem trazer o texto para o Python
+    return entradas.annotate(
+        cabecalho=RawSQL(
+            "CASE WHEN typeof(texto_entrada) = 'blob' "
+            "THEN hex(substr(texto_entrada, 1, 1)) ELSE '' END",
+            [],
+        ),
+        tamanho=RawSQL("length(CAST(texto_entrada AS BLOB))", []),
+    )
+
+
+def recomprimir(
+    lote=TAMANHO_LOTE, pausa=0.0, progresso=None, using=DEFAULT_DB_ALIAS
+) -> int:
+    """Regrava as entradas gravadas em um formato diferente do configurado.
+
+    Percorre a tabela em lotes por faixa de id, cada um na sua transação, e
+    só carrega o texto das linhas que podem mudar: as comprimidas em outro
+    formato e, com a compressão ligada, as que têm o tamanho mínimo.
+    `progresso(ultimo_id, regravadas)` é chamado a cada lote. Retorna quantas
+    entradas foram regravadas.
+    """
+    from .models import Entrada
+
+    formato = settings.DIARIO_COMPRESSAO
+    minimo = settings.DIARIO_COMPRESSAO_MINIMO
+    entradas = _com_cabecalho(Entrada.objects.using(using)).order_by("pk")
+
+    regravadas = 0
+    ultimo = 0
+    colunas = ["pk", "cabecalho", "tamanho"]
+    while linhas := list(entradas.filter(pk__gt=ultimo).values_list(*colunas)[:lote]):
+        ultimo = linhas[-1][0]
+        atuais = {
+            pk: _POR_HEX.get(cabecalho, "")
+            for pk, cabecalho, tamanho in linhas
+            if _POR_HEX.get(cabecalho, "") != formato
+            and (cabecalho or tamanho >= minimo)
+        }
+        with transaction.atomic(using=using):
+            mudadas = [
+                entrada
+                for entrada in Entrada.objects.using(using)
+                .filter(pk__in=atuais)
+                .only("pk", "texto_entrada")
+                # textos que não ficam menores continuam como estão
+                if formato_de(comprimir(entrada.texto_entrada)) != atuais[entrada.pk]
+            ]
+            Entrada.objects.using(using).bulk_update(mudadas, ["texto_entrada"])
+        regravadas += len(mudadas)
+        if progresso is not None:
+            progresso(ultimo, regravadas)
+        if pausa:
+            sleep(pausa)
+    return regravadas
+
+
+def estado_armazenamento(using=DEFAULT_DB_ALIAS) -> dict:
+    """Entradas e bytes guardados por formato, e os bytes do texto original"""
+    from .models import Entrada
+
+    formatos = {}
+    linhas = (
+        _com_cabecalho(Entrada.objects.using(using))
+        .annotate(
+            original=RawSQL("length(CAST(diario_texto(texto_entrada) AS BLOB))", [])
+        )
+        .values("cabecalho")
+        .annotate(
+            entradas=Count("pk"), guardados=Sum("tamanho"), originais=Sum("original")
+        )
+        .order_by()
+    )
+    for linha in linhas:
+        formatos[_POR_HEX.get(linha["cabecalho"], "") or "texto"] = {
+            "entradas": linha["entradas"],
+            "bytes_guardados": linha["guardados"] or 0,
+            "bytes_originais": linha["originais"] or 0,
+        }
+    return formatos
+
+
+def medir(textos, formatos=None) -> dict:
+    """Tamanho e tempo de CPU de cada formato disponível para os `textos`"""
+    dados = [texto.encode() for texto in textos]
+    originais = sum(len(d) for d in dados)
+    medicoes = {}
+    for formato in formatos or formatos_disponiveis():
+        inicio = perf_counter()
+        comprimidos = [_comprimir_com(formato, d) for d in dados]
+        meio = perf_counter()
+        for comprimido in comprimidos:
+            _descomprimir_com(formato, comprimido)
+        fim = perf_counter()
+        # o cabeçalho de um byte entra no tamanho
+        tamanho = sum(len(c) + 1 for c in comprimidos)
+        megabytes = originais / 1_000_000 or 1
+        medicoes[formato] = {
+            "bytes_originais": originais,
+            "bytes_comprimidos": tamanho,
+            "economia": round(1 - tamanho / originais, 4) if originais else 0,
+            "comprimir_ms_por_mb": round((meio - inicio) * 1000 / megabytes, 2),
+            "descomprimir_ms_por_mb": round((fim - meio) * 1000 / megabytes, 2),
+        }
+    return medicoes
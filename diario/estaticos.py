@@ -0,0 +1,218 @@
+"""Arquivos estáticos com nomes por conteúdo, pré-comprimidos e com cache longo.
+
+`ArmazenamentoEstaticos` é o `ManifestStaticFilesStorage` do Django (cada
+arquivo copiado pelo `collectstatic` ganha o hash do conteúdo no nome) que
+também grava, ao lado de cada arquivo de texto, as versões `.gz` e `.br`. A
+compressão é feita uma vez, no deploy, e não a cada requisição.
+
+`servir()` entrega os arquivos de `STATIC_ROOT`, escolhendo a versão
+comprimida pelo `Accept-Encoding`. Como o nome de um arquivo com hash muda
+junto com o conteúdo, ele pode ficar em cache por um ano; os outros são
+sempre revalidados.
+
+Bootstrap e as fontes não vêm mais de CDNs: ficam no repositório, em
+`diario/static/vendor`, nas versões fixadas em `ARQUIVOS_VENDORIZADOS`, e passam
+pelo mesmo caminho. O comando `vendorizar_estaticos` baixa de novo os que
+faltarem, conferindo a integridade de cada um, e recusa os que não têm
+integridade fixada. Enquanto faltar algum, `diario.checks` avisa no
+`manage.py check`.
+"""
+
+import base64
+import gzip
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só as versões .gz são geradas
+    brotli = None
+
+EXTENSOES_COMPRIMIVEIS = {
+    ".css",
+    ".js",
+    ".map",
+    ".svg",
+    ".txt",
+    ".json",
+    ".html",
+    ".ttf",
+}
+
+# arquivos menores que isso cabem em um pacote e não compensam comprimir
+TAMANHO_MINIMO = 256
+
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "public, max-age=0, must-revalidate"
+
+# (encoding, extensão), na ordem de preferência
+CODIFICACOES = [("br", ".br"), ("gzip", ".gz")]
+
+PASTA_VENDOR = Path(__file__).resolve().parent / "static" / "vendor"
+
+# os TTF originais do Google Fonts, no commit de que foram copiados
+_FONTES = (
+    "https://raw.githubusercontent.com/google/fonts/"
+    "8f75fafed1ab9ca18c63b370b420ac81bb37a687/ofl/{arquivo}"
+)
+_BOOTSTRAP = "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/{arquivo}"
+
+# (url, destino em `vendor/`, integridade no formato SRI); `None` só enquanto o
+# hash não foi fixado: `vendorizar_estaticos --aceitar-sem-integridade` baixa o
+# arquivo e mostra o valor a colocar aqui (fixe também a versão exata na URL).
+# Todos estão no repositório; o comando só serve para atualizá-los.
+ARQUIVOS_VENDORIZADOS = [
+    (
+        _BOOTSTRAP.format(arquivo="css/bootstrap.min.css"),
+        "bootstrap/bootstrap.min.css",
+        "sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH",
+    ),
+    (
+        _BOOTSTRAP.format(arquivo="css/bootstrap.min.css.map"),
+        "bootstrap/bootstrap.min.css.map",
+        "sha384-LwyFPAYeWO3SJbG/pZ2F2/f6nZxkMKWlkH/ElWNjvUD3ILLrbzetzX8ShggJy4Of",
+    ),
+    (
+        _BOOTSTRAP.format(arquivo="js/bootstrap.bundle.min.js"),
+        "bootstrap/bootstrap.bundle.min.js",
+        "sha384-YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N6jIeHz",
+    ),
+    (
+        _BOOTSTRAP.format(arquivo="js/bootstrap.bundle.min.js.map"),
+        "bootstrap/bootstrap.bundle.min.js.map",
+        "sha384-Vgvn9G4A9CfS51jXa46jlIkMKKuYr7Yx/s0g5vKRDoo0LbYA2yj5uVeF42qc0AJf",
+    ),
+    (
+        _FONTES.format(arquivo="oxygen/Oxygen-Light.ttf"),
+        "fontes/Oxygen-Light.ttf",
+        "sha384-QFmcmPpJR6iPd7ojY4rwH6+bpp1LVAM/KRpb2UPz64UauERvHCfrsquIdRJmE3Wi",
+    ),
+    (
+        _FONTES.format(arquivo="oxygen/Oxygen-Regular.ttf"),
+        "fontes/Oxygen-Regular.ttf",
+        "sha384-ACn6jFd86ADom289xC0D4DlH+R/zwqcwuKWxpdny5oxECWDW9nFScarzvHWCApd1",
+    ),
+    (
+        _FONTES.format(arquivo="oxygen/Oxygen-Bold.ttf"),
+        "fontes/Oxygen-Bold.ttf",
+        "sha384-OmhvbAGU68mKae5IpvmTr+BQCP425PsjUxTyDUX+ndEpNUFXuezHzxjcNcz6Uda8",
+    ),
+]
+
+
+def integridade(dados: bytes, algoritmo: str = "sha384") -> str:
+    """O hash de `dados` no formato SRI (`sha384-...`)"""
+    resumo = base64.b64encode(hashlib.new(algoritmo, dados).digest()).decode()
+    return f"{algoritmo}-{resumo}"
+
+
+def vendorizados_faltando() -> list[str]:
+    """Arquivos de `ARQUIVOS_VENDORIZADOS` que ainda não foram baixados"""
+    return [
+        destino
+        for _, destino, _ in ARQUIVOS_VENDORIZADOS
+        if not (PASTA_VENDOR / destino).is_file()
+    ]
+
+
+class ArmazenamentoEstaticos(ManifestStaticFilesStorage):
+    """`ManifestStaticFilesStorage` que também grava versões .gz e .br"""
+
+    def stored_name(self, name):
+        # sem manifesto, antes do primeiro `collectstatic` (e nos testes), usa
+        # os nomes originais em vez de falhar em toda página
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nome in sorted(set(self.hashed_files.values())):
+            if os.path.splitext(nome)[1] in EXTENSOES_COMPRIMIVEIS:
+                self.comprimir(nome)
+
+    def comprimir(self, nome):
+        with self.open(nome) as arquivo:
+            dados = arquivo.read()
+        if len(dados) < TAMANHO_MINIMO:
+            return
+        versoes = {".gz": gzip.compress(dados, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            versoes[".br"] = brotli.compress(dados)
+        for extensao, comprimido in versoes.items():
+            # uma versão que não ficou menor só ocuparia espaço
+            if len(comprimido) >= len(dados):
+                continue
+            if self.exists(nome + extensao):
+                self.delete(nome + extensao)
+            self._save(nome + extensao, ContentFile(comprimido))
+
+
+def _aceita(request, codificacao: str) -> bool:
+    cabecalho = request.headers.get("Accept-Encoding", "")
+    for item in cabecalho.split(","):
+        nome, _, parametros = item.strip().partition(";")
+        if nome.strip().lower() == codificacao:
+            return parametros.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def _com_hash(caminho: str) -> bool:
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None)
+    return bool(hashed_files) and caminho in hashed_files.values()
+
+
+@require_safe
+def servir(request, caminho):
+    """Entrega um arquivo de `STATIC_ROOT`, comprimido quando possível"""
+    if not settings.STATIC_ROOT:
+        raise Http404("STATIC_ROOT não configurado.")
+    try:
+        completo = Path(safe_join(settings.STATIC_ROOT, caminho))
+    except SuspiciousFileOperation:
+        raise Http404("Arquivo não encontrado.")
+    if not completo.is_file() or completo.suffix in (".gz", ".br"):
+        raise Http404("Arquivo não encontrado.")
+
+    estado = completo.stat()
+    if not was_modified_since(
+        request.headers.get("If-Modified-Since"), estado.st_mtime
+    ):
+        return HttpResponseNotModified()
+
+    entregue, codificacao = completo, None
+    for nome, extensao in CODIFICACOES:
+        variante = completo.with_name(completo.name + extensao)
+        if _aceita(request, nome) and variante.is_file():
+            entregue, codificacao = variante, nome
+            break
+
+    tipo, _ = mimetypes.guess_type(completo.name)
+    resposta = FileResponse(
+        entregue.open("rb"), content_type=tipo or "application/octet-stream"
+    )
+    if codificacao:
+        resposta["Content-Encoding"] = codificacao
+    resposta["Vary"] = "Accept-Encoding"
+    resposta["Last-Modified"] = http_date(estado.st_mtime)
+    resposta["Cache-Control"] = (
+        CACHE_IMUTAVEL if _com_hash(caminho) else CACHE_REVALIDAR
+    )
+    return resposta
@@ -0,0 +1,330 @@
+"""Formatação das entradas em Markdown, com o HTML guardado ao lado do texto.
+
+`renderizar()` aceita um subconjunto do Markdown: títulos, parágrafos (cada
+quebra de linha vira `<br>`), citações, listas, blocos e trechos de código,
+linhas horizontais, ênfase e links. O texto é escapado antes de qualquer
+marcação ser aplicada, e as únicas tags geradas são as do próprio
+renderizador, então HTML digitado na entrada aparece como texto e o resultado
+não precisa de outra sanitização. Links só aceitam `http(s)`, `mailto` e
+caminhos do próprio site.
+
+Interpretar o texto a cada visita a `EntradaDetail` sairia caro, então o HTML
+fica em `Entrada.texto_html`, junto com `hash_html`, o hash do texto (e de
+`VERSAO`) de que ele foi gerado. `Entrada.save()` só renderiza de novo quando
+o hash muda, ou seja, quando o texto muda. Entradas sem HTML atualizado (ex.:
+importadas com `bulk_create()`, ou depois de mudar `VERSAO`) são renderizadas
+na leitura e guardadas no cache pelo hash, até que o comando
+`renderizar_entradas` grave o HTML de todas.
+"""
+
+import hashlib
+import re
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from . import cache
+
+# mude quando o HTML gerado mudar, para que as entradas sejam renderizadas de novo
+VERSAO = 3
+
+TAMANHO_LOTE = 500
+
+_ESQUEMAS_PERMITIDOS = ("http://", "https://", "mailto:", "/", "#")
+# `//host` e `/\host` são relativos ao protocolo e levam para outro site
+_OUTRO_SITE = ("//", "/\\")
+
+# citações mais fundas que isso viram texto, para não estourar a pilha
+PROFUNDIDADE_MAXIMA = 16
+
+_CERCA = re.compile(r"^(```|~~~)")
+# o fechamento opcional (`## Título ##`) é tirado com `rstrip()`: um `(.*?)`
+# seguido de `#*\s*$` relê a linha a cada `#` de uma sequência longa
+_TITULO = re.compile(r"^(#{1,6})\s+(.*)$")
+_LINHA = re.compile(r"^ {0,3}([-*_])(\s*\1){2,}\s*$")
+_CITACAO = re.compile(r"^ {0,3}>\s?")
+_ITEM = re.compile(r"^ {0,3}(?:([-*+])|(\d{1,9})[.)])\s+")
+
+_CODIGO = re.compile(r"(`+)(.+?)\1", re.S)
+# rótulo e endereço não passam de um colchete, então cada tentativa para no
+# próximo `[` e o texto é percorrido uma vez só, mesmo sem nenhum link fechado
+_LINK = re.compile(r"\[([^\[\]]+)\]\(([^)\s\[\]]+)\)")
+_DELIMITADOR = re.compile(r"\*+|_+")
+_RESERVADO = "\x00"
+_RESERVA = re.compile(f"{_RESERVADO}(\\d+){_RESERVADO}")
+
+
+def hash_do_texto(texto: str) -> str:
+    dados = f"{VERSAO}:{texto}".encode()
+    return hashlib.blake2b(dados, digest_size=16).hexdigest()
+
+
+def _url_segura(url: str) -> bool:
+    # o texto já foi escapado, então aspas e `<` não chegam aqui; caracteres
+    # de controle poderiam esconder um `javascript:` do navegador
+    return (
+        url.startswith(_ESQUEMAS_PERMITIDOS)
+        and not url.startswith(_OUTRO_SITE)
+        and not any(ord(c) < 32 for c in url)
+    )
+
+
+class _Delimitador:
+    """Uma sequência de `*` ou `_` e as tags que ela acabou abrindo e fechando"""
+
+    def __init__(self, caractere, tamanho):
+        self.caractere = caractere
+        self.restantes = tamanho
+        self.aberturas = []
+        self.fechamentos = []
+
+    def __str__(self):
+        # as primeiras tags casadas são as mais internas, junto do texto que
+        # elas marcam, e o que sobrou da sequência fica do lado de fora
+        fechamentos = "".join(self.fechamentos)
+        literal = self.caractere * self.restantes
+        return f"{fechamentos}{literal}{''.join(reversed(self.aberturas))}"
+
+
+def _enfase(texto: str) -> str:
+    """Aplica `**negrito**` e `*itálico*` (ou com `_`) em uma passada só.
+
+    Segue, simplificado, o algoritmo de delimitadores do CommonMark: uma
+    sequência abre se vem antes de um caractere que não é espaço e fecha se
+    vem depois de um, e com `_` não pode estar no meio de uma palavra. Cada
+    uma que fecha procura a última aberta com o mesmo caractere, e as que
+    sobraram entre as duas viram texto; uma busca que falha não é refeita.
+    Assim nenhum trecho é relido, ao contrário de uma expressão regular com
+    `.+?`, que relê o resto do texto a cada marcador sem par.
+    """
+    partes = []
+    abertas = []
+    # abaixo dessa posição de `abertas` não há nada que feche com o caractere
+    limite = {"*": 0, "_": 0}
+    inicio = 0
+    for sequencia in _DELIMITADOR.finditer(texto):
+        comeco, fim = sequencia.span()
+        antes = texto[comeco - 1] if comeco else " "
+        depois = texto[fim] if fim < len(texto) else " "
+        atual = _Delimitador(sequencia.group()[0], fim - comeco)
+        abre = not depois.isspace()
+        fecha = not antes.isspace()
+        if atual.caractere == "_":
+            abre = abre and not antes.isalnum()
+            fecha = fecha and not depois.isalnum()
+        partes += [texto[inicio:comeco], atual]
+        inicio = fim
+
+        while fecha and atual.restantes:
+            i = len(abertas) - 1
+            while i >= limite[atual.caractere]:
+                if abertas[i].caractere == atual.caractere:
+                    break
+                i -= 1
+            else:
+                limite[atual.caractere] = len(abertas)
+                break
+            aberta = abertas[i]
+            del abertas[i + 1 :]
+            usados = 2 if aberta.restantes >= 2 and atual.restantes >= 2 else 1
+            tag = "strong" if usados == 2 else "em"
+            aberta.restantes -= usados
+            atual.restantes -= usados
+            aberta.aberturas.append(f"<{tag}>")
+            atual.fechamentos.append(f"</{tag}>")
+            if not aberta.restantes:
+                abertas.pop()
+            for caractere in limite:
+                limite[caractere] = min(limite[caractere], len(abertas))
+        if abre and atual.restantes:
+            abertas.append(atual)
+    partes.append(texto[inicio:])
+    return "".join(map(str, partes))
+
+
+def _inline(texto: str) -> str:
+    """Escapa `texto` e aplica código, links e ênfase"""
+    texto = escape(texto)
+    trechos = []
+
+    def reservar(html):
+        trechos.append(html)
+        return f"{_RESERVADO}{len(trechos) - 1}{_RESERVADO}"
+
+    def restaurar(texto):
+        return _RESERVA.sub(lambda m: trechos[int(m.group(1))], texto)
+
+    # o código é reservado primeiro, para que nada dentro dele vire marcação
+    texto = _CODIGO.sub(lambda m: reservar(f"<code>{m.group(2).strip()}</code>"), texto)
+
+    def link(m):
+        rotulo, url = m.groups()
+        if not _url_segura(url):
+            return m.group(0)
+        # o link inteiro é reservado, para que a ênfase não atravesse o <a>
+        rotulo = restaurar(_enfase(rotulo))
+        return reservar(f'<a href="{url}" rel="nofollow noopener">{rotulo}</a>')
+
+    texto = _LINK.sub(link, texto)
+    return restaurar(_enfase(texto))
+
+
+def _paragrafo(linhas: list[str]) -> str:
+    return "<p>" + "<br>\n".join(_inline(linha.strip()) for linha in linhas) + "</p>"
+
+
+def _lista(linhas: list[str]) -> str:
+    ordenada = _ITEM.match(linhas[0]).group(2) is not None
+    itens = []
+    for linha in linhas:
+        item = _ITEM.match(linha)
+        if item:
+            itens.append([linha[item.end() :]])
+        else:  # continuação do item anterior
+            itens[-1].append(linha.strip())
+    tag = "ol" if ordenada else "ul"
+    conteudo = "".join(
+        "<li>" + "<br>\n".join(map(_inline, item)) + "</li>" for item in itens
+    )
+    return f"<{tag}>{conteudo}</{tag}>"
+
+
+def _blocos(linhas: list[str], profundidade: int = 0) -> list[str]:
+    # cada nível de citação chama `_blocos()` de novo, até `PROFUNDIDADE_MAXIMA`
+    citacao = _CITACAO if profundidade < PROFUNDIDADE_MAXIMA else None
+    html = []
+    i = 0
+    while i < len(linhas):
+        linha = linhas[i]
+        if not linha.strip():
+            i += 1
+            continue
+
+        if cerca := _CERCA.match(linha):
+            fim = i + 1
+            while fim < len(linhas) and not linhas[fim].startswith(cerca.group(1)):
+                fim += 1
+            codigo = escape("\n".join(linhas[i + 1 : fim]))
+            html.append(f"<pre><code>{codigo}</code></pre>")
+            i = fim + 1
+            continue
+
+        if titulo := _TITULO.match(linha):
+            # o <h1> da página é o tópico, então os títulos começam no <h2>
+            nivel = min(len(titulo.group(1)) + 1, 6)
+            texto = titulo.group(2).rstrip().rstrip("#").rstrip()
+            html.append(f"<h{nivel}>{_inline(texto)}</h{nivel}>")
+            i += 1
+            continue
+
+        if _LINHA.match(linha):
+            html.append("<hr>")
+            i += 1
+            continue
+
+        if citacao and citacao.match(linha):
+            citadas = []
+            while i < len(linhas) and citacao.match(linhas[i]):
+                citadas.append(citacao.sub("", linhas[i], count=1))
+                i += 1
+            conteudo = "".join(_blocos(citadas, profundidade + 1))
+            html.append(f"<blockquote>{conteudo}</blockquote>")
+            continue
+
+        if _ITEM.match(linha):
+            itens = []
+            while i < len(linhas) and linhas[i].strip():
+                if not _ITEM.match(linhas[i]) and not linhas[i].startswith(" "):
+                    break
+                itens.append(linhas[i])
+                i += 1
+            html.append(_lista(itens))
+            continue
+
+        paragrafo = []
+        while i < len(linhas) and linhas[i].strip():
+            if paragrafo and (
+                _TITULO.match(linhas[i])
+                or _LINHA.match(linhas[i])
+                or _CERCA.match(linhas[i])
+                or (citacao and citacao.match(linhas[i]))
+                or _ITEM.match(linhas[i])
+            ):
+                break
+            paragrafo.append(linhas[i])
+            i += 1
+        html.append(_paragrafo(paragrafo))
+    return html
+
+
+def renderizar(texto: str) -> SafeString:
+    """Converte o Markdown de `texto` em HTML seguro para o template"""
+    # o caractere nulo marca os trechos reservados em `_inline()`
+    texto = texto.replace(_RESERVADO, "")
+    linhas = texto.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return mark_safe("\n".join(_blocos(linhas)))
+
+
+def atualizar_html(entrada) -> bool:
+    """Renderiza o texto de `entrada` se ele mudou desde a última vez"""
+    novo_hash = hash_do_texto(entrada.texto_entrada)
+    if entrada.hash_html == novo_hash:
+        return False
+    entrada.texto_html = renderizar(entrada.texto_entrada)
+    entrada.hash_html = novo_hash
+    return True
+
+
+def html_da_entrada(entrada) -> SafeString:
+    """O HTML de `entrada`, gravado se estiver atualizado ou do cache"""
+    chave = hash_do_texto(entrada.texto_entrada)
+    if entrada.hash_html == chave:
+        return mark_safe(entrada.texto_html)
+    html = cache.buscar_html(chave)
+    if html is None:
+        html = renderizar(entrada.texto_entrada)
+        cache.guardar_html(chave, html)
+    return mark_safe(html)
+
+
+async def ahtml_da_entrada(entrada) -> SafeString:
+    chave = hash_do_texto(entrada.texto_entrada)
+    if entrada.hash_html == chave:
+        return mark_safe(entrada.texto_html)
+    html = await cache.abuscar_html(chave)
+    if html is None:
+        html = renderizar(entrada.texto_entrada)
+        await cache.aguardar_html(chave, html)
+    return mark_safe(html)
+
+
+def renderizar_pendentes(
+    lote=TAMANHO_LOTE, progresso=None, using=DEFAULT_DB_ALIAS
+) -> int:
+    """Grava o HTML das entradas sem HTML atualizado; retorna quantas eram.
+
+    Percorre a tabela em lotes por faixa de id, cada um na sua transação, e
+    só renderiza as entradas cujo hash não bate com o texto.
+    `progresso(ultimo_id, renderizadas)` é chamado a cada lote.
+    """
+    from .models import Entrada
+
+    entradas = (
+        Entrada.objects.using(using)
+        .only("pk", "texto_entrada", "hash_html")
+        .order_by("pk")
+    )
+    renderizadas = 0
+    ultimo = 0
+    while lote_atual := list(entradas.filter(pk__gt=ultimo)[:lote]):
+        ultimo = lote_atual[-1].pk
+        mudadas = [entrada for entrada in lote_atual if atualizar_html(entrada)]
+        with transaction.atomic(using=using):
+            Entrada.objects.using(using).bulk_update(
+                mudadas, ["texto_html", "hash_html"]
+            )
+        renderizadas += len(mudadas)
+        if progresso is not None:
+            progresso(ultimo, renderizadas)
+    return renderizadas
@@ -1,9 +1,32 @@
+from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
+from django.core.validators import MaxLengthValidator
 
-from .models import Usuario
+from .models import Entrada, Usuario
 
 
 class UsuarioCreationForm(UserCreationForm):
     class Meta:
         model = Usuario
         fields = ["username", "email", "password1", "password2"]
+
+
+class EntradaForm(forms.ModelForm):
+    """Criação e edição de entradas pelo site.
+
+    O texto é convertido para HTML dentro da própria requisição, então o
+    tamanho fica limitado a `DIARIO_TAMANHO_MAXIMO_ENTRADA` caracteres.
+    """
+
+    class Meta:
+        model = Entrada
+        fields = ["texto_entrada"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        maximo = settings.DIARIO_TAMANHO_MAXIMO_ENTRADA
+        campo = self.fields["texto_entrada"]
+        campo.max_length = maximo
+        campo.validators.append(MaxLengthValidator(maximo))
+        campo.widget.attrs["maxlength"] = str(maximo)
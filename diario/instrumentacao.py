@@ -0,0 +1,288 @@
+"""Medição de desempenho por requisição.
+
+Quando `DIARIO_INSTRUMENTACAO` está ligado, `InstrumentacaoMiddleware` mede o
+tempo total de cada requisição, o número e o tempo das consultas SQL e o tempo
+de renderização dos templates. O resultado vai para o cabeçalho
+`Server-Timing`, para o log `diario.instrumentacao` (requisições e consultas
+acima dos limites configurados) e para histogramas por rota, somados em
+`MetricaRota` e expostos em `estatisticas_rotas()`.
+
+Os histogramas são somados primeiro na memória do processo e só vão para o
+banco a cada `DIARIO_METRICAS_LOTE` requisições ou `DIARIO_METRICAS_INTERVALO_S`
+segundos, o que vier antes, com um `UPDATE` por rota em vez de um por
+requisição. O que estiver pendente quando o processo terminar se perde, e
+`/monitoramento/rotas` só vê na hora as pendências do próprio processo.
+
+A medição da requisição atual fica em uma `ContextVar`, que acompanha a
+requisição inclusive nas threads do `sync_to_async`. Por isso o wrapper de SQL
+e a medição dos templates podem ser instalados uma vez, para todas as
+conexões e templates, e simplesmente não fazem nada fora de uma requisição.
+"""
+
+import json
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import monotonic, perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import IntegrityError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.template.base import Template
+
+from .models import MetricaRota
+
+logger = logging.getLogger("diario.instrumentacao")
+
+# limites superiores (ms) das faixas dos histogramas, com um campo de
+# `MetricaRota` para cada
+FAIXAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+ROTA_NAO_RESOLVIDA = "<nao-resolvida>"
+
+_medicao_atual = ContextVar("diario_medicao_atual", default=None)
+
+
+@dataclass
+class Medicao:
+    caminho: str
+    inicio: float = field(default_factory=perf_counter)
+    consultas: int = 0
+    tempo_sql: float = 0.0
+    tempo_templates: float = 0.0
+    renderizando: bool = False
+
+
+def _ms(segundos: float) -> float:
+    return round(segundos * 1000, 2)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracao = perf_counter() - inicio
+        medicao.consultas += 1
+        medicao.tempo_sql += duracao
+        if duracao * 1000 >= settings.DIARIO_LIMITE_CONSULTA_LENTA_MS:
+            _registrar_log(
+                "consulta_lenta",
+                caminho=medicao.caminho,
+                banco=context["connection"].alias,
+                duracao_ms=_ms(duracao),
+                sql=str(sql)[:1000],
+            )
+
+
+def _instalar_em_conexao(connection, **kwargs):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+_render_original = Template.render
+
+
+def _render_medido(self, context):
+    medicao = _medicao_atual.get()
+    # templates incluídos por outro já estão contados no tempo dele
+    if medicao is None or medicao.renderizando:
+        return _render_original(self, context)
+    medicao.renderizando = True
+    inicio = perf_counter()
+    try:
+        return _render_original(self, context)
+    finally:
+        medicao.renderizando = False
+        medicao.tempo_templates += perf_counter() - inicio
+
+
+def instalar():
+    """Liga as medições de SQL e de templates; pode ser chamado mais de uma vez"""
+    connection_created.connect(
+        _instalar_em_conexao, dispatch_uid="diario_instrumentacao"
+    )
+    for connection in connections.all(initialized_only=True):
+        _instalar_em_conexao(connection)
+    Template.render = _render_medido
+
+
+def _registrar_log(evento, **dados):
+    logger.warning(json.dumps({"evento": evento, **dados}, ensure_ascii=False))
+
+
+def _faixa(duracao_ms: float) -> str:
+    for limite in FAIXAS_MS:
+        if duracao_ms <= limite:
+            return f"ate_{limite}ms"
+    return "acima"
+
+
+class _MetricasPendentes:
+    """Somas por rota ainda não gravadas em `MetricaRota`"""
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        self.por_rota = defaultdict(Counter)
+        self.requisicoes = 0
+        self.desde = monotonic()
+
+    def acumular(self, rota, duracao_ms, consultas) -> bool:
+        """Soma uma requisição; retorna se já está na hora de gravar"""
+        with self.trava:
+            somas = self.por_rota[rota]
+            somas["requisicoes"] += 1
+            somas[_faixa(duracao_ms)] += 1
+            somas["tempo_us"] += round(duracao_ms * 1000)
+            somas["consultas"] += consultas
+            self.requisicoes += 1
+            return (
+                self.requisicoes >= settings.DIARIO_METRICAS_LOTE
+                or monotonic() - self.desde >= settings.DIARIO_METRICAS_INTERVALO_S
+            )
+
+    def retirar(self) -> dict:
+        with self.trava:
+            por_rota = self.por_rota
+            self.limpar()
+        return por_rota
+
+
+_pendentes = _MetricasPendentes()
+
+
+def _gravar_metricas(rota, somas):
+    """Soma `somas` às métricas da rota, criando a linha se preciso"""
+    metricas = MetricaRota.objects.filter(rota=rota)
+    expressoes = {campo: F(campo) + valor for campo, valor in somas.items()}
+    if metricas.update(**expressoes):
+        return
+    try:
+        with transaction.atomic():
+            MetricaRota.objects.create(rota=rota, **somas)
+    except IntegrityError:
+        # outro processo criou a mesma linha ao mesmo tempo
+        metricas.update(**expressoes)
+
+
+def descarregar_metricas():
+    """Grava no banco as métricas pendentes deste processo"""
+    for rota, somas in _pendentes.retirar().items():
+        _gravar_metricas(rota, somas)
+
+
+def _finalizar(request, resposta, medicao):
+    """Preenche o `Server-Timing` e os logs; retorna `(rota, duracao_ms)`"""
+    duracao = perf_counter() - medicao.inicio
+    duracao_ms = _ms(duracao)
+    correspondencia = getattr(request, "resolver_match", None)
+    rota = correspondencia.view_name if correspondencia else ROTA_NAO_RESOLVIDA
+
+    resposta["Server-Timing"] = ", ".join(
+        [
+            f"total;dur={duracao_ms}",
+            f'sql;dur={_ms(medicao.tempo_sql)};desc="{medicao.consultas} consultas"',
+            f"templates;dur={_ms(medicao.tempo_templates)}",
+        ]
+    )
+    if duracao_ms >= settings.DIARIO_LIMITE_REQUISICAO_LENTA_MS:
+        _registrar_log(
+            "requisicao_lenta",
+            rota=rota,
+            metodo=request.method,
+            caminho=request.path,
+            status=resposta.status_code,
+            duracao_ms=duracao_ms,
+            consultas=medicao.consultas,
+            sql_ms=_ms(medicao.tempo_sql),
+            templates_ms=_ms(medicao.tempo_templates),
+        )
+    return rota, duracao_ms
+
+
+class InstrumentacaoMiddleware:
+    """Mede cada requisição; fica fora da pilha se `DIARIO_INSTRUMENTACAO` for falso"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DIARIO_INSTRUMENTACAO:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+        instalar()
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        medicao = Medicao(request.path)
+        token = _medicao_atual.set(medicao)
+        try:
+            resposta = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        rota, duracao_ms = _finalizar(request, resposta, medicao)
+        if _pendentes.acumular(rota, duracao_ms, medicao.consultas):
+            descarregar_metricas()
+        return resposta
+
+    async def __acall__(self, request):
+        medicao = Medicao(request.path)
+        token = _medicao_atual.set(medicao)
+        try:
+            resposta = await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        rota, duracao_ms = _finalizar(request, resposta, medicao)
+        if _pendentes.acumular(rota, duracao_ms, medicao.consultas):
+            await sync_to_async(descarregar_metricas)()
+        return resposta
+
+
+def _faixa_do_percentil(faixas: dict, total: int, fracao: float):
+    """Limite superior da faixa onde está o percentil, ou `None` se acima de todas"""
+    acumulado = 0
+    for limite in FAIXAS_MS:
+        acumulado += faixas[f"ate_{limite}ms"]
+        if acumulado >= total * fracao:
+            return limite
+    return None
+
+
+def estatisticas_rotas() -> dict:
+    """Histograma, tempo médio e consultas médias de cada rota já medida"""
+    descarregar_metricas()
+    faixas_campos = [f"ate_{limite}ms" for limite in FAIXAS_MS] + ["acima"]
+    dados = {}
+    for metricas in MetricaRota.objects.order_by("rota").values():
+        total = metricas["requisicoes"]
+        if not total:
+            continue
+        faixas = {campo: metricas[campo] for campo in faixas_campos}
+        dados[metricas["rota"]] = {
+            "requisicoes": total,
+            "media_ms": round(metricas["tempo_us"] / total / 1000, 2),
+            "media_consultas": round(metricas["consultas"] / total, 2),
+            "p50_ate_ms": _faixa_do_percentil(faixas, total, 0.50),
+            "p95_ate_ms": _faixa_do_percentil(faixas, total, 0.95),
+            "histograma": faixas,
+        }
+    return dados
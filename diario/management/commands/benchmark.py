@@ -0,0 +1,173 @@
+import json
+from dataclasses import asdict
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from diario.benchmark import Volumes, comparar, medir, montar_cenarios, popular
+from diario.models import Usuario
+
+BASE_PADRAO = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula um banco temporário com volumes realistas e mede latência "
+        "(p50/p95/p99), consultas e pico de memória das páginas principais, "
+        "comparando com uma linha de base salva em JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=500)
+        parser.add_argument("--topicos", type=int, default=1000)
+        parser.add_argument("--entradas", type=int, default=50_000)
+        parser.add_argument("--semente", type=int, default=0)
+        parser.add_argument(
+            "--repeticoes",
+            type=int,
+            default=30,
+            help="Requisições medidas por cenário.",
+        )
+        parser.add_argument(
+            "--cenarios",
+            help="Cenários a executar, separados por vírgula (padrão: todos).",
+        )
+        parser.add_argument(
+            "--com-cache",
+            action="store_true",
+            help="Mede com o cache de fragmentos ligado (por padrão, desligado "
+            "para medir o custo das consultas).",
+        )
+        parser.add_argument("--baseline", type=Path, default=BASE_PADRAO)
+        parser.add_argument(
+            "--tolerancia",
+            type=float,
+            default=0.3,
+            help="Piora aceita na latência mediana e na memória, ex.: 0.3 para 30%%.",
+        )
+        parser.add_argument(
+            "--folga-ms",
+            type=float,
+            default=5,
+            help="Piora absoluta aceita na latência, além da tolerância.",
+        )
+        parser.add_argument(
+            "--salvar-baseline",
+            action="store_true",
+            help="Grava os resultados como a nova linha de base.",
+        )
+
+    def handle(self, *args, **options):
+        volumes = Volumes(options["usuarios"], options["topicos"], options["entradas"])
+
+        # nada aqui pode tocar nos dados ou no cache reais: o banco é o de
+        # testes, criado e destruído pelo comando, e o cache é só local
+        isolamento = override_settings(
+            DIARIO_REPLICAS=[],
+            DIARIO_CACHE_FRAGMENTOS=options["com_cache"],
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "benchmark",
+                }
+            },
+        )
+        setup_test_environment()
+        isolamento.enable()
+        conexao = connections[DEFAULT_DB_ALIAS]
+        nome_original = conexao.settings_dict["NAME"]
+        conexao.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            resultados = self.executar(volumes, options)
+        finally:
+            conexao.creation.destroy_test_db(nome_original, verbosity=0)
+            isolamento.disable()
+            teardown_test_environment()
+
+        self.relatar(resultados)
+        self.verificar(volumes, resultados, options)
+
+    def executar(self, volumes, options):
+        inicio = perf_counter()
+        popular(volumes, semente=options["semente"])
+        self.stderr.write(
+            f"{volumes.entradas} entradas, {volumes.topicos} tópicos e "
+            f"{volumes.usuarios} usuários criados em {perf_counter() - inicio:.1f}s."
+        )
+
+        cenarios = montar_cenarios()
+        if options["cenarios"]:
+            pedidos = {nome.strip() for nome in options["cenarios"].split(",")}
+            desconhecidos = pedidos - {cenario.nome for cenario in cenarios}
+            if desconhecidos:
+                raise CommandError(
+                    f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}"
+                )
+            cenarios = [cenario for cenario in cenarios if cenario.nome in pedidos]
+
+        anonimo = Client()
+        logado = Client()
+        logado.force_login(Usuario.objects.order_by("pk").first())
+
+        resultados = {}
+        for cenario in cenarios:
+            cliente = logado if cenario.logado else anonimo
+            resultados[cenario.nome] = medir(cliente, cenario, options["repeticoes"])
+        return resultados
+
+    def relatar(self, resultados):
+        self.stdout.write(
+            f"{'cenário':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'consultas':>11}{'memória KiB':>13}"
+        )
+        for nome, resultado in resultados.items():
+            self.stdout.write(
+                f"{nome:<26}{resultado.p50:>9.2f}{resultado.p95:>9.2f}"
+                f"{resultado.p99:>9.2f}{resultado.consultas:>11}"
+                f"{resultado.memoria_kib:>13.1f}"
+            )
+
+    def verificar(self, volumes, resultados, options):
+        caminho = options["baseline"]
+        dados = {
+            "volumes": asdict(volumes),
+            "com_cache": options["com_cache"],
+            "cenarios": {nome: asdict(r) for nome, r in resultados.items()},
+        }
+        if options["salvar_baseline"]:
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            caminho.write_text(json.dumps(dados, indent=2, ensure_ascii=False) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Linha de base salva em {caminho}."))
+            return
+
+        if not caminho.exists():
+            self.stdout.write(f"Sem linha de base em {caminho}; nada a comparar.")
+            return
+        base = json.loads(caminho.read_text())
+        if (base["volumes"], base["com_cache"]) != (
+            dados["volumes"],
+            dados["com_cache"],
+        ):
+            self.stdout.write(
+                self.style.WARNING(
+                    "A linha de base foi medida com outros volumes ou outra "
+                    "configuração de cache; nada a comparar."
+                )
+            )
+            return
+
+        regressoes = comparar(
+            resultados, base["cenarios"], options["tolerancia"], options["folga_ms"]
+        )
+        if regressoes:
+            raise CommandError(
+                "Regressões em relação à linha de base:\n" + "\n".join(regressoes)
+            )
+        self.stdout.write(
+            self.style.SUCCESS("Sem regressões em relação à linha de base.")
+        )
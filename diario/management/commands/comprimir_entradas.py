@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.expressions import RawSQL
+
+from diario.compressao import (
+    TAMANHO_LOTE,
+    estado_armazenamento,
+    medir,
+    recomprimir,
+)
+from diario.models import Entrada
+
+
+class Command(BaseCommand):
+    help = (
+        "Regrava em lotes o texto das entradas no formato de `DIARIO_COMPRESSAO` "
+        "(comprimindo, trocando o algoritmo ou descomprimindo), ou mostra um "
+        "relatório do espaço economizado e do custo de CPU."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--relatorio",
+            action="store_true",
+            help="Não regrava nada; mostra o espaço ocupado e mede cada algoritmo.",
+        )
+        parser.add_argument(
+            "--amostra",
+            type=int,
+            default=500,
+            help="Entradas recentes usadas para medir os algoritmos no relatório.",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=TAMANHO_LOTE,
+            help="Entradas lidas por transação.",
+        )
+        parser.add_argument(
+            "--pausa",
+            type=float,
+            default=0.0,
+            help="Segundos de espera entre os lotes, para não segurar o banco.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Banco de dados a ser usado.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if options["relatorio"]:
+            self.relatorio(options["amostra"], using)
+            return
+
+        self.verbosidade = options["verbosity"]
+        total = recomprimir(
+            lote=options["lote"],
+            pausa=options["pausa"],
+            progresso=self.relatar,
+            using=using,
+        )
+        formato = settings.DIARIO_COMPRESSAO or "sem compressão"
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} entrada(s) regravada(s) ({formato}).")
+        )
+
+    def relatar(self, ultimo, regravadas):
+        if self.verbosidade > 1:
+            self.stdout.write(f"até o id {ultimo}: {regravadas} regravada(s)")
+
+    def relatorio(self, amostra, using):
+        minimo = settings.DIARIO_COMPRESSAO_MINIMO
+        self.stdout.write(
+            f"Configuração: {settings.DIARIO_COMPRESSAO or 'sem compressão'}, "
+            f"a partir de {minimo} bytes"
+        )
+        self.stdout.write("\nNo banco:")
+        for formato, dados in sorted(estado_armazenamento(using).items()):
+            originais = dados["bytes_originais"]
+            economia = 1 - dados["bytes_guardados"] / originais if originais else 0
+            self.stdout.write(
+                f"  {formato}: {dados['entradas']} entrada(s), "
+                f"{dados['bytes_guardados']} de {originais} bytes "
+                f"({economia:.1%} economizado)"
+            )
+
+        # as entradas mais recentes, pelo índice da chave primária
+        textos = list(
+            Entrada.objects.using(using)
+            .annotate(
+                tamanho=RawSQL("length(CAST(diario_texto(texto_entrada) AS BLOB))", [])
+            )
+            .filter(tamanho__gte=minimo)
+            .order_by("-pk")
+            .values_list("texto_entrada", flat=True)[:amostra]
+        )
+        self.stdout.write(
+            f"\nMedição em {len(textos)} entrada(s) recentes com {minimo} bytes ou mais:"
+        )
+        for formato, medicao in medir(textos).items():
+            self.stdout.write(
+                f"  {formato}: {medicao['bytes_comprimidos']} de "
+                f"{medicao['bytes_originais']} bytes "
+                f"({medicao['economia']:.1%} economizado), "
+                f"comprimir {medicao['comprimir_ms_por_mb']} ms/MB, "
+                f"descomprimir {medicao['descomprimir_ms_por_mb']} ms/MB"
+            )
@@ -0,0 +1,105 @@
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from diario.transferencia import (
+    MODELOS,
+    EscritorCSV,
+    EscritorJSONL,
+    linhas_exportadas,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta usuários, tópicos e entradas em JSONL (um arquivo só) ou CSV "
+        "(um arquivo por modelo), lendo o banco em blocos para usar memória "
+        "constante."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "saida",
+            help=(
+                "Arquivo JSONL (ou `-` para a saída padrão). No formato CSV, a "
+                "pasta onde serão criados usuario.csv, topico.csv e entrada.csv."
+            ),
+        )
+        parser.add_argument("--formato", choices=["jsonl", "csv"], default="jsonl")
+        parser.add_argument(
+            "--modelos",
+            default=",".join(MODELOS),
+            help="Modelos a exportar, separados por vírgula (padrão: todos).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Linhas lidas do banco por vez.",
+        )
+        parser.add_argument(
+            "--sem-senhas",
+            action="store_true",
+            help="Não exporta os hashes de senha; os usuários importados "
+            "precisarão redefini-las.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        modelos = [m.strip() for m in options["modelos"].split(",") if m.strip()]
+        desconhecidos = set(modelos) - set(MODELOS)
+        if desconhecidos:
+            raise CommandError(f"Modelos desconhecidos: {', '.join(desconhecidos)}")
+        # mantém a ordem das chaves estrangeiras, qualquer que seja a pedida
+        modelos = [m for m in MODELOS if m in modelos]
+
+        inicio = perf_counter()
+        if options["formato"] == "jsonl":
+            total = self.exportar_jsonl(options["saida"], modelos, options)
+        else:
+            total = self.exportar_csv(Path(options["saida"]), modelos, options)
+
+        duracao = perf_counter() - inicio
+        self.stderr.write(
+            f"{total} linhas exportadas em {duracao:.1f}s "
+            f"({total / duracao if duracao else 0:.0f} linhas/s)."
+        )
+
+    def linhas(self, modelo, options):
+        return linhas_exportadas(
+            modelo,
+            chunk_size=options["chunk_size"],
+            using=options["database"],
+            sem_senhas=options["sem_senhas"],
+        )
+
+    def exportar_jsonl(self, saida, modelos, options):
+        if saida == "-":
+            return self.escrever_jsonl(sys.stdout, modelos, options)
+        with open(saida, "w", encoding="utf-8") as arquivo:
+            return self.escrever_jsonl(arquivo, modelos, options)
+
+    def escrever_jsonl(self, arquivo, modelos, options):
+        escritor = EscritorJSONL(arquivo)
+        total = 0
+        for modelo in modelos:
+            for linha in self.linhas(modelo, options):
+                escritor.escrever(modelo, linha)
+                total += 1
+        return total
+
+    def exportar_csv(self, pasta, modelos, options):
+        pasta.mkdir(parents=True, exist_ok=True)
+        total = 0
+        for modelo in modelos:
+            with open(
+                pasta / f"{modelo}.csv", "w", encoding="utf-8", newline=""
+            ) as arquivo:
+                escritor = EscritorCSV(arquivo, modelo)
+                for linha in self.linhas(modelo, options):
+                    escritor.escrever(modelo, linha)
+                    total += 1
+        return total
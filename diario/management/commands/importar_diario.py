@@ -0,0 +1,84 @@
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from diario.transferencia import MODELOS, Importador, ler_csv, ler_jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa usuários, tópicos e entradas gerados por `exportar_diario`, em "
+        "lotes com `bulk_create()` e uma transação por lote. O que já existe "
+        "é mantido, então importar o mesmo arquivo de novo não duplica nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "arquivos",
+            nargs="+",
+            help=(
+                "Arquivos .jsonl ou .csv. O modelo de um CSV vem do nome do "
+                "arquivo (usuario.csv, topico.csv, entrada.csv); passe os "
+                "arquivos nessa ordem."
+            ),
+        )
+        parser.add_argument(
+            "--lote", type=int, default=1000, help="Linhas gravadas por transação."
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        importador = Importador(lote=options["lote"], using=options["database"])
+        inicio = perf_counter()
+        lidas = 0
+
+        for caminho in map(Path, options["arquivos"]):
+            if not caminho.exists():
+                raise CommandError(f"Arquivo não encontrado: {caminho}")
+            with open(caminho, encoding="utf-8", newline="") as arquivo:
+                try:
+                    for modelo, linha in self.ler(caminho, arquivo):
+                        importador.adicionar(modelo, linha)
+                        lidas += 1
+                        if (
+                            lidas % (options["lote"] * 10) == 0
+                            and options["verbosity"] > 1
+                        ):
+                            self.relatar(lidas, inicio)
+                except ValueError as erro:
+                    raise CommandError(f"{caminho}: {erro}")
+            # um arquivo pode depender das linhas do anterior
+            importador.gravar()
+
+        duracao = perf_counter() - inicio
+        resumo = ", ".join(
+            f"{importador.importadas[modelo]} {modelo}(s)" for modelo in MODELOS
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{lidas} linhas lidas em {duracao:.1f}s "
+                f"({lidas / duracao if duracao else 0:.0f} linhas/s): {resumo}."
+            )
+        )
+        if importador.ignoradas:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{importador.ignoradas} linha(s) ignorada(s) por falta de "
+                    "usuário ou tópico."
+                )
+            )
+
+    def ler(self, caminho, arquivo):
+        if caminho.suffix == ".jsonl":
+            return ler_jsonl(arquivo)
+        if caminho.suffix == ".csv" and caminho.stem in MODELOS:
+            return ler_csv(arquivo, caminho.stem)
+        raise CommandError(
+            f"Não sei importar {caminho}: use .jsonl ou usuario/topico/entrada.csv"
+        )
+
+    def relatar(self, lidas, inicio):
+        duracao = perf_counter() - inicio
+        self.stdout.write(f"{lidas} linhas ({lidas / duracao:.0f} linhas/s)...")
@@ -0,0 +1,50 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from diario.tarefas import TAMANHO_LOTE, identificar_trabalhador, processar
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa as tarefas em segundo plano agendadas pelas views. Pode rodar "
+        "em vários processos ao mesmo tempo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=TAMANHO_LOTE,
+            help="Tarefas executadas por rodada, reservadas uma de cada vez.",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Não termina: procura novas tarefas a cada `--intervalo`.",
+        )
+        parser.add_argument("--intervalo", type=float, default=1)
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Banco de dados a ser usado.",
+        )
+
+    def handle(self, *args, **options):
+        trabalhador = identificar_trabalhador()
+        total = 0
+        while True:
+            executadas = processar(
+                lote=options["lote"],
+                trabalhador=trabalhador,
+                using=options["database"],
+            )
+            total += executadas
+            if executadas and options["verbosity"] > 1:
+                self.stdout.write(f"{executadas} tarefa(s) executada(s)")
+            if not executadas:
+                if not options["continuo"]:
+                    break
+                sleep(options["intervalo"])
+        self.stdout.write(self.style.SUCCESS(f"{total} tarefa(s) executada(s)."))
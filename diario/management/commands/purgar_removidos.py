@@ -0,0 +1,59 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from diario.remocao import TAMANHO_LOTE, purgar_pendentes
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove em lotes as entradas de usuários e tópicos apagados e, no fim, "
+        "os próprios objetos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=TAMANHO_LOTE,
+            help="Entradas removidas por transação.",
+        )
+        parser.add_argument(
+            "--pausa",
+            type=float,
+            default=0.05,
+            help="Segundos de espera entre os lotes, para não segurar o banco.",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Não termina: procura novas remoções a cada `--intervalo`.",
+        )
+        parser.add_argument("--intervalo", type=float, default=10)
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Banco de dados a ser usado.",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosidade = options["verbosity"]
+        while True:
+            total = purgar_pendentes(
+                lote=options["lote"],
+                pausa=options["pausa"],
+                progresso=self.relatar,
+                using=options["database"],
+            )
+            if not options["continuo"]:
+                break
+            if not total:
+                sleep(options["intervalo"])
+        self.stdout.write(self.style.SUCCESS(f"{total} remoção(ões) concluída(s)."))
+
+    def relatar(self, remocao):
+        if remocao.concluida_em:
+            self.stdout.write(f"{remocao}: concluída ({remocao.apagadas} entradas)")
+        elif self.verbosidade > 1:
+            self.stdout.write(f"{remocao}: {remocao.apagadas}/{remocao.total}")
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from diario.models import Usuario
+from diario.resumos import recalcular
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os resumos diários de entradas a partir da tabela de "
+        "entradas e corrige os que estiverem errados ou faltando."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verificar",
+            action="store_true",
+            help="Apenas lista os resumos errados, sem corrigir.",
+        )
+        parser.add_argument(
+            "--usuario",
+            action="append",
+            default=[],
+            help="Recalcula só os resumos deste usuário (pode ser repetido).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=200,
+            help="Quantos usuários recalcular por vez.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Banco de dados a ser usado.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        usuarios = Usuario.objects.using(using).order_by("pk")
+        if options["usuario"]:
+            usuarios = usuarios.filter(username__in=options["usuario"])
+
+        errados = 0
+        ultimo = 0
+        while ids := list(
+            usuarios.filter(pk__gt=ultimo).values_list("pk", flat=True)[
+                : options["lote"]
+            ]
+        ):
+            diferencas = recalcular(ids, corrigir=not options["verificar"], using=using)
+            for usuario_id, topico_id, dia, guardado, real in diferencas:
+                self.stdout.write(
+                    f"usuário {usuario_id}, tópico {topico_id}, {dia}: "
+                    f"{guardado} -> {real}"
+                )
+            errados += len(diferencas)
+            ultimo = ids[-1]
+
+        if options["verificar"]:
+            self.stdout.write(f"{errados} resumo(s) errado(s).")
+            return
+        self.stdout.write(self.style.SUCCESS(f"{errados} resumo(s) corrigido(s)."))
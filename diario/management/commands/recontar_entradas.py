@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from diario.models import Entrada, Topico
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula o contador `num_entradas` de cada tópico a partir da tabela "
+        "de entradas e corrige os que estiverem errados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verificar",
+            action="store_true",
+            help="Apenas lista os tópicos com contador errado, sem corrigir.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Banco de dados a ser usado.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        # entradas de usuários apagados já saíram do contador ao marcá-los
+        contagem = (
+            Entrada.objects.using(using)
+            .visiveis()
+            .filter(topico=OuterRef("pk"))
+            .order_by()
+            .values("topico")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+
+        with transaction.atomic(using=using):
+            errados = list(
+                Topico.objects.using(using)
+                .annotate(real=Coalesce(Subquery(contagem), 0))
+                .exclude(num_entradas=F("real"))
+                .only("pk", "slug", "num_entradas")
+                .select_for_update()
+            )
+            for topico in errados:
+                self.stdout.write(
+                    f"{topico.slug}: {topico.num_entradas} -> {topico.real}"
+                )
+                topico.num_entradas = topico.real
+
+            if options["verificar"]:
+                self.stdout.write(f"{len(errados)} tópico(s) com contador errado.")
+                return
+            Topico.objects.using(using).bulk_update(
+                errados, ["num_entradas"], batch_size=500
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(errados)} tópico(s) corrigido(s).")
+        )
@@ -0,0 +1,52 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, transaction
+
+from diario.busca import otimizar_indice, reconstruir_indice, verificar_indice
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o índice de busca das entradas a partir da tabela "
+        "`diario_entrada` e o otimiza."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--apenas-otimizar",
+            action="store_true",
+            help="Não reconstrói, só junta os segmentos do índice atual.",
+        )
+        parser.add_argument(
+            "--verificar",
+            action="store_true",
+            help="Confere se o índice está consistente com a tabela de entradas.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Banco de dados a ser usado.",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+
+        if options["verificar"]:
+            try:
+                verificar_indice(using)
+            except DatabaseError as erro:
+                raise CommandError(f"Índice de busca inconsistente: {erro}")
+            self.stdout.write(self.style.SUCCESS("Índice de busca consistente."))
+            return
+
+        inicio = perf_counter()
+        with transaction.atomic(using=using):
+            if not options["apenas_otimizar"]:
+                reconstruir_indice(using)
+            otimizar_indice(using)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Índice de busca pronto em {perf_counter() - inicio:.2f}s."
+            )
+        )
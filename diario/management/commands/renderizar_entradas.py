@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from diario.formatacao import TAMANHO_LOTE, VERSAO, renderizar_pendentes
+
+
+class Command(BaseCommand):
+    help = (
+        "Grava em lotes o HTML das entradas cujo Markdown ainda não foi "
+        "renderizado, mudou por fora do `save()` ou é de uma versão anterior "
+        "do renderizador."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=TAMANHO_LOTE,
+            help="Entradas lidas por transação.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Banco de dados a ser usado.",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosidade = options["verbosity"]
+        total = renderizar_pendentes(
+            lote=options["lote"], progresso=self.relatar, using=options["database"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{total} entrada(s) renderizada(s) (versão {VERSAO}).")
+        )
+
+    def relatar(self, ultimo, renderizadas):
+        if self.verbosidade > 1:
+            self.stdout.write(f"até o id {ultimo}: {renderizadas} renderizada(s)")
@@ -0,0 +1,61 @@
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diario.estaticos import ARQUIVOS_VENDORIZADOS, PASTA_VENDOR, integridade
+
+
+class Command(BaseCommand):
+    help = (
+        "Baixa Bootstrap e as fontes nas versões fixadas para "
+        "`diario/static/vendor`, conferindo a integridade de cada arquivo. "
+        "Rode antes do `collectstatic`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--forcar",
+            action="store_true",
+            help="Baixa de novo os arquivos que já existem.",
+        )
+        parser.add_argument(
+            "--aceitar-sem-integridade",
+            action="store_true",
+            help=(
+                "Baixa também os arquivos sem integridade fixada e mostra o hash "
+                "de cada um, para ser copiado para ARQUIVOS_VENDORIZADOS."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        baixados = 0
+        for url, destino, esperada in ARQUIVOS_VENDORIZADOS:
+            caminho = PASTA_VENDOR / destino
+            if caminho.exists() and not options["forcar"]:
+                continue
+            if esperada is None and not options["aceitar_sem_integridade"]:
+                raise CommandError(
+                    f"{destino} não tem integridade fixada em "
+                    "ARQUIVOS_VENDORIZADOS. Rode com --aceitar-sem-integridade "
+                    "para baixá-lo e ver o hash."
+                )
+            try:
+                with urlopen(url, timeout=30) as resposta:
+                    dados = resposta.read()
+            except OSError as erro:
+                raise CommandError(f"Não foi possível baixar {url}: {erro}")
+            obtida = integridade(dados, (esperada or "sha384").split("-", 1)[0])
+            if esperada is None:
+                self.stdout.write(
+                    self.style.WARNING(f"{destino}: {obtida} (fixe esse valor)")
+                )
+            elif obtida != esperada:
+                raise CommandError(f"Integridade de {url} não confere.")
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            caminho.write_bytes(dados)
+            baixados += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{destino}: {len(dados)} bytes")
+        self.stdout.write(
+            self.style.SUCCESS(f"{baixados} arquivo(s) baixado(s) para {PASTA_VENDOR}.")
+        )
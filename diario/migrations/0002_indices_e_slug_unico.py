@@ -0,0 +1,62 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:54
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def corrigir_slugs_repetidos(apps, schema_editor):
+    """Garante slugs únicos e não vazios antes de criar a restrição"""
+    Topico = apps.get_model("diario", "Topico")
+    tamanho = Topico._meta.get_field("slug").max_length
+    topicos = list(Topico.objects.order_by("pk").only("pk", "topico", "slug"))
+
+    # os slugs já preenchidos ficam como estão (são URLs em uso); só os vazios
+    # e as repetições de um slug que apareceu antes ganham um novo
+    usados = set()
+    pendentes = []
+    for topico in topicos:
+        if topico.slug and topico.slug not in usados:
+            usados.add(topico.slug)
+        else:
+            pendentes.append(topico)
+
+    for topico in pendentes:
+        base = topico.slug or slugify(topico.topico)[:tamanho].strip("-") or "topico"
+        candidato = base
+        sufixo = 2
+        while candidato in usados:
+            final = f"-{sufixo}"
+            candidato = base[: tamanho - len(final)].rstrip("-") + final
+            sufixo += 1
+        usados.add(candidato)
+        topico.slug = candidato
+
+    Topico.objects.bulk_update(pendentes, ["slug"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(corrigir_slugs_repetidos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="topico",
+            name="slug",
+            field=models.SlugField(blank=True, default="", unique=True),
+        ),
+        migrations.AddIndex(
+            model_name="entrada",
+            index=models.Index(
+                fields=["topico", "-data_pub", "-id"], name="entrada_topico_data_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="entrada",
+            index=models.Index(
+                fields=["usuario", "-data_pub", "-id"], name="entrada_usuario_data_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Topico = apps.get_model("diario", "Topico")
+    Entrada = apps.get_model("diario", "Entrada")
+    contagem = (
+        Entrada.objects.filter(topico=OuterRef("pk"))
+        .order_by()
+        .values("topico")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Topico.objects.update(num_entradas=Coalesce(Subquery(contagem), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0002_indices_e_slug_unico"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topico",
+            name="num_entradas",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="número de entradas"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topico",
+            index=models.Index(fields=["-data_pub"], name="topico_data_idx"),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:45
+
+from django.db import migrations
+
+# Índice FTS5 com conteúdo externo: o texto continua só em `diario_entrada` e
+# os gatilhos mantêm o índice sincronizado em qualquer escrita, inclusive
+# `bulk_create()` e `QuerySet.update()`, que não disparam sinais
+CRIAR_INDICE = [
+    """
+    CREATE VIRTUAL TABLE diario_entrada_fts USING fts5(
+        texto_entrada,
+        content='diario_entrada',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER diario_entrada_fts_insert AFTER INSERT ON diario_entrada BEGIN
+        INSERT INTO diario_entrada_fts(rowid, texto_entrada)
+        VALUES (new.id, new.texto_entrada);
+    END
+    """,
+    """
+    CREATE TRIGGER diario_entrada_fts_delete AFTER DELETE ON diario_entrada BEGIN
+        INSERT INTO diario_entrada_fts(diario_entrada_fts, rowid, texto_entrada)
+        VALUES ('delete', old.id, old.texto_entrada);
+    END
+    """,
+    """
+    CREATE TRIGGER diario_entrada_fts_update AFTER UPDATE OF texto_entrada
+    ON diario_entrada BEGIN
+        INSERT INTO diario_entrada_fts(diario_entrada_fts, rowid, texto_entrada)
+        VALUES ('delete', old.id, old.texto_entrada);
+        INSERT INTO diario_entrada_fts(rowid, texto_entrada)
+        VALUES (new.id, new.texto_entrada);
+    END
+    """,
+    "INSERT INTO diario_entrada_fts(diario_entrada_fts) VALUES ('rebuild')",
+]
+
+APAGAR_INDICE = [
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_update",
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_delete",
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_insert",
+    "DROP TABLE IF EXISTS diario_entrada_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0003_contador_de_entradas"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CRIAR_INDICE, APAGAR_INDICE),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0004_busca_textual"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="entrada",
+            index=models.Index(
+                fields=["topico", "data_edicao"], name="entrada_topico_edicao_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="entrada",
+            index=models.Index(
+                fields=["usuario", "data_edicao"], name="entrada_usuario_edicao_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:19
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+LOTE = 2000
+
+# no SQLite, adicionar a coluna recria `diario_entrada` e apaga os gatilhos do
+# índice de busca; o índice em si continua válido, porque os ids não mudam
+_busca = import_module("diario.migrations.0004_busca_textual")
+CRIAR_GATILHOS = [sql for sql in _busca.CRIAR_INDICE if "CREATE TRIGGER" in sql]
+APAGAR_GATILHOS = [sql for sql in _busca.APAGAR_INDICE if "DROP TRIGGER" in sql]
+
+
+def preencher_previas(apps, schema_editor):
+    # cópia de `gerar_previa()` de quando a migração foi escrita
+    Entrada = apps.get_model("diario", "Entrada")
+    entradas = Entrada.objects.using(schema_editor.connection.alias)
+    ultimo = 0
+    # em lotes por faixa de id: no SQLite não é seguro escrever na tabela
+    # enquanto um `iterator()` ainda está lendo dela
+    while lote := list(
+        entradas.filter(pk__gt=ultimo)
+        .order_by("pk")
+        .values_list("pk", "texto_entrada")[:LOTE]
+    ):
+        entradas.bulk_update(
+            [
+                Entrada(pk=pk, previa=Truncator(" ".join(texto.split())).chars(200))
+                for pk, texto in lote
+            ],
+            ["previa"],
+        )
+        ultimo = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0005_indices_data_edicao"),
+    ]
+
+    operations = [
+        # ao desfazer, a coluna é removida recriando a tabela de novo
+        migrations.RunSQL(migrations.RunSQL.noop, APAGAR_GATILHOS + CRIAR_GATILHOS),
+        migrations.AddField(
+            model_name="entrada",
+            name="previa",
+            field=models.CharField(
+                default="", editable=False, max_length=200, verbose_name="prévia"
+            ),
+        ),
+        migrations.RunSQL(APAGAR_GATILHOS + CRIAR_GATILHOS, migrations.RunSQL.noop),
+        migrations.RunPython(preencher_previas, migrations.RunPython.noop),
+    ]
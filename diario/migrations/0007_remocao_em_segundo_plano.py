@@ -0,0 +1,129 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:29
+
+import diario.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("diario", "0006_previa_das_entradas"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Remocao",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("usuario", "usuário"), ("topico", "tópico")],
+                        max_length=10,
+                        verbose_name="tipo",
+                    ),
+                ),
+                (
+                    "objeto_id",
+                    models.PositiveBigIntegerField(verbose_name="id do objeto"),
+                ),
+                (
+                    "descricao",
+                    models.CharField(max_length=200, verbose_name="descrição"),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="entradas a remover"
+                    ),
+                ),
+                (
+                    "apagadas",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="entradas removidas"
+                    ),
+                ),
+                (
+                    "criada_em",
+                    models.DateTimeField(auto_now_add=True, verbose_name="criada em"),
+                ),
+                (
+                    "concluida_em",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="concluída em"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "remoção",
+                "verbose_name_plural": "remoções",
+            },
+        ),
+        migrations.AlterModelManagers(
+            name="usuario",
+            managers=[
+                ("objects", diario.models.UsuarioManager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="entrada",
+            name="entrada_topico_edicao_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="entrada",
+            name="entrada_usuario_edicao_idx",
+        ),
+        migrations.AddField(
+            model_name="topico",
+            name="apagado_em",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="apagado em"
+            ),
+        ),
+        migrations.AddField(
+            model_name="usuario",
+            name="apagado_em",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="apagado em"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="entrada",
+            index=models.Index(
+                fields=["topico", "data_edicao", "usuario"],
+                name="entrada_topico_edicao_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="entrada",
+            index=models.Index(
+                fields=["usuario", "data_edicao", "topico"],
+                name="entrada_usuario_edicao_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topico",
+            index=models.Index(
+                condition=models.Q(("apagado_em__isnull", False)),
+                fields=["apagado_em"],
+                name="topico_apagado_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usuario",
+            index=models.Index(
+                condition=models.Q(("apagado_em__isnull", False)),
+                fields=["apagado_em"],
+                name="usuario_apagado_idx",
+            ),
+        ),
+    ]
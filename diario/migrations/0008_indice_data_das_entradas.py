@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0007_remocao_em_segundo_plano"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="entrada",
+            index=models.Index(fields=["-data_pub", "-id"], name="entrada_data_idx"),
+        ),
+    ]
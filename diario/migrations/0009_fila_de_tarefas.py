@@ -0,0 +1,113 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0008_indice_data_das_entradas"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tarefa",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("nome", models.CharField(max_length=200, verbose_name="nome")),
+                (
+                    "argumentos",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="argumentos"
+                    ),
+                ),
+                (
+                    "chave",
+                    models.CharField(
+                        blank=True, default="", max_length=200, verbose_name="chave"
+                    ),
+                ),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("pendente", "pendente"),
+                            ("executando", "executando"),
+                            ("falhou", "falhou"),
+                        ],
+                        default="pendente",
+                        max_length=10,
+                        verbose_name="estado",
+                    ),
+                ),
+                (
+                    "tentativas",
+                    models.PositiveIntegerField(default=0, verbose_name="tentativas"),
+                ),
+                (
+                    "max_tentativas",
+                    models.PositiveIntegerField(
+                        default=5, verbose_name="máximo de tentativas"
+                    ),
+                ),
+                (
+                    "executar_em",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="executar em"
+                    ),
+                ),
+                (
+                    "criada_em",
+                    models.DateTimeField(auto_now_add=True, verbose_name="criada em"),
+                ),
+                (
+                    "iniciada_em",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="iniciada em"
+                    ),
+                ),
+                (
+                    "trabalhador",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        max_length=100,
+                        verbose_name="trabalhador",
+                    ),
+                ),
+                (
+                    "reservada_ate",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="reservada até"
+                    ),
+                ),
+                ("erro", models.TextField(blank=True, default="", verbose_name="erro")),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["estado", "executar_em"], name="tarefa_fila_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(
+                            ("estado", "pendente"),
+                            models.Q(("chave", ""), _negated=True),
+                        ),
+                        fields=("chave",),
+                        name="tarefa_chave_pendente_unica",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+LOTE = 2000
+
+
+def preencher_atividades(apps, schema_editor):
+    # as entradas que já existem entram na linha do tempo como novas, da mais
+    # antiga para a mais recente
+    Atividade = apps.get_model("diario", "Atividade")
+    Entrada = apps.get_model("diario", "Entrada")
+    banco = schema_editor.connection.alias
+    todas = Entrada.objects.using(banco).order_by("data_pub", "pk")
+    entradas = todas
+    while True:
+        lote = list(
+            entradas.values_list("pk", "topico_id", "usuario_id", "data_pub")[:LOTE]
+        )
+        if not lote:
+            break
+        Atividade.objects.using(banco).bulk_create(
+            Atividade(
+                entrada_id=pk,
+                topico_id=topico_id,
+                usuario_id=usuario_id,
+                tipo="criada",
+                data=data_pub,
+            )
+            for pk, topico_id, usuario_id, data_pub in lote
+        )
+        pk, data = lote[-1][0], lote[-1][3]
+        entradas = todas.filter(Q(data_pub__gt=data) | Q(data_pub=data, pk__gt=pk))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0009_fila_de_tarefas"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usuario",
+            name="topicos_seguidos",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="seguidores",
+                to="diario.topico",
+                verbose_name="tópicos seguidos",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Atividade",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tipo",
+                    models.CharField(
+                        choices=[("criada", "nova"), ("editada", "editada")],
+                        max_length=7,
+                        verbose_name="tipo",
+                    ),
+                ),
+                ("data", models.DateTimeField(verbose_name="data")),
+                (
+                    "entrada",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="atividades",
+                        to="diario.entrada",
+                    ),
+                ),
+                (
+                    "topico",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="diario.topico",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["topico", "-id"], name="atividade_topico_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(preencher_atividades, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+LOTE = 200
+
+
+def preencher_resumos(apps, schema_editor):
+    # agrupa as entradas de `LOTE` usuários por vez, no fuso de `TIME_ZONE`
+    Entrada = apps.get_model("diario", "Entrada")
+    ResumoDiario = apps.get_model("diario", "ResumoDiario")
+    Usuario = apps.get_model("diario", "Usuario")
+    banco = schema_editor.connection.alias
+    ultimo = 0
+    while ids := list(
+        Usuario.objects.using(banco)
+        .filter(pk__gt=ultimo)
+        .order_by("pk")
+        .values_list("pk", flat=True)[:LOTE]
+    ):
+        ResumoDiario.objects.using(banco).bulk_create(
+            ResumoDiario(
+                usuario_id=linha["usuario_id"],
+                topico_id=linha["topico_id"],
+                dia=linha["dia"],
+                entradas=linha["total"],
+            )
+            for linha in Entrada.objects.using(banco)
+            .filter(usuario_id__in=ids)
+            .annotate(dia=TruncDate("data_pub"))
+            .values("usuario_id", "topico_id", "dia")
+            .annotate(total=Count("pk"))
+            .order_by()
+        )
+        ultimo = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0010_linha_do_tempo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResumoDiario",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dia", models.DateField(verbose_name="dia")),
+                (
+                    "entradas",
+                    models.PositiveIntegerField(default=0, verbose_name="entradas"),
+                ),
+                (
+                    "topico",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="diario.topico"
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "resumo diário",
+                "verbose_name_plural": "resumos diários",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("usuario", "dia", "topico"),
+                        name="resumo_usuario_dia_topico",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,136 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:47
+
+from importlib import import_module
+
+from django.db import OperationalError, migrations
+
+import diario.compressao
+
+_busca = import_module("diario.migrations.0004_busca_textual")
+
+# Esta migração não regrava as entradas já gravadas: com `DIARIO_COMPRESSAO`
+# ligado, elas só são comprimidas depois de
+#
+#     python manage.py comprimir_entradas
+#
+# que percorre a tabela em lotes, cada um na sua transação (uma migração roda
+# em uma transação só, que seguraria o banco inteiro até o fim).
+#
+# A view e os gatilhos criados aqui chamam `diario_texto()`, que não existe
+# no SQLite: é registrada em cada conexão do Django por `diario.compressao`.
+# Sem ela, qualquer INSERT, UPDATE ou DELETE em `diario_entrada` falha com
+# "no such function", então só o Django (e não o shell do `sqlite3` ou outros
+# programas) pode gravar entradas depois desta migração.
+
+# A busca passa a ler o texto por uma view que descomprime com `diario_texto()`
+# (registrada em toda conexão por `diario.compressao`). Mudar o `content` de
+# uma tabela FTS5 exige recriá-la, e o índice é refeito pelo `rebuild`
+CRIAR_INDICE = [
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_update",
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_delete",
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_insert",
+    "DROP TABLE IF EXISTS diario_entrada_fts",
+    """
+    CREATE VIEW diario_entrada_texto AS
+    SELECT id, diario_texto(texto_entrada) AS texto_entrada FROM diario_entrada
+    """,
+    """
+    CREATE VIRTUAL TABLE diario_entrada_fts USING fts5(
+        texto_entrada,
+        content='diario_entrada_texto',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER diario_entrada_fts_insert AFTER INSERT ON diario_entrada BEGIN
+        INSERT INTO diario_entrada_fts(rowid, texto_entrada)
+        VALUES (new.id, diario_texto(new.texto_entrada));
+    END
+    """,
+    """
+    CREATE TRIGGER diario_entrada_fts_delete AFTER DELETE ON diario_entrada BEGIN
+        INSERT INTO diario_entrada_fts(diario_entrada_fts, rowid, texto_entrada)
+        VALUES ('delete', old.id, diario_texto(old.texto_entrada));
+    END
+    """,
+    # comprimir ou descomprimir uma entrada muda o valor, mas não o texto
+    """
+    CREATE TRIGGER diario_entrada_fts_update AFTER UPDATE OF texto_entrada
+    ON diario_entrada
+    WHEN diario_texto(old.texto_entrada) IS NOT diario_texto(new.texto_entrada)
+    BEGIN
+        INSERT INTO diario_entrada_fts(diario_entrada_fts, rowid, texto_entrada)
+        VALUES ('delete', old.id, diario_texto(old.texto_entrada));
+        INSERT INTO diario_entrada_fts(rowid, texto_entrada)
+        VALUES (new.id, diario_texto(new.texto_entrada));
+    END
+    """,
+    "INSERT INTO diario_entrada_fts(diario_entrada_fts) VALUES ('rebuild')",
+]
+
+APAGAR_INDICE = [
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_update",
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_delete",
+    "DROP TRIGGER IF EXISTS diario_entrada_fts_insert",
+    "DROP TABLE IF EXISTS diario_entrada_fts",
+    "DROP VIEW IF EXISTS diario_entrada_texto",
+]
+
+
+def exigir_funcao_texto(apps, schema_editor):
+    # sem a função, os gatilhos seriam criados, mas toda gravação falharia
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("SELECT diario_texto('')")
+        except OperationalError:
+            raise RuntimeError(
+                "A função SQL `diario_texto()` não está registrada nesta "
+                "conexão; ela é criada por `diario.compressao` ao conectar."
+            )
+
+
+def exigir_texto_descomprimido(apps, schema_editor):
+    # o índice antigo lê a tabela direto, então precisa do texto normal; como
+    # a compressão das entradas já gravadas, isso fica com o
+    # `comprimir_entradas`, em lotes, e não com uma transação só na migração
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM diario_entrada "
+            "WHERE typeof(texto_entrada) = 'blob' LIMIT 1"
+        )
+        if cursor.fetchone():
+            raise RuntimeError(
+                "Há entradas comprimidas; descomprima-as antes com "
+                "`DIARIO_COMPRESSAO= python manage.py comprimir_entradas`."
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0011_resumos_diarios"),
+    ]
+
+    operations = [
+        # a coluna continua TEXT, então não há o que mudar no banco (e no
+        # SQLite o `AlterField` recriaria a tabela inteira)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="entrada",
+                    name="texto_entrada",
+                    field=diario.compressao.TextoComprimidoField(
+                        verbose_name="entrada"
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(exigir_funcao_texto, migrations.RunPython.noop),
+        migrations.RunSQL(
+            CRIAR_INDICE,
+            APAGAR_INDICE + _busca.CRIAR_INDICE,
+        ),
+        # as entradas já gravadas são comprimidas pelo `comprimir_entradas`
+        migrations.RunPython(migrations.RunPython.noop, exigir_texto_descomprimido),
+    ]
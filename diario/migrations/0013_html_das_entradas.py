@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:50
+
+import diario.compressao
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0012_compressao_das_entradas"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="entrada",
+            name="hash_html",
+            field=models.CharField(editable=False, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name="entrada",
+            name="texto_html",
+            field=diario.compressao.TextoComprimidoField(
+                editable=False, null=True, verbose_name="HTML"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copiar_data_pub(apps, schema_editor):
+    Topico = apps.get_model("diario", "Topico")
+    Topico.objects.using(schema_editor.connection.alias).update(
+        data_edicao=models.F("data_pub")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0013_html_das_entradas"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topico",
+            name="data_edicao",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="data de edição",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copiar_data_pub, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0014_edicao_dos_topicos"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetricaTarefa",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "nome",
+                    models.CharField(max_length=200, unique=True, verbose_name="nome"),
+                ),
+                (
+                    "concluidas",
+                    models.PositiveIntegerField(default=0, verbose_name="concluídas"),
+                ),
+                (
+                    "falhas",
+                    models.PositiveIntegerField(default=0, verbose_name="falhas"),
+                ),
+                (
+                    "espera_ms",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="espera (ms)"
+                    ),
+                ),
+                (
+                    "duracao_ms",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="duração (ms)"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "métrica de tarefa",
+                "verbose_name_plural": "métricas de tarefas",
+            },
+        ),
+    ]
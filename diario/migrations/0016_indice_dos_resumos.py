@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0015_metricas_das_tarefas"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="resumodiario",
+            index=models.Index(
+                fields=["usuario", "topico", "entradas"],
+                name="resumo_usuario_topico_idx",
+            ),
+        ),
+    ]
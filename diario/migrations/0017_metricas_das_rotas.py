@@ -0,0 +1,62 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0016_indice_dos_resumos"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetricaRota",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "rota",
+                    models.CharField(max_length=200, unique=True, verbose_name="rota"),
+                ),
+                (
+                    "requisicoes",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="requisições"
+                    ),
+                ),
+                (
+                    "tempo_us",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="tempo (µs)"
+                    ),
+                ),
+                (
+                    "consultas",
+                    models.PositiveBigIntegerField(default=0, verbose_name="consultas"),
+                ),
+                ("ate_5ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_10ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_25ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_50ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_100ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_250ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_500ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_1000ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_2500ms", models.PositiveBigIntegerField(default=0)),
+                ("ate_5000ms", models.PositiveBigIntegerField(default=0)),
+                ("acima", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "métrica de rota",
+                "verbose_name_plural": "métricas de rotas",
+            },
+        ),
+    ]
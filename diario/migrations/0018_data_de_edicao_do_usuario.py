@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("diario", "0017_metricas_das_rotas"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usuario",
+            name="data_edicao",
+            field=models.DateTimeField(auto_now=True, verbose_name="data de edição"),
+        ),
+    ]
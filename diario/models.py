@@ -1,23 +1,137 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import IntegrityError, models, transaction
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator, slugify
 from django.utils.translation import gettext_lazy as _
 
+from .compressao import TextoComprimidoField
+from .formatacao import atualizar_html
+
+
+# ligado por `preservando_datas()`; é por thread (e por tarefa asyncio), então
+# um `save()` concorrente continua recebendo a data atual
+_preservando_datas = ContextVar("diario_preservando_datas", default=False)
+
+
+@contextmanager
+def preservando_datas():
+    """Faz `bulk_create()` e `save()` manterem as datas já definidas nos objetos.
+
+    Usado ao importar e ao semear dados, em que `auto_now`/`auto_now_add`
+    sobrescreveriam as datas originais com o horário atual.
+    """
+    token = _preservando_datas.set(True)
+    try:
+        yield
+    finally:
+        _preservando_datas.reset(token)
+
+
+class DataAutomaticaField(models.DateTimeField):
+    """`DateTimeField` cujo `auto_now`/`auto_now_add` `preservando_datas()` desliga"""
+
+    def pre_save(self, model_instance, add):
+        valor = getattr(model_instance, self.attname)
+        if valor is not None and _preservando_datas.get():
+            return valor
+        return super().pre_save(model_instance, add)
+
+    def deconstruct(self):
+        # o comportamento só muda no Python; para as migrações é o mesmo campo,
+        # e um caminho novo faria o SQLite recriar as tabelas
+        nome, _, args, kwargs = super().deconstruct()
+        return nome, "django.db.models.DateTimeField", args, kwargs
+
+
+class UsuarioManager(UserManager):
+    def visiveis(self):
+        return self.filter(apagado_em__isnull=True)
+
 
 class Usuario(AbstractUser):
     email = models.EmailField(_("endereço de email"), blank=False)
+    # marcado ao apagar a conta; as entradas são removidas aos poucos depois,
+    # veja `diario.remocao`
+    apagado_em = models.DateTimeField(
+        _("apagado em"), null=True, blank=True, editable=False
+    )
+    # muda a cada `save()` (nome de usuário, senha...), mas não no login, que
+    # só grava `last_login`; entra nos ETags das páginas que mostram o autor
+    data_edicao = DataAutomaticaField(_("data de edição"), auto_now=True)
+    topicos_seguidos = models.ManyToManyField(
+        "Topico",
+        verbose_name=_("tópicos seguidos"),
+        related_name="seguidores",
+        blank=True,
+    )
+
+    objects = UsuarioManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(
+                fields=["apagado_em"],
+                condition=models.Q(apagado_em__isnull=False),
+                name="usuario_apagado_idx",
+            )
+        ]
 
     def get_absolute_url(self):
         return reverse("ver_perfil", kwargs={"username": self.username})
 
 
+class TopicoQuerySet(models.QuerySet):
+    def visiveis(self):
+        return self.filter(apagado_em__isnull=True)
+
+
 class Topico(models.Model):
     topico = models.CharField(_("tópico"), max_length=200)
-    data_pub = models.DateTimeField(_("data de publicação"), auto_now_add=True)
-    slug = models.SlugField(default="", null=False, unique=False)
+    data_pub = DataAutomaticaField(_("data de publicação"), auto_now_add=True)
+    # muda a cada `save()` (nome, slug...), mas não com `num_entradas`, que é
+    # atualizado com `update()`; é o que invalida o ETag de `ApiTopicos`
+    data_edicao = DataAutomaticaField(_("data de edição"), auto_now=True)
+    slug = models.SlugField(default="", null=False, unique=True, blank=True)
+    # mantido pelos sinais em `diario.signals`, veja o comando `recontar_entradas`
+    num_entradas = models.PositiveIntegerField(
+        _("número de entradas"), default=0, editable=False
+    )
+    apagado_em = models.DateTimeField(
+        _("apagado em"), null=True, blank=True, editable=False
+    )
+
+    objects = TopicoQuerySet.as_manager()
 
     class Meta:
         verbose_name = "tópico"
+        indexes = [
+            models.Index(fields=["-data_pub"], name="topico_data_idx"),
+            models.Index(
+                fields=["apagado_em"],
+                condition=models.Q(apagado_em__isnull=False),
+                name="topico_apagado_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        tentativas = 5
+        for tentativa in range(tentativas):
+            self.slug = gerar_slug_unico(self.topico)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # outro processo salvou o mesmo slug entre a geração e o INSERT
+                self.slug = ""
+                if tentativa == tentativas - 1:
+                    raise
 
     def __str__(self) -> str:
         if len(self.topico) > 35:
@@ -28,16 +142,321 @@ class Topico(models.Model):
         return reverse("entradas", kwargs={"topico": self.slug})
 
 
+def gerar_slug_unico(texto: str, reservados=frozenset()) -> str:
+    """Gera um slug para `texto` que ainda não é usado por nenhum tópico.
+
+    Se o slug base já existir, os sufixos `-2`, `-3`, ... são tentados. Todos os
+    slugs com o mesmo prefixo são buscados em uma única consulta. `reservados`
+    são slugs que ainda não estão no banco mas também devem ser evitados (ex.:
+    os de um lote que vai ser gravado junto).
+    """
+    tamanho = Topico._meta.get_field("slug").max_length
+    base = slugify(texto)[:tamanho].strip("-") or "topico"
+    usados = set(
+        Topico.objects.filter(slug__startswith=base).values_list("slug", flat=True)
+    )
+    usados.update(reservados)
+    if base not in usados:
+        return base
+
+    sufixo = 2
+    while True:
+        final = f"-{sufixo}"
+        candidato = base[: tamanho - len(final)].rstrip("-") + final
+        if candidato not in usados:
+            return candidato
+        sufixo += 1
+
+
+TAMANHO_PREVIA = 200
+
+
+def gerar_previa(texto: str) -> str:
+    """Primeiros caracteres do texto em uma linha, cortados em uma palavra"""
+    return Truncator(" ".join(texto.split())).chars(TAMANHO_PREVIA)
+
+
+class EntradaQuerySet(models.QuerySet):
+    def visiveis(self):
+        """Exclui as entradas de usuários e tópicos esperando para ser removidos.
+
+        As subconsultas pegam só os poucos apagados (pelos índices parciais), e
+        os índices de entradas trazem `usuario` e `topico`, então o filtro não
+        precisa ler as linhas da tabela.
+        """
+        return self.exclude(
+            usuario__in=Usuario.objects.filter(apagado_em__isnull=False)
+        ).exclude(topico__in=Topico.objects.filter(apagado_em__isnull=False))
+
+
 class Entrada(models.Model):
     topico = models.ForeignKey(Topico, on_delete=models.CASCADE)
-    texto_entrada = models.TextField(_("entrada"))
-    data_pub = models.DateTimeField(_("data de publicação"), auto_now_add=True)
-    data_edicao = models.DateTimeField(_("data de edição"), auto_now=True)
+    # comprimido no banco conforme `DIARIO_COMPRESSAO`
+    texto_entrada = TextoComprimidoField(_("entrada"))
+    # usada nas listas, que assim não precisam ler o texto inteiro
+    previa = models.CharField(
+        _("prévia"), max_length=TAMANHO_PREVIA, default="", editable=False
+    )
+    # o texto em Markdown já convertido, e o hash do texto de que ele veio
+    # (veja `diario.formatacao`); nulos, em vez de um default, para que a
+    # coluna seja adicionada sem o SQLite recriar a tabela
+    texto_html = TextoComprimidoField(_("HTML"), null=True, editable=False)
+    hash_html = models.CharField(max_length=32, null=True, editable=False)
+    data_pub = DataAutomaticaField(_("data de publicação"), auto_now_add=True)
+    data_edicao = DataAutomaticaField(_("data de edição"), auto_now=True)
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="entradas")
 
+    objects = EntradaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # listas de entradas de um tópico (`EntradaList`) e de um usuário
+            # (`Perfil`), sempre da mais recente para a mais antiga. O `-id`
+            # entra explicitamente porque o rowid implícito do SQLite é
+            # crescente e forçaria uma ordenação extra no desempate do cursor
+            models.Index(
+                fields=["topico", "-data_pub", "-id"], name="entrada_topico_data_idx"
+            ),
+            models.Index(
+                fields=["usuario", "-data_pub", "-id"], name="entrada_usuario_data_idx"
+            ),
+            # cobrem o MAX(data_edicao)/COUNT(*) dos validadores de GET
+            # condicional, inclusive o filtro de `visiveis()`
+            models.Index(
+                fields=["topico", "data_edicao", "usuario"],
+                name="entrada_topico_edicao_idx",
+            ),
+            models.Index(
+                fields=["usuario", "data_edicao", "topico"],
+                name="entrada_usuario_edicao_idx",
+            ),
+            # ordem e filtro por data da lista de entradas do admin
+            models.Index(fields=["-data_pub", "-id"], name="entrada_data_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # guarda o tópico original para detectar entradas movidas ao salvar
+        instancia._topico_id_original = instancia.__dict__.get("topico_id")
+        return instancia
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if "texto_entrada" not in self.get_deferred_fields() and (
+            update_fields is None or "texto_entrada" in update_fields
+        ):
+            self.previa = gerar_previa(self.texto_entrada)
+            campos = {"previa"}
+            if "hash_html" not in self.get_deferred_fields() and atualizar_html(self):
+                campos |= {"texto_html", "hash_html"}
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *campos}
+        super().save(*args, **kwargs)
+
     def __str__(self) -> str:
-        return self.texto_entrada
+        return self.previa or gerar_previa(self.texto_entrada)
 
     def get_absolute_url(self):
         topico = self.topico.slug
-        return reverse("ver_entrada", kwargs={"pk": self.pk, "topico": topico})
\ No newline at end of file
+        return reverse("ver_entrada", kwargs={"pk": self.pk, "topico": topico})
+
+
+class Atividade(models.Model):
+    """Uma entrada criada ou editada, na ordem em que aconteceu.
+
+    A tabela só recebe linhas novas (veja `diario/atividades.py`), então a
+    ordem do `id` é a ordem da linha do tempo e nenhuma leitura precisa
+    ordenar as entradas.
+    """
+
+    CRIADA = "criada"
+    EDITADA = "editada"
+
+    entrada = models.ForeignKey(
+        Entrada, on_delete=models.CASCADE, related_name="atividades"
+    )
+    # copiados da entrada, para filtrar sem ler a tabela de entradas
+    topico = models.ForeignKey(Topico, on_delete=models.CASCADE, db_index=False)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
+    tipo = models.CharField(
+        _("tipo"), max_length=7, choices=[(CRIADA, "nova"), (EDITADA, "editada")]
+    )
+    data = models.DateTimeField(_("data"))
+
+    class Meta:
+        indexes = [
+            # linha do tempo dos tópicos seguidos, um tópico de cada vez
+            models.Index(fields=["topico", "-id"], name="atividade_topico_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_tipo_display()}: {self.entrada_id}"
+
+
+class Remocao(models.Model):
+    """Um usuário ou tópico apagado cujas entradas ainda estão sendo removidas"""
+
+    USUARIO = "usuario"
+    TOPICO = "topico"
+
+    tipo = models.CharField(
+        _("tipo"), max_length=10, choices=[(USUARIO, "usuário"), (TOPICO, "tópico")]
+    )
+    objeto_id = models.PositiveBigIntegerField(_("id do objeto"))
+    descricao = models.CharField(_("descrição"), max_length=200)
+    total = models.PositiveIntegerField(_("entradas a remover"), default=0)
+    apagadas = models.PositiveIntegerField(_("entradas removidas"), default=0)
+    criada_em = models.DateTimeField(_("criada em"), auto_now_add=True)
+    concluida_em = models.DateTimeField(_("concluída em"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = "remoção"
+        verbose_name_plural = "remoções"
+
+    def __str__(self) -> str:
+        return f"{self.get_tipo_display()} {self.descricao}"
+
+    @property
+    def progresso(self) -> float:
+        if self.concluida_em:
+            return 1.0
+        return min(self.apagadas / self.total, 1.0) if self.total else 0.0
+
+
+class Tarefa(models.Model):
+    """Trabalho adiado para o `processar_tarefas` (veja `diario/tarefas.py`)"""
+
+    PENDENTE = "pendente"
+    EXECUTANDO = "executando"
+    FALHOU = "falhou"
+
+    nome = models.CharField(_("nome"), max_length=200)
+    argumentos = models.JSONField(_("argumentos"), default=dict, blank=True)
+    # tarefas pendentes com a mesma chave são agendadas uma vez só
+    chave = models.CharField(_("chave"), max_length=200, blank=True, default="")
+    estado = models.CharField(
+        _("estado"),
+        max_length=10,
+        choices=[
+            (PENDENTE, "pendente"),
+            (EXECUTANDO, "executando"),
+            (FALHOU, "falhou"),
+        ],
+        default=PENDENTE,
+    )
+    tentativas = models.PositiveIntegerField(_("tentativas"), default=0)
+    max_tentativas = models.PositiveIntegerField(_("máximo de tentativas"), default=5)
+    executar_em = models.DateTimeField(_("executar em"), default=timezone.now)
+    criada_em = models.DateTimeField(_("criada em"), auto_now_add=True)
+    iniciada_em = models.DateTimeField(_("iniciada em"), null=True, blank=True)
+    # quem reservou a tarefa e até quando; passado esse prazo, outro processo
+    # pode pegá-la de novo
+    trabalhador = models.CharField(
+        _("trabalhador"), max_length=100, blank=True, default=""
+    )
+    reservada_ate = models.DateTimeField(_("reservada até"), null=True, blank=True)
+    erro = models.TextField(_("erro"), blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["estado", "executar_em"], name="tarefa_fila_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chave"],
+                condition=models.Q(estado="pendente") & ~models.Q(chave=""),
+                name="tarefa_chave_pendente_unica",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.nome} #{self.pk}"
+
+
+class MetricaTarefa(models.Model):
+    """Execuções de cada tarefa, somadas por `diario.tarefas.executar()`.
+
+    Ficam no banco, e não no cache, porque são gravadas pelos processos de
+    `processar_tarefas` e lidas pelo site, em `/monitoramento/tarefas`.
+    """
+
+    nome = models.CharField(_("nome"), max_length=200, unique=True)
+    concluidas = models.PositiveIntegerField(_("concluídas"), default=0)
+    falhas = models.PositiveIntegerField(_("falhas"), default=0)
+    # somas, para as médias
+    espera_ms = models.PositiveBigIntegerField(_("espera (ms)"), default=0)
+    duracao_ms = models.PositiveBigIntegerField(_("duração (ms)"), default=0)
+
+    class Meta:
+        verbose_name = "métrica de tarefa"
+        verbose_name_plural = "métricas de tarefas"
+
+    def __str__(self) -> str:
+        return self.nome
+
+
+class MetricaRota(models.Model):
+    """Requisições de cada rota, somadas por `diario.instrumentacao`.
+
+    Ficam no banco, e não no cache, porque cada processo do servidor mede as
+    requisições que atendeu, e `/monitoramento/rotas` precisa da soma de todos.
+    As faixas do histograma são as de `diario.instrumentacao.FAIXAS_MS`.
+    """
+
+    rota = models.CharField(_("rota"), max_length=200, unique=True)
+    requisicoes = models.PositiveBigIntegerField(_("requisições"), default=0)
+    # somas, para as médias
+    tempo_us = models.PositiveBigIntegerField(_("tempo (µs)"), default=0)
+    consultas = models.PositiveBigIntegerField(_("consultas"), default=0)
+    ate_5ms = models.PositiveBigIntegerField(default=0)
+    ate_10ms = models.PositiveBigIntegerField(default=0)
+    ate_25ms = models.PositiveBigIntegerField(default=0)
+    ate_50ms = models.PositiveBigIntegerField(default=0)
+    ate_100ms = models.PositiveBigIntegerField(default=0)
+    ate_250ms = models.PositiveBigIntegerField(default=0)
+    ate_500ms = models.PositiveBigIntegerField(default=0)
+    ate_1000ms = models.PositiveBigIntegerField(default=0)
+    ate_2500ms = models.PositiveBigIntegerField(default=0)
+    ate_5000ms = models.PositiveBigIntegerField(default=0)
+    acima = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "métrica de rota"
+        verbose_name_plural = "métricas de rotas"
+
+    def __str__(self) -> str:
+        return self.rota
+
+
+class ResumoDiario(models.Model):
+    """Quantas entradas um usuário publicou em um tópico em um dia.
+
+    Mantido pelos sinais em `diario.signals` (veja `diario/resumos.py`), para
+    que as estatísticas do perfil não precisem ler as entradas.
+    """
+
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, db_index=False)
+    topico = models.ForeignKey(Topico, on_delete=models.CASCADE)
+    dia = models.DateField(_("dia"))
+    entradas = models.PositiveIntegerField(_("entradas"), default=0)
+
+    class Meta:
+        verbose_name = "resumo diário"
+        verbose_name_plural = "resumos diários"
+        constraints = [
+            # também é o índice das leituras, sempre por usuário
+            models.UniqueConstraint(
+                fields=["usuario", "dia", "topico"], name="resumo_usuario_dia_topico"
+            ),
+        ]
+        indexes = [
+            # soma os tópicos do usuário na ordem do índice, sem ler a tabela
+            models.Index(
+                fields=["usuario", "topico", "entradas"],
+                name="resumo_usuario_topico_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.usuario_id}/{self.topico_id} em {self.dia}: {self.entradas}"
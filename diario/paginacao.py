@@ -0,0 +1,134 @@
+"""Paginação por cursor (keyset) para listas de entradas.
+
+Diferente da paginação por OFFSET, cada página é obtida filtrando a partir da
+última linha vista na ordenação `(data_pub, id)`, então o custo de qualquer
+página é o mesmo, não importa o quão fundo ela esteja.
+"""
+
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import Http404
+
+
+@dataclass
+class PaginaCursor:
+    """Uma página de resultados e os cursores para as páginas vizinhas"""
+
+    objetos: list
+    cursor_anteriores: str | None = None
+    cursor_recentes: str | None = None
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tem_anteriores(self) -> bool:
+        return self.cursor_anteriores is not None
+
+    @property
+    def tem_recentes(self) -> bool:
+        return self.cursor_recentes is not None
+
+    @property
+    def tem_outras_paginas(self) -> bool:
+        return self.tem_anteriores or self.tem_recentes
+
+
+def codificar_valores(*valores) -> str:
+    """Junta `valores` em um cursor opaco, seguro para usar na URL"""
+    bruto = "|".join(str(valor) for valor in valores).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_valores(cursor: str, quantidade: int) -> list[str]:
+    """Faz o inverso de `codificar_valores()`, levantando `Http404` se inválido"""
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        bruto = base64.urlsafe_b64decode(preenchido.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise Http404("Cursor de paginação inválido.")
+    valores = bruto.rsplit("|", quantidade - 1)
+    if len(valores) != quantidade:
+        raise Http404("Cursor de paginação inválido.")
+    return valores
+
+
+def codificar_cursor(data_pub: datetime, pk: int) -> str:
+    """Transforma a posição `(data_pub, pk)` em um cursor para a URL"""
+    return codificar_valores(data_pub.isoformat(), pk)
+
+
+def decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    """Faz o inverso de `codificar_cursor()`, levantando `Http404` se inválido"""
+    data, pk = decodificar_valores(cursor, 2)
+    try:
+        return datetime.fromisoformat(data), int(pk)
+    except ValueError:
+        raise Http404("Cursor de paginação inválido.")
+
+
+def _consulta_da_pagina(queryset, parametros, por_pagina: int):
+    """Monta a consulta limitada da página pedida em `parametros`"""
+    antes = parametros.get("antes")
+    depois = parametros.get("depois")
+
+    if depois:
+        data, pk = decodificar_cursor(depois)
+        filtro = Q(data_pub__gt=data) | Q(data_pub=data, pk__gt=pk)
+        consulta = queryset.filter(filtro).order_by("data_pub", "pk")
+    else:
+        if antes:
+            data, pk = decodificar_cursor(antes)
+            filtro = Q(data_pub__lt=data) | Q(data_pub=data, pk__lt=pk)
+            queryset = queryset.filter(filtro)
+        consulta = queryset.order_by("-data_pub", "-pk")
+    # uma linha a mais só para saber se existe outra página
+    return consulta[: por_pagina + 1], bool(antes), bool(depois)
+
+
+def _montar_pagina(linhas, por_pagina: int, antes: bool, depois: bool) -> PaginaCursor:
+    mais = len(linhas) > por_pagina
+    if depois:
+        objetos = linhas[:por_pagina][::-1]
+        # se viemos de uma página mais antiga, ela ainda existe
+        tem_anteriores = True
+        tem_recentes = mais
+    else:
+        objetos = linhas[:por_pagina]
+        tem_anteriores = mais
+        tem_recentes = antes
+
+    pagina = PaginaCursor(objetos)
+    if objetos:
+        if tem_anteriores:
+            ultimo = objetos[-1]
+            pagina.cursor_anteriores = codificar_cursor(ultimo.data_pub, ultimo.pk)
+        if tem_recentes:
+            primeiro = objetos[0]
+            pagina.cursor_recentes = codificar_cursor(primeiro.data_pub, primeiro.pk)
+    return pagina
+
+
+def paginar_por_cursor(queryset, parametros, por_pagina: int) -> PaginaCursor:
+    """Pagina `queryset` do mais recente para o mais antigo.
+
+    `parametros` é normalmente `request.GET`: `antes=<cursor>` traz as entradas
+    mais antigas que o cursor e `depois=<cursor>` as mais recentes. Sem nenhum
+    dos dois, a primeira página (as mais recentes) é retornada.
+    """
+    consulta, antes, depois = _consulta_da_pagina(queryset, parametros, por_pagina)
+    return _montar_pagina(list(consulta), por_pagina, antes, depois)
+
+
+async def apaginar_por_cursor(queryset, parametros, por_pagina: int) -> PaginaCursor:
+    """Versão assíncrona de `paginar_por_cursor()`"""
+    consulta, antes, depois = _consulta_da_pagina(queryset, parametros, por_pagina)
+    linhas = [objeto async for objeto in consulta]
+    return _montar_pagina(linhas, por_pagina, antes, depois)
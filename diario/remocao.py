@@ -0,0 +1,158 @@
+"""Remoção em segundo plano de usuários e tópicos.
+
+Apagar um usuário ou tópico pelo `delete()` do Django carrega todas as
+entradas dele na memória e as remove em uma única transação, travando o
+SQLite por segundos quando são muitas. Em vez disso, `marcar_usuario()` e
+`marcar_topico()` só preenchem `apagado_em` (o usuário também perde o
+acesso), ajustam os contadores e o cache e registram uma `Remocao`. A partir
+daí o objeto some de todas as páginas, que filtram com `visiveis()`.
+
+`purgar()` remove as entradas em lotes pequenos, cada um na sua transação,
+anotando o progresso na `Remocao`, e no fim apaga o próprio objeto, que já não
+tem nada ligado a ele. A marcação agenda `purgar_remocao` na fila de tarefas
+(`processar_tarefas`); o comando `purgar_removidos` faz o mesmo trabalho
+diretamente.
+"""
+
+from time import sleep
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Entrada, Remocao, Topico, Usuario
+from .signals import (
+    descontar_entradas_do_usuario,
+    invalidar_autores_do_topico,
+    removendo_apagados,
+)
+from .tarefas import agendar, prorrogar_reserva, tarefa
+
+TAMANHO_LOTE = 500
+
+# usada pela tarefa, que roda junto com o site
+PAUSA_ENTRE_LOTES = 0.05
+
+
+def _pendente(tipo, objeto_id, using):
+    return (
+        Remocao.objects.using(using)
+        .filter(tipo=tipo, objeto_id=objeto_id, concluida_em__isnull=True)
+        .first()
+    )
+
+
+def _agendar(remocao, using):
+    agendar(
+        purgar_remocao,
+        chave=f"remocao:{remocao.pk}",
+        using=using,
+        remocao_id=remocao.pk,
+        banco=using,
+    )
+    return remocao
+
+
+def marcar_usuario(usuario, using=DEFAULT_DB_ALIAS) -> Remocao:
+    """Esconde o usuário e suas entradas e agenda a remoção delas"""
+    with transaction.atomic(using=using):
+        if usuario.apagado_em is not None:
+            return _pendente(Remocao.USUARIO, usuario.pk, using)
+        usuario.apagado_em = timezone.now()
+        # sem acesso, as sessões abertas deixam de valer
+        usuario.is_active = False
+        usuario.save(using=using, update_fields=["apagado_em", "is_active"])
+        descontar_entradas_do_usuario(usuario, using)
+        return _agendar(
+            Remocao.objects.using(using).create(
+                tipo=Remocao.USUARIO,
+                objeto_id=usuario.pk,
+                descricao=usuario.username,
+                total=usuario.entradas.using(using).count(),
+            ),
+            using,
+        )
+
+
+def marcar_topico(topico, using=DEFAULT_DB_ALIAS) -> Remocao:
+    """Esconde o tópico e suas entradas e agenda a remoção delas"""
+    with transaction.atomic(using=using):
+        if topico.apagado_em is not None:
+            return _pendente(Remocao.TOPICO, topico.pk, using)
+        topico.apagado_em = timezone.now()
+        topico.save(using=using, update_fields=["apagado_em"])
+        invalidar_autores_do_topico(topico, using)
+        return _agendar(
+            Remocao.objects.using(using).create(
+                tipo=Remocao.TOPICO,
+                objeto_id=topico.pk,
+                descricao=topico.slug,
+                total=topico.entrada_set.using(using).count(),
+            ),
+            using,
+        )
+
+
+def purgar(
+    remocao, lote=TAMANHO_LOTE, pausa=0.0, progresso=None, using=DEFAULT_DB_ALIAS
+):
+    """Remove as entradas de `remocao` em lotes e depois o próprio objeto.
+
+    Pode ser interrompido a qualquer momento: cada lote é uma transação, e a
+    próxima chamada continua de onde parou. `pausa` (segundos) entre os lotes
+    deixa outras escritas passarem; `progresso(remocao)` é chamado após cada um.
+    """
+    if remocao.tipo == Remocao.USUARIO:
+        modelo, filtro = Usuario, {"usuario_id": remocao.objeto_id}
+    else:
+        modelo, filtro = Topico, {"topico_id": remocao.objeto_id}
+    entradas = Entrada.objects.using(using).filter(**filtro).order_by("pk")
+
+    while ids := list(entradas.values_list("pk", flat=True)[:lote]):
+        with transaction.atomic(using=using), removendo_apagados():
+            Entrada.objects.using(using).filter(pk__in=ids).delete()
+            Remocao.objects.using(using).filter(pk=remocao.pk).update(
+                apagadas=F("apagadas") + len(ids)
+            )
+        remocao.apagadas += len(ids)
+        if progresso is not None:
+            progresso(remocao)
+        if pausa:
+            sleep(pausa)
+
+    with transaction.atomic(using=using):
+        modelo.objects.using(using).filter(pk=remocao.objeto_id).delete()
+        remocao.concluida_em = timezone.now()
+        remocao.save(using=using, update_fields=["concluida_em"])
+    if progresso is not None:
+        progresso(remocao)
+
+
+@tarefa
+def purgar_remocao(remocao_id, banco=DEFAULT_DB_ALIAS):
+    """Tarefa agendada pela marcação; não faz nada se a remoção já terminou"""
+    remocao = (
+        Remocao.objects.using(banco)
+        .filter(pk=remocao_id, concluida_em__isnull=True)
+        .first()
+    )
+    if remocao is not None:
+        # a remoção de muitas entradas pode passar do prazo da reserva
+        purgar(
+            remocao,
+            pausa=PAUSA_ENTRE_LOTES,
+            progresso=lambda _: prorrogar_reserva(),
+            using=banco,
+        )
+
+
+def purgar_pendentes(
+    lote=TAMANHO_LOTE, pausa=0.0, progresso=None, using=DEFAULT_DB_ALIAS
+):
+    """Conclui todas as remoções pendentes e retorna quantas eram"""
+    pendentes = list(
+        Remocao.objects.using(using).filter(concluida_em__isnull=True).order_by("pk")
+    )
+    for remocao in pendentes:
+        purgar(remocao, lote=lote, pausa=pausa, progresso=progresso, using=using)
+    return len(pendentes)
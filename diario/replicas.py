@@ -0,0 +1,106 @@
+"""Leitura em réplicas do banco, com uma janela de leitura das próprias escritas.
+
+As réplicas são os aliases de `settings.DIARIO_REPLICAS`. Só as leituras feitas
+dentro de `ler_de_replica()` vão para uma réplica; todo o resto, inclusive
+qualquer escrita, vai para o banco principal. As views de leitura entram nesse
+contexto por meio de `LeituraEmReplicaMixin` (em `diario/views.py`).
+
+Como a réplica pode estar atrasada, quem acabou de escrever algo recebe o
+cookie `COOKIE_PRIMARIO` e continua lendo do principal até ele expirar.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+
+COOKIE_PRIMARIO = "diario_primario"
+
+# apps cujos modelos podem ser lidos das réplicas; sessões, permissões etc.
+# ficam sempre no principal
+APPS_REPLICADAS = {"diario"}
+
+_replica_atual = ContextVar("diario_replica_atual", default=None)
+
+
+def _replicas():
+    return getattr(settings, "DIARIO_REPLICAS", [])
+
+
+def deve_usar_replica(request) -> bool:
+    """Diz se a requisição pode ler de uma réplica"""
+    return bool(_replicas()) and COOKIE_PRIMARIO not in request.COOKIES
+
+
+@contextmanager
+def ler_de_replica():
+    """Manda as leituras feitas dentro do bloco para uma mesma réplica"""
+    replicas = _replicas()
+    token = _replica_atual.set(random.choice(replicas) if replicas else None)
+    try:
+        yield
+    finally:
+        _replica_atual.reset(token)
+
+
+class RoteadorReplicas:
+    """Roteador que lê das réplicas apenas dentro de `ler_de_replica()`"""
+
+    def db_for_read(self, model, **hints):
+        if not _replicas():
+            return None
+        replica = _replica_atual.get()
+        if replica is not None and model._meta.app_label in APPS_REPLICADAS:
+            return replica
+        # sem isso, objetos lidos de uma réplica continuariam lendo dela
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if not _replicas():
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # as réplicas têm os mesmos dados do principal
+        bancos = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # as réplicas recebem o esquema junto com os dados, do principal
+        if db in _replicas():
+            return False
+        return None
+
+
+def _fixar_no_primario(request, resposta):
+    if _replicas() and request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+        resposta.set_cookie(
+            COOKIE_PRIMARIO,
+            "1",
+            max_age=settings.DIARIO_JANELA_PRIMARIO,
+            httponly=True,
+            samesite="Lax",
+        )
+    return resposta
+
+
+@sync_and_async_middleware
+def janela_primario_middleware(get_response):
+    """Depois de uma escrita, lê do principal por `DIARIO_JANELA_PRIMARIO` segundos"""
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            return _fixar_no_primario(request, await get_response(request))
+
+    else:
+
+        def middleware(request):
+            return _fixar_no_primario(request, get_response(request))
+
+    return middleware
@@ -0,0 +1,241 @@
+"""Resumos diários de entradas por usuário e tópico, e as estatísticas do perfil.
+
+Cada linha de `ResumoDiario` conta as entradas de um usuário em um tópico em
+um dia (no fuso de `TIME_ZONE`). Os sinais em `diario.signals` somam e
+subtraem uma entrada a cada criação, remoção ou troca de tópico, então as
+estatísticas do perfil somam só os resumos do usuário, no banco, e recebem uma
+linha por dia em que ele escreveu, não uma por entrada.
+
+Como os contadores dos tópicos, os resumos de usuários e tópicos apagados não
+são descontados enquanto as entradas são removidas: as leituras ignoram os
+tópicos apagados, e o resto sai junto com o usuário ou o tópico. O comando
+`recalcular_resumos` refaz os resumos a partir das entradas.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Entrada, ResumoDiario, Topico
+
+# dias mostrados no gráfico de atividade do perfil
+DIAS_RECENTES = 30
+
+TOPICOS_NO_PERFIL = 5
+
+
+def dia_de(data) -> date:
+    return timezone.localdate(data)
+
+
+def somar(usuario_id, topico_id, dia, quantidade, using=DEFAULT_DB_ALIAS):
+    """Soma `quantidade` (pode ser negativa) ao resumo, criando-o se preciso"""
+    if quantidade < 0:
+        # como em `_somar_entradas()`, nunca fica negativo
+        ResumoDiario.objects.using(using).filter(
+            usuario_id=usuario_id,
+            topico_id=topico_id,
+            dia=dia,
+            entradas__gte=-quantidade,
+        ).update(entradas=F("entradas") + quantidade)
+        return
+    # uma consulta só, mesmo no primeiro resumo do dia e com outra requisição
+    # criando o mesmo resumo ao mesmo tempo
+    conexao = connections[using]
+    tabela = conexao.ops.quote_name(ResumoDiario._meta.db_table)
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {tabela} (usuario_id, topico_id, dia, entradas)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (usuario_id, dia, topico_id)
+            DO UPDATE SET entradas = {tabela}.entradas + excluded.entradas
+            """,
+            [
+                usuario_id,
+                topico_id,
+                conexao.ops.adapt_datefield_value(dia),
+                quantidade,
+            ],
+        )
+
+
+def somar_entradas(entradas, using=DEFAULT_DB_ALIAS):
+    """Versão em massa de `somar()`, para entradas gravadas com `bulk_create()`.
+
+    Lê os resumos existentes de uma vez e grava tudo com `bulk_update()` e
+    `bulk_create()`; como as importações, não deve rodar junto com outras
+    escritas nos mesmos resumos.
+    """
+    por_resumo = Counter(
+        (entrada.usuario_id, entrada.topico_id, dia_de(entrada.data_pub))
+        for entrada in entradas
+    )
+    if not por_resumo:
+        return
+    existentes = {
+        (resumo.usuario_id, resumo.topico_id, resumo.dia): resumo
+        for resumo in ResumoDiario.objects.using(using).filter(
+            usuario_id__in={usuario_id for usuario_id, _, _ in por_resumo},
+            dia__range=(
+                min(dia for _, _, dia in por_resumo),
+                max(dia for _, _, dia in por_resumo),
+            ),
+        )
+    }
+    criar, atualizar = [], []
+    for (usuario_id, topico_id, dia), total in por_resumo.items():
+        resumo = existentes.get((usuario_id, topico_id, dia))
+        if resumo is None:
+            criar.append(
+                ResumoDiario(
+                    usuario_id=usuario_id, topico_id=topico_id, dia=dia, entradas=total
+                )
+            )
+        else:
+            resumo.entradas += total
+            atualizar.append(resumo)
+    with transaction.atomic(using=using):
+        ResumoDiario.objects.using(using).bulk_create(criar, batch_size=500)
+        ResumoDiario.objects.using(using).bulk_update(
+            atualizar, ["entradas"], batch_size=500
+        )
+
+
+def contar_entradas(usuarios_ids, using=DEFAULT_DB_ALIAS) -> dict:
+    """Os resumos calculados direto das entradas dos `usuarios_ids`"""
+    linhas = (
+        Entrada.objects.using(using)
+        .filter(usuario_id__in=usuarios_ids)
+        .annotate(dia=TruncDate("data_pub"))
+        .values("usuario_id", "topico_id", "dia")
+        .annotate(total=Count("pk"))
+        .order_by()
+    )
+    return {
+        (linha["usuario_id"], linha["topico_id"], linha["dia"]): linha["total"]
+        for linha in linhas
+    }
+
+
+def recalcular(usuarios_ids, corrigir=True, using=DEFAULT_DB_ALIAS) -> list:
+    """Compara os resumos dos `usuarios_ids` com as entradas e corrige os errados.
+
+    Retorna `(usuario_id, topico_id, dia, guardado, real)` de cada diferença.
+    """
+    reais = contar_entradas(usuarios_ids, using)
+    guardados = {
+        (resumo.usuario_id, resumo.topico_id, resumo.dia): resumo
+        for resumo in ResumoDiario.objects.using(using).filter(
+            usuario_id__in=usuarios_ids
+        )
+    }
+
+    diferencas = []
+    criar, atualizar, apagar = [], [], []
+    for chave in reais.keys() | guardados.keys():
+        real = reais.get(chave, 0)
+        resumo = guardados.get(chave)
+        guardado = resumo.entradas if resumo else 0
+        if real == guardado:
+            continue
+        diferencas.append((*chave, guardado, real))
+        if resumo is None:
+            criar.append(
+                ResumoDiario(
+                    usuario_id=chave[0], topico_id=chave[1], dia=chave[2], entradas=real
+                )
+            )
+        elif real:
+            resumo.entradas = real
+            atualizar.append(resumo)
+        else:
+            apagar.append(resumo.pk)
+
+    if corrigir and diferencas:
+        with transaction.atomic(using=using):
+            ResumoDiario.objects.using(using).bulk_create(criar, batch_size=500)
+            ResumoDiario.objects.using(using).bulk_update(
+                atualizar, ["entradas"], batch_size=500
+            )
+            ResumoDiario.objects.using(using).filter(pk__in=apagar).delete()
+    return sorted(diferencas)
+
+
+def consultas_do_perfil(usuario) -> tuple:
+    """As consultas das estatísticas do perfil, ainda não executadas.
+
+    As somas são feitas pelo banco: as entradas por dia, em ordem, e os
+    tópicos com mais entradas. Cada uma traz no máximo uma linha por dia ou
+    por tópico, não uma por resumo. Como em `Entrada.objects.visiveis()`, os
+    tópicos apagados saem por uma subconsulta, sem juntar cada resumo ao seu
+    tópico; só os nomes dos tópicos mostrados são lidos.
+    """
+    resumos = (
+        ResumoDiario.objects.filter(usuario=usuario, entradas__gt=0)
+        .exclude(topico__in=Topico.objects.filter(apagado_em__isnull=False))
+        .order_by()
+    )
+    por_dia = resumos.values_list("dia").annotate(total=Sum("entradas")).order_by("dia")
+    topico = Topico.objects.filter(pk=OuterRef("topico"))
+    topicos = (
+        resumos.values("topico")
+        .annotate(total=Sum("entradas"))
+        # depois da soma, para não entrarem no GROUP BY
+        .annotate(
+            nome=Subquery(topico.values("topico")),
+            slug=Subquery(topico.values("slug")),
+        )
+        .values_list("nome", "slug", "total")
+        .order_by("-total", "topico")[:TOPICOS_NO_PERFIL]
+    )
+    return por_dia, topicos
+
+
+@dataclass
+class Estatisticas:
+    total: int = 0
+    dias_ativos: int = 0
+    sequencia_atual: int = 0
+    maior_sequencia: int = 0
+    # (nome, slug, entradas) dos tópicos com mais entradas
+    topicos: list = field(default_factory=list)
+    # (dia, entradas) dos últimos `DIAS_RECENTES` dias, do mais antigo ao atual
+    recentes: list = field(default_factory=list)
+
+    @property
+    def maximo_recente(self) -> int:
+        return max((total for _, total in self.recentes), default=0)
+
+
+def calcular_estatisticas(por_dia, topicos, hoje=None) -> Estatisticas:
+    """Monta as estatísticas a partir das linhas de `consultas_do_perfil()`"""
+    hoje = hoje or timezone.localdate()
+    por_dia = dict(por_dia)
+
+    estatisticas = Estatisticas(
+        total=sum(por_dia.values()),
+        dias_ativos=len(por_dia),
+        topicos=list(topicos),
+        recentes=[
+            (dia, por_dia.get(dia, 0))
+            for dia in (
+                hoje - timedelta(days=i) for i in range(DIAS_RECENTES - 1, -1, -1)
+            )
+        ],
+    )
+
+    anterior, sequencia = None, 0
+    for dia in sorted(por_dia):
+        sequencia = sequencia + 1 if anterior == dia - timedelta(days=1) else 1
+        estatisticas.maior_sequencia = max(estatisticas.maior_sequencia, sequencia)
+        anterior = dia
+    # a sequência atual continua valendo até o fim do dia seguinte ao último
+    if anterior is not None and anterior >= hoje - timedelta(days=1):
+        estatisticas.sequencia_atual = sequencia
+    return estatisticas
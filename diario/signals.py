@@ -0,0 +1,194 @@
+"""Sinais que mantêm os dados desnormalizados e as versões do cache atualizados"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import atividades, resumos
+from .cache import esquecer_usuario, invalidar
+from .models import Atividade, Entrada, Topico, Usuario
+
+
+def _somar_entradas(topico_id, quantidade, using):
+    """Soma `quantidade` ao contador de entradas do tópico de forma atômica"""
+    topicos = Topico.objects.using(using).filter(pk=topico_id)
+    if quantidade < 0:
+        # nunca deixa o contador negativo, mesmo que ele esteja dessincronizado
+        topicos = topicos.filter(num_entradas__gte=-quantidade)
+    topicos.update(num_entradas=F("num_entradas") + quantidade)
+
+
+# ligado por `diario.remocao` ao remover as entradas de um usuário ou tópico
+# apagado: os contadores e o cache já foram atualizados quando ele foi marcado
+_removendo_apagados = ContextVar("diario_removendo_apagados", default=False)
+
+
+@contextmanager
+def removendo_apagados():
+    token = _removendo_apagados.set(True)
+    try:
+        yield
+    finally:
+        _removendo_apagados.reset(token)
+
+
+def _modelo_de(origem):
+    """Retorna o modelo de uma origem de `delete()`, seja instância ou queryset"""
+    if origem is None:
+        return None
+    return getattr(origem, "model", None) or origem._meta.model
+
+
+@receiver(pre_save, sender=Entrada)
+def lembrar_topico_anterior(sender, instance, raw, using, **kwargs):
+    if raw or instance.pk is None:
+        return
+    if not hasattr(instance, "_topico_id_original"):
+        # instância que não veio do banco, ex.: `Entrada(pk=1, ...)`
+        instance._topico_id_original = (
+            Entrada.objects.using(using)
+            .filter(pk=instance.pk)
+            .values_list("topico_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Entrada)
+def contar_entrada_salva(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, "_topico_id_original", None)
+    escopos = [("topico", instance.topico_id), ("usuario", instance.usuario_id)]
+    dia = resumos.dia_de(instance.data_pub)
+    if created:
+        _somar_entradas(instance.topico_id, 1, using)
+        resumos.somar(instance.usuario_id, instance.topico_id, dia, 1, using)
+        escopos.append(("topicos",))
+    elif anterior is not None and anterior != instance.topico_id:
+        _somar_entradas(anterior, -1, using)
+        _somar_entradas(instance.topico_id, 1, using)
+        resumos.somar(instance.usuario_id, anterior, dia, -1, using)
+        resumos.somar(instance.usuario_id, instance.topico_id, dia, 1, using)
+        escopos += [("topico", anterior), ("topicos",)]
+    instance._topico_id_original = instance.topico_id
+    invalidar(*escopos, using=using)
+
+
+@receiver(post_save, sender=Entrada)
+def registrar_atividade(sender, instance, created, raw, using, update_fields, **kwargs):
+    if raw:
+        return
+    if created:
+        atividades.registrar(instance, Atividade.CRIADA, using)
+    elif update_fields is None or {"texto_entrada", "topico"} & set(update_fields):
+        atividades.registrar(instance, Atividade.EDITADA, using)
+
+
+@receiver(post_delete, sender=Entrada)
+def descontar_entrada_apagada(sender, instance, using, origin=None, **kwargs):
+    # apagar um usuário desconta tudo de uma vez em `descontar_usuario_apagado`,
+    # e apagar um tópico dispensa atualizar o próprio contador
+    if _removendo_apagados.get() or _modelo_de(origin) in (Usuario, Topico):
+        return
+    _somar_entradas(instance.topico_id, -1, using)
+    resumos.somar(
+        instance.usuario_id,
+        instance.topico_id,
+        resumos.dia_de(instance.data_pub),
+        -1,
+        using,
+    )
+    invalidar(
+        ("topico", instance.topico_id),
+        ("usuario", instance.usuario_id),
+        ("topicos",),
+        using=using,
+    )
+
+
+def descontar_entradas_do_usuario(usuario, using):
+    """Tira as entradas de `usuario` dos contadores e invalida o cache delas"""
+    por_topico = (
+        Entrada.objects.using(using)
+        .filter(usuario=usuario)
+        .values("topico_id")
+        .annotate(total=Count("pk"))
+        .order_by()
+    )
+    escopos = [("usuario", usuario.pk), ("topicos",)]
+    for linha in por_topico:
+        _somar_entradas(linha["topico_id"], -linha["total"], using)
+        escopos.append(("topico", linha["topico_id"]))
+    invalidar(*escopos, using=using)
+
+
+@receiver(pre_delete, sender=Usuario)
+def descontar_usuario_apagado(sender, instance, using, **kwargs):
+    # quem foi marcado como apagado já foi descontado naquela hora
+    if instance.apagado_em is None:
+        descontar_entradas_do_usuario(instance, using)
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_usuario_salvo(
+    sender, instance, created, update_fields, using, **kwargs
+):
+    # o login só atualiza `last_login`, que não aparece em nenhuma página nem
+    # muda quem pode se autenticar
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    # inclui trocar a senha: a cópia em cache ainda validaria as sessões antigas
+    esquecer_usuario(instance.pk)
+    # as listas de entradas dos tópicos mostram o nome de cada autor
+    topicos = [] if created else (
+        Entrada.objects.using(using)
+        .filter(usuario=instance)
+        .values_list("topico_id", flat=True)
+        .distinct()
+        .order_by()
+    )
+    invalidar(
+        ("usuario", instance.pk),
+        *(("topico", topico_id) for topico_id in topicos),
+        using=using,
+    )
+
+
+@receiver(post_delete, sender=Usuario)
+def esquecer_usuario_apagado(sender, instance, **kwargs):
+    esquecer_usuario(instance.pk)
+
+
+@receiver(post_save, sender=Topico)
+def invalidar_topico_salvo(sender, instance, created, using, **kwargs):
+    if created:
+        # um tópico novo ainda não aparece no perfil de ninguém
+        invalidar(("topico", instance.pk), ("topicos",), using=using)
+    else:
+        # os perfis mostram o nome do tópico de cada entrada
+        invalidar_autores_do_topico(instance, using)
+
+
+def invalidar_autores_do_topico(topico, using):
+    """Invalida o tópico e os perfis de quem escreveu nele, que mostram as entradas"""
+    autores = (
+        Entrada.objects.using(using)
+        .filter(topico=topico)
+        .values_list("usuario_id", flat=True)
+        .distinct()
+        .order_by()
+    )
+    invalidar(
+        ("topico", topico.pk),
+        ("topicos",),
+        *(("usuario", usuario_id) for usuario_id in autores),
+        using=using,
+    )
+
+
+@receiver(pre_delete, sender=Topico)
+def invalidar_topico_apagado(sender, instance, using, **kwargs):
+    invalidar_autores_do_topico(instance, using)
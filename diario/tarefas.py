@@ -0,0 +1,309 @@
+"""Fila de tarefas em segundo plano guardada no próprio banco.
+
+Uma view que tem trabalho demorado a fazer chama `agendar()`, que só insere
+uma `Tarefa` (na mesma transação da view, então a tarefa só existe se o resto
+for gravado), e responde na hora. O comando `processar_tarefas` roda em um ou
+mais processos à parte e executa as tarefas com `processar()`:
+
+- cada tarefa é reservada logo antes de ser executada, em uma transação
+  curta, marcando-a com o nome do processo e um prazo (`reservada_ate`); com
+  o `SQLITE_TRANSACTION_MODE=IMMEDIATE`, dois processos nunca reservam a
+  mesma tarefa, e em bancos com `SELECT ... FOR UPDATE SKIP LOCKED` um não
+  espera pelo outro. Tarefas de um processo que morreu voltam para a fila
+  quando o prazo vence, e as que podem passar dele chamam
+  `prorrogar_reserva()` entre uma etapa e outra;
+- uma tarefa que levanta exceção é tentada de novo depois de uma espera que
+  dobra a cada tentativa, até `max_tentativas`, e aí fica como `falhou`, com o
+  erro, para ser vista no admin;
+- tarefas concluídas são apagadas, então a tabela só guarda a fila; as
+  execuções de cada uma são somadas em `MetricaTarefa`.
+
+Só funções registradas com `@tarefa` podem ser executadas, pelo nome
+`modulo.funcao`; os argumentos são nomeados e precisam caber em JSON.
+"""
+
+import logging
+import os
+import socket
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+from time import perf_counter
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import MetricaTarefa, Tarefa
+
+logger = logging.getLogger("diario.tarefas")
+
+TAMANHO_LOTE = 10
+
+# espera antes da 2ª tentativa, dobrada a cada nova falha, até o máximo
+ESPERA_INICIAL = timedelta(seconds=10)
+ESPERA_MAXIMA = timedelta(hours=1)
+
+# quanto tempo uma tarefa reservada fica com o mesmo processo
+PRAZO_RESERVA = timedelta(minutes=10)
+
+_registradas = {}
+
+# (tarefa, banco) sendo executada, para `prorrogar_reserva()`
+_em_execucao = ContextVar("diario_tarefa_em_execucao", default=None)
+
+
+def tarefa(funcao):
+    """Registra `funcao` para que possa ser agendada e executada pela fila"""
+    _registradas[f"{funcao.__module__}.{funcao.__qualname__}"] = funcao
+    return funcao
+
+
+def _nome(funcao) -> str:
+    if isinstance(funcao, str):
+        return funcao
+    return f"{funcao.__module__}.{funcao.__qualname__}"
+
+
+def _funcao_registrada(nome: str):
+    if nome not in _registradas:
+        # registra as tarefas do módulo, se ele ainda não foi importado
+        try:
+            import_string(nome)
+        except ImportError:
+            pass
+    try:
+        return _registradas[nome]
+    except KeyError:
+        raise LookupError(f"Tarefa não registrada: {nome}") from None
+
+
+def agendar(
+    funcao,
+    *,
+    chave="",
+    atraso=None,
+    max_tentativas=5,
+    using=DEFAULT_DB_ALIAS,
+    **argumentos,
+) -> Tarefa:
+    """Coloca `funcao(**argumentos)` na fila.
+
+    Com `chave`, se já houver uma tarefa pendente com a mesma chave, ela é
+    retornada e nada é agendado: várias mudanças seguidas viram um só trabalho.
+    """
+    nome = _nome(funcao)
+    _funcao_registrada(nome)
+    dados = {
+        "nome": nome,
+        "argumentos": argumentos,
+        "chave": chave,
+        "max_tentativas": max_tentativas,
+    }
+    if atraso is not None:
+        dados["executar_em"] = timezone.now() + atraso
+    try:
+        with transaction.atomic(using=using):
+            nova = Tarefa.objects.using(using).create(**dados)
+    except IntegrityError:
+        if not chave:
+            raise
+        return Tarefa.objects.using(using).get(chave=chave, estado=Tarefa.PENDENTE)
+    return nova
+
+
+def identificar_trabalhador() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def reservar(lote=TAMANHO_LOTE, trabalhador=None, using=DEFAULT_DB_ALIAS) -> list:
+    """Reserva até `lote` tarefas prontas, as mais antigas primeiro"""
+    agora = timezone.now()
+    trabalhador = trabalhador or identificar_trabalhador()
+    abandonadas = Q(estado=Tarefa.EXECUTANDO, reservada_ate__lt=agora)
+    pendentes = Q(estado=Tarefa.PENDENTE, executar_em__lte=agora)
+    prontas = abandonadas | pendentes
+    with transaction.atomic(using=using):
+        # duas consultas em vez de um OR, para que as pendentes venham na
+        # ordem do `tarefa_fila_idx`, sem ordenar a fila inteira
+        ids = []
+        for filtro in [abandonadas, pendentes]:
+            ids += (
+                Tarefa.objects.using(using)
+                .filter(filtro)
+                .order_by("executar_em")
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[: lote - len(ids)]
+            )
+            if len(ids) >= lote:
+                break
+        if not ids:
+            return []
+        Tarefa.objects.using(using).filter(prontas, pk__in=ids).update(
+            estado=Tarefa.EXECUTANDO,
+            trabalhador=trabalhador,
+            iniciada_em=agora,
+            reservada_ate=agora + PRAZO_RESERVA,
+            tentativas=F("tentativas") + 1,
+        )
+        return list(
+            Tarefa.objects.using(using)
+            .filter(pk__in=ids, trabalhador=trabalhador, iniciada_em=agora)
+            .order_by("executar_em")
+        )
+
+
+def _espera(tentativas: int) -> timedelta:
+    return min(ESPERA_INICIAL * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+
+
+def _reserva(reservada, using):
+    """A tarefa, desde que ainda seja deste processo (a reserva pode ter vencido)"""
+    return Tarefa.objects.using(using).filter(
+        pk=reservada.pk,
+        trabalhador=reservada.trabalhador,
+        iniciada_em=reservada.iniciada_em,
+    )
+
+
+def prorrogar_reserva() -> bool:
+    """Renova o prazo da reserva da tarefa em execução.
+
+    Para tarefas que podem levar mais que `PRAZO_RESERVA`, chamada entre as
+    etapas. Retorna `False` se a reserva já tinha vencido e a tarefa foi pega
+    por outro processo; fora de uma tarefa, não faz nada.
+    """
+    atual = _em_execucao.get()
+    if atual is None:
+        return True
+    reservada, using = atual
+    return bool(
+        _reserva(reservada, using).update(reservada_ate=timezone.now() + PRAZO_RESERVA)
+    )
+
+
+def _registrar_execucao(nome, concluida, espera_ms, duracao_ms, using):
+    """Soma uma execução às métricas da tarefa, criando a linha se preciso"""
+    contador = "concluidas" if concluida else "falhas"
+    metricas = MetricaTarefa.objects.using(using).filter(nome=nome)
+    somas = {
+        contador: F(contador) + 1,
+        "espera_ms": F("espera_ms") + espera_ms,
+        "duracao_ms": F("duracao_ms") + duracao_ms,
+    }
+    if metricas.update(**somas):
+        return
+    try:
+        with transaction.atomic(using=using):
+            MetricaTarefa.objects.using(using).create(
+                nome=nome, espera_ms=espera_ms, duracao_ms=duracao_ms, **{contador: 1}
+            )
+    except IntegrityError:
+        # outro processo criou a mesma linha ao mesmo tempo
+        metricas.update(**somas)
+
+
+def executar(reservada, using=DEFAULT_DB_ALIAS) -> bool:
+    """Executa uma tarefa já reservada; retorna se deu certo"""
+    espera_ms = (reservada.iniciada_em - reservada.executar_em).total_seconds() * 1000
+    espera_ms = max(int(espera_ms), 0)
+
+    inicio = perf_counter()
+    token = _em_execucao.set((reservada, using))
+    try:
+        _funcao_registrada(reservada.nome)(**reservada.argumentos)
+    except Exception:
+        erro = traceback.format_exc()
+    else:
+        erro = None
+    finally:
+        _em_execucao.reset(token)
+    duracao_ms = int((perf_counter() - inicio) * 1000)
+    _registrar_execucao(reservada.nome, erro is None, espera_ms, duracao_ms, using)
+
+    minha = _reserva(reservada, using)
+    if erro is None:
+        minha.delete()
+        return True
+
+    if reservada.tentativas >= reservada.max_tentativas:
+        logger.error("Tarefa %s falhou de vez:\n%s", reservada, erro)
+        minha.update(estado=Tarefa.FALHOU, reservada_ate=None, erro=erro)
+    else:
+        logger.warning("Tarefa %s falhou, nova tentativa depois:\n%s", reservada, erro)
+        try:
+            with transaction.atomic(using=using):
+                minha.update(
+                    estado=Tarefa.PENDENTE,
+                    executar_em=timezone.now() + _espera(reservada.tentativas),
+                    reservada_ate=None,
+                    erro=erro,
+                )
+        except IntegrityError:
+            # enquanto esta rodava, `agendar()` com a mesma chave criou uma
+            # cópia pendente, que vai fazer o mesmo trabalho
+            minha.delete()
+    return False
+
+
+def processar(lote=TAMANHO_LOTE, trabalhador=None, using=DEFAULT_DB_ALIAS) -> int:
+    """Executa até `lote` tarefas; retorna quantas foram executadas.
+
+    Cada uma é reservada só quando chega a sua vez: reservar o lote inteiro de
+    uma vez faria o prazo das últimas correr enquanto as primeiras rodam, e
+    outro processo poderia pegá-las de novo.
+    """
+    trabalhador = trabalhador or identificar_trabalhador()
+    executadas = 0
+    while executadas < lote:
+        reservadas = reservar(lote=1, trabalhador=trabalhador, using=using)
+        if not reservadas:
+            break
+        executar(reservadas[0], using=using)
+        executadas += 1
+    return executadas
+
+
+def estatisticas_tarefas(using=DEFAULT_DB_ALIAS) -> dict:
+    """Tamanho da fila, atraso da mais antiga e tempos médios de cada tarefa"""
+    agora = timezone.now()
+    fila = {}
+    for linha in (
+        Tarefa.objects.using(using)
+        .values("nome", "estado")
+        .annotate(total=Count("pk"))
+        .order_by()
+    ):
+        fila.setdefault(linha["nome"], {})[linha["estado"]] = linha["total"]
+    mais_antiga = (
+        Tarefa.objects.using(using)
+        .filter(estado=Tarefa.PENDENTE, executar_em__lte=agora)
+        .aggregate(mais_antiga=Min("executar_em"))["mais_antiga"]
+    )
+
+    metricas = {metrica.nome: metrica for metrica in MetricaTarefa.objects.using(using)}
+    tarefas = {}
+    for nome in sorted({*metricas, *fila}):
+        metrica = metricas.get(nome) or MetricaTarefa(nome=nome)
+        execucoes = metrica.concluidas + metrica.falhas
+        tarefas[nome] = {
+            "fila": fila.get(nome, {}),
+            "concluidas": metrica.concluidas,
+            "falhas": metrica.falhas,
+            "media_espera_ms": (
+                round(metrica.espera_ms / execucoes, 2) if execucoes else None
+            ),
+            "media_duracao_ms": (
+                round(metrica.duracao_ms / execucoes, 2) if execucoes else None
+            ),
+        }
+    return {
+        "prontas": Tarefa.objects.using(using)
+        .filter(estado=Tarefa.PENDENTE, executar_em__lte=agora)
+        .count(),
+        "atraso_s": (
+            round((agora - mais_antiga).total_seconds(), 2) if mais_antiga else 0
+        ),
+        "tarefas": tarefas,
+    }
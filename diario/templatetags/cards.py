@@ -0,0 +1,62 @@
+"""Cards de entradas renderizados uma vez e guardados em cache.
+
+`{% card_entrada entrada "template" %}` renderiza o corpo do card só com a
+entrada no contexto, sem o usuário logado, e guarda o HTML em uma chave que
+muda junto com tudo que aparece nele: a entrada, a data da última edição, o
+autor e os links. O que depende de quem está vendo (ex.: os botões de editar
+e apagar) fica fora da tag, no template da lista.
+
+`{% carregar_cards entradas "template" %}`, antes do laço, busca os cards da
+página com um único `get_many()`; sem ela, cada card faz sua própria leitura.
+"""
+
+from django import template
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from diario import cache
+
+register = template.Library()
+
+TEMPLATE_PADRAO = "includes/card_entrada.html"
+
+_CHAVE_CONTEXTO = "diario_cards"
+
+
+def _partes(entrada, nome_template: str) -> tuple:
+    usuario = entrada.usuario
+    return (
+        nome_template,
+        entrada.pk,
+        entrada.data_edicao.isoformat(),
+        usuario.username,
+        usuario.get_absolute_url(),
+        entrada.get_absolute_url(),
+    )
+
+
+@register.simple_tag(takes_context=True)
+def carregar_cards(context, entradas, nome_template=TEMPLATE_PADRAO):
+    if settings.DIARIO_CACHE_FRAGMENTOS:
+        partes = [_partes(entrada, nome_template) for entrada in entradas]
+        context.render_context.setdefault(_CHAVE_CONTEXTO, {}).update(
+            cache.buscar_cards(*partes)
+        )
+    return ""
+
+
+@register.simple_tag(takes_context=True)
+def card_entrada(context, entrada, nome_template=TEMPLATE_PADRAO):
+    if not settings.DIARIO_CACHE_FRAGMENTOS:
+        return mark_safe(get_template(nome_template).render({"entrada": entrada}))
+
+    partes = _partes(entrada, nome_template)
+    carregados = context.render_context.get(_CHAVE_CONTEXTO)
+    if carregados is None:
+        carregados = cache.buscar_cards(partes)
+    html = carregados.get(partes)
+    if html is None:
+        html = get_template(nome_template).render({"entrada": entrada})
+        cache.guardar_card(partes, html)
+    return mark_safe(html)
@@ -0,0 +1,51 @@
+"""Utilitários para limitar o número de consultas SQL feitas nos testes"""
+
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class OrcamentoConsultasMixin:
+    """Mixin para `TestCase` com asserções sobre o número de consultas.
+
+    Diferente de `assertNumQueries()`, que exige um número exato, aqui o teste
+    só falha se o orçamento for ultrapassado, e a mensagem de erro lista as
+    consultas feitas para facilitar achar um N+1.
+    """
+
+    @contextmanager
+    def assertOrcamentoConsultas(self, maximo: int, using=DEFAULT_DB_ALIAS):
+        """Falha se o bloco fizer mais que `maximo` consultas"""
+        with CaptureQueriesContext(connections[using]) as contexto:
+            yield contexto
+        feitas = len(contexto.captured_queries)
+        if feitas > maximo:
+            consultas = "\n".join(
+                f"{i}. {consulta['sql']}"
+                for i, consulta in enumerate(contexto.captured_queries, start=1)
+            )
+            self.fail(
+                f"{feitas} consultas feitas, o orçamento era {maximo}:\n{consultas}"
+            )
+
+    def contar_consultas(self, funcao, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+        """Executa `funcao` e retorna quantas consultas ela fez"""
+        with CaptureQueriesContext(connections[using]) as contexto:
+            funcao(*args, **kwargs)
+        return len(contexto.captured_queries)
+
+    def assertConsultasConstantes(self, funcao, aumentar_dados, using=DEFAULT_DB_ALIAS):
+        """Falha se `funcao` fizer mais consultas depois de `aumentar_dados()`.
+
+        Serve para pegar N+1: o número de consultas de uma página não deve
+        depender de quantas linhas ela mostra.
+        """
+        antes = self.contar_consultas(funcao, using=using)
+        aumentar_dados()
+        depois = self.contar_consultas(funcao, using=using)
+        self.assertEqual(
+            antes,
+            depois,
+            f"O número de consultas cresceu com os dados: {antes} -> {depois}",
+        )
@@ -0,0 +1,83 @@
+"""Testes para as listas e formulários do admin"""
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from diario.models import Entrada, Topico, Usuario
+
+
+class TestAdminEntradas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_superuser(
+            username="admin", email="admin@teste.com", password="123456"
+        )
+        cls.django = Topico.objects.create(topico="Django", slug="django")
+        cls.python = Topico.objects.create(topico="Python", slug="python")
+        cls.entradas = [
+            Entrada.objects.create(
+                topico=topico, usuario=cls.admin, texto_entrada=f"palavra {i} " * 50
+            )
+            for i, topico in enumerate([cls.django, cls.python] * 3)
+        ]
+        cls.url = reverse("admin:diario_entrada_changelist")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        """Testa que tópico e usuário vêm junto com as entradas"""
+        self.client.get(self.url)
+        # inclui buscar o usuário logado, que com o LocMem não fica em cache
+        with self.assertNumQueries(5) as contexto:
+            resposta = self.client.get(self.url)
+        for entrada in self.entradas[:2]:
+            Entrada.objects.create(
+                topico=entrada.topico, usuario=self.admin, texto_entrada="mais"
+            )
+        with self.assertNumQueries(len(contexto.captured_queries)):
+            self.client.get(self.url)
+        self.assertContains(resposta, "palavra 0 palavra\u2026</a>")
+        self.assertNotContains(resposta, "?_facets=True")
+
+    @override_settings(DIARIO_ADMIN_LIMITE_CONTAGEM=3)
+    def test_total_estimado(self):
+        """Testa que só a lista sem filtro estima o total pelos ids"""
+        self.entradas[2].delete()
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.context["cl"].result_count, 6)
+        resposta = self.client.get(self.url, {"topico__id__exact": self.django.pk})
+        self.assertEqual(resposta.context["cl"].result_count, 2)
+        with override_settings(DIARIO_ADMIN_LIMITE_CONTAGEM=10):
+            resposta = self.client.get(self.url)
+            self.assertEqual(resposta.context["cl"].result_count, 5)
+
+    def test_busca_pelo_indice_textual(self):
+        """Testa que a busca do admin usa o FTS, com palavras inteiras"""
+        resposta = self.client.get(self.url, {"q": "palavra 1"})
+        self.assertEqual(list(resposta.context["cl"].result_list), [self.entradas[1]])
+        resposta = self.client.get(self.url, {"q": "palav"})
+        self.assertEqual(resposta.context["cl"].result_count, 0)
+        resposta = self.client.get(self.url, {"q": "!!"})
+        self.assertEqual(resposta.context["cl"].result_count, 6)
+
+    def test_formulario_com_autocomplete(self):
+        """Testa que o formulário não lista todos os tópicos e usuários"""
+        resposta = self.client.get(reverse("admin:diario_entrada_add"))
+        self.assertContains(resposta, 'class="admin-autocomplete"', count=2)
+        self.assertNotContains(resposta, '<option value="%d">' % self.python.pk)
+
+        resposta = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "diario",
+                "model_name": "entrada",
+                "field_name": "topico",
+                "term": "pyt",
+            },
+        )
+        self.assertEqual(
+            [item["text"] for item in resposta.json()["results"]], ["Python"]
+        )
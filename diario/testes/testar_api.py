@@ -0,0 +1,167 @@
+"""Testes para a API JSON somente leitura"""
+
+import json
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from diario.models import Entrada, Topico, Usuario
+
+
+class TestApi(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.topicos = [
+            Topico.objects.create(topico=f"Tópico {i}", slug=f"topico-{i}")
+            for i in range(3)
+        ]
+        cls.topico = cls.topicos[0]
+        agora = timezone.now()
+        cls.entradas = []
+        for i in range(5):
+            entrada = Entrada.objects.create(
+                topico=cls.topico, usuario=cls.usuario, texto_entrada=f"entrada {i}"
+            )
+            entrada.data_pub = agora - timedelta(minutes=5 - i)
+            cls.entradas.append(entrada)
+        Entrada.objects.bulk_update(cls.entradas, ["data_pub"])
+
+    def ler(self, resposta):
+        if resposta.streaming:
+            return json.loads(b"".join(resposta.streaming_content))
+        return resposta.json()
+
+    def test_topicos(self):
+        """Testa a lista de tópicos, do mais recente para o mais antigo"""
+        resposta = self.client.get(reverse("api_topicos"))
+        self.assertEqual(resposta["Content-Type"], "application/json")
+        dados = self.ler(resposta)
+        self.assertEqual(
+            [topico["slug"] for topico in dados["resultados"]],
+            ["topico-2", "topico-1", "topico-0"],
+        )
+        self.assertEqual(dados["resultados"][2]["num_entradas"], 5)
+        self.assertIsNone(dados["proximo"])
+
+    def test_paginacao_por_cursor(self):
+        """Testa percorrer todas as entradas seguindo `proximo`"""
+        url = reverse("api_entradas_topico", kwargs={"topico": self.topico.slug})
+        url += "?limite=2&fields=id"
+        vistas = []
+        while url:
+            resposta = self.client.get(url)
+            self.assertTrue(resposta.streaming)
+            dados = self.ler(resposta)
+            vistas.extend(entrada["id"] for entrada in dados["resultados"])
+            url = dados["proximo"]
+        self.assertEqual(vistas, [entrada.pk for entrada in reversed(self.entradas)])
+
+    def test_campos(self):
+        """Testa o seletor `fields=` e o erro para campos desconhecidos"""
+        url = reverse("api_entradas_topico", kwargs={"topico": self.topico.slug})
+        dados = self.ler(self.client.get(url, {"fields": "texto,usuario"}))
+        self.assertEqual(
+            dados["resultados"][0], {"texto": "entrada 4", "usuario": "usuario"}
+        )
+
+        resposta = self.client.get(url, {"fields": "texto,senha"})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn("senha", resposta.json()["erro"])
+
+        resposta = self.client.get(url, {"limite": "muitos"})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_consultas(self):
+        """Testa que a lista é feita com o tópico, os validadores e uma consulta"""
+        url = reverse("api_entradas_topico", kwargs={"topico": self.topico.slug})
+        with self.assertNumQueries(3):
+            self.ler(self.client.get(url))
+
+    def test_entrada(self):
+        """Testa uma entrada só, e o 404 em JSON"""
+        entrada = self.entradas[0]
+        resposta = self.client.get(reverse("api_entrada", kwargs={"pk": entrada.pk}))
+        dados = resposta.json()
+        self.assertEqual(dados["texto"], "entrada 0")
+        self.assertEqual(dados["topico"], self.topico.slug)
+
+        resposta = self.client.get(reverse("api_entrada", kwargs={"pk": 0}))
+        self.assertEqual(resposta.status_code, 404)
+        self.assertIn("erro", resposta.json())
+
+    def test_entrada_le_so_os_campos_pedidos(self):
+        """Testa que a consulta da entrada só traz os campos de `fields=`"""
+        url = reverse("api_entrada", kwargs={"pk": self.entradas[0].pk})
+        with self.assertNumQueries(1) as contexto:
+            dados = self.client.get(url, {"fields": "id"}).json()
+        self.assertEqual(dados, {"id": self.entradas[0].pk})
+        sql = contexto.captured_queries[0]["sql"]
+        self.assertNotIn("texto_entrada", sql)
+        self.assertNotIn("username", sql)
+        self.assertIn("data_edicao", sql)
+
+    def test_usuario(self):
+        """Testa o perfil e as entradas do usuário"""
+        kwargs = {"username": self.usuario.username}
+        dados = self.client.get(reverse("api_usuario", kwargs=kwargs)).json()
+        self.assertEqual(dados["num_entradas"], 5)
+        self.assertEqual(dados["username"], "usuario")
+
+        resposta = self.client.get(reverse("api_entradas_usuario", kwargs=kwargs))
+        self.assertEqual(len(self.ler(resposta)["resultados"]), 5)
+
+    def test_etag(self):
+        """Testa o 304 com o ETag e que uma entrada nova o invalida"""
+        url = reverse("api_topicos")
+        resposta = self.client.get(url)
+        self.assertNotIn("Last-Modified", resposta)
+        with self.assertNumQueries(1):
+            revalidada = self.client.get(
+                url, headers={"if-none-match": resposta["ETag"]}
+            )
+        self.assertEqual(revalidada.status_code, 304)
+
+        Entrada.objects.create(
+            topico=self.topicos[1], usuario=self.usuario, texto_entrada="nova"
+        )
+        revalidada = self.client.get(url, headers={"if-none-match": resposta["ETag"]})
+        self.assertEqual(revalidada.status_code, 200)
+
+    def test_etag_muda_ao_renomear_topico(self):
+        """Testa que renomear um tópico antigo invalida o ETag da lista"""
+        url = reverse("api_topicos")
+        etag = self.client.get(url)["ETag"]
+        topico = Topico.objects.get(pk=self.topicos[0].pk)
+        topico.topico = "Novo nome"
+        topico.save()
+        revalidada = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(revalidada.status_code, 200)
+        self.assertIn("Novo nome", revalidada.getvalue().decode())
+
+    def test_etag_muda_ao_mover_entrada(self):
+        """Testa que mover uma entrada entre tópicos invalida o ETag da lista"""
+        url = reverse("api_topicos")
+        etag = self.client.get(url)["ETag"]
+        entrada = self.entradas[0]
+        entrada.topico = self.topicos[2]
+        entrada.save()
+        revalidada = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(revalidada.status_code, 200)
+        contadores = {
+            topico["slug"]: topico["num_entradas"]
+            for topico in self.ler(revalidada)["resultados"]
+        }
+        self.assertEqual(contadores, {"topico-2": 1, "topico-1": 0, "topico-0": 4})
+
+    def test_cabecalhos_nao_dependem_do_usuario(self):
+        """Testa que a resposta é pública mesmo para quem está logado"""
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse("api_topicos"))
+        self.assertIn("public", resposta["Cache-Control"])
+        self.assertNotIn("private", resposta["Cache-Control"])
+        self.assertNotIn("Cookie", resposta.get("Vary", ""))
@@ -0,0 +1,165 @@
+"""Testes para as views de leitura assíncronas"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from config.urls import urlpatterns as urlpatterns_projeto
+from diario import views_async
+from diario.models import Entrada, Topico, Usuario
+from diario.views import EntradaList
+
+# as rotas do projeto, com as páginas de leitura servidas pelas views async
+urlpatterns = [
+    path("topicos/", views_async.TopicoList.as_view(), name="topicos"),
+    path(
+        "accounts/perfil/<str:username>",
+        views_async.Perfil.as_view(),
+        name="ver_perfil",
+    ),
+    path(
+        "entradas/<slug:topico>", views_async.EntradaList.as_view(), name="entradas"
+    ),
+    path(
+        "entradas/<slug:topico>/ver/<int:pk>",
+        views_async.EntradaDetail.as_view(),
+        name="ver_entrada",
+    ),
+    *urlpatterns_projeto,
+]
+
+
+class TestViewsAsync(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.entradas = [
+            Entrada.objects.create(
+                topico=cls.topico, usuario=cls.usuario, texto_entrada=f"entrada {i}"
+            )
+            for i in range(EntradaList.entradas_por_pagina + 2)
+        ]
+        cls.urls = [
+            "/topicos/",
+            cls.topico.get_absolute_url(),
+            cls.usuario.get_absolute_url(),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_views_sao_assincronas(self):
+        """Testa que o Django trata as views como corrotinas"""
+        for view in (
+            views_async.TopicoList,
+            views_async.EntradaList,
+            views_async.EntradaDetail,
+            views_async.Perfil,
+        ):
+            with self.subTest(view=view.__name__):
+                self.assertTrue(view.view_is_async)
+
+    async def test_mesmo_html_que_as_views_sincronas(self):
+        """Testa que as duas versões produzem a mesma página"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                sincrona = await self.async_client.get(url)
+                cache.clear()
+                with override_settings(ROOT_URLCONF=__name__):
+                    assincrona = await self.async_client.get(url)
+                self.assertEqual(assincrona.status_code, 200)
+                self.assertEqual(assincrona.content, sincrona.content)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_paginacao(self):
+        """Testa que o cursor da primeira página leva à segunda"""
+        resposta = await self.async_client.get(self.topico.get_absolute_url())
+        pagina = resposta.context["pagina"]
+        self.assertEqual(len(pagina), EntradaList.entradas_por_pagina)
+
+        resposta = await self.async_client.get(
+            self.topico.get_absolute_url(), {"antes": pagina.cursor_anteriores}
+        )
+        self.assertEqual(list(resposta.context["entradas"]), self.entradas[1::-1])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_get_condicional(self):
+        """Testa o 304 das views async com o ETag da primeira resposta"""
+        url = self.topico.get_absolute_url()
+        resposta = await self.async_client.get(url)
+        revalidada = await self.async_client.get(
+            url, headers={"if-none-match": resposta["ETag"]}
+        )
+        self.assertEqual(revalidada.status_code, 304)
+        self.assertIn("Cookie", revalidada["Vary"])
+
+        # renomear um autor muda o ETag, mesmo sem mudar as entradas
+        self.usuario.username = "renomeado"
+        await self.usuario.asave()
+        revalidada = await self.async_client.get(
+            url, headers={"if-none-match": resposta["ETag"]}
+        )
+        self.assertEqual(revalidada.status_code, 200)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_ver_entrada_exige_login(self):
+        """Testa o redirecionamento para o login e a página do usuário logado"""
+        url = self.entradas[0].get_absolute_url()
+        resposta = await self.async_client.get(url)
+        self.assertEqual(resposta.status_code, 302)
+
+        await self.async_client.aforce_login(self.usuario)
+        resposta = await self.async_client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.context["entrada"], self.entradas[0])
+        self.assertIn("private", resposta["Cache-Control"])
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "diario_cache_testes",
+        }
+    },
+    DIARIO_CACHE_USUARIO_TIMEOUT=60,
+)
+class TestViewsAsyncCacheNoBanco(TestCase):
+    """O cache no banco só pode ser usado fora do loop de eventos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("createcachetable", verbosity=0)
+        cls.usuario = Usuario.objects.create_user(
+            username="usuario", email="usuario@teste.com", password="123dasilva4"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.entrada = Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="*primeira*"
+        )
+
+    async def test_paginas(self):
+        """Testa as páginas, do cache e fora dele, sem e com usuário logado"""
+        urls = [
+            "/topicos/",
+            self.topico.get_absolute_url(),
+            self.usuario.get_absolute_url(),
+        ]
+        for _ in range(2):
+            for url in urls:
+                resposta = await self.async_client.get(url)
+                self.assertContains(resposta, "Django")
+
+        # `aforce_login()` cria a sessão `cached_db` com `in cache`, que é síncrono
+        await sync_to_async(self.async_client.force_login)(self.usuario)
+        for _ in range(2):
+            for url in [*urls, self.entrada.get_absolute_url()]:
+                resposta = await self.async_client.get(url)
+                self.assertContains(resposta, "Django")
+        self.assertContains(resposta, "<em>primeira</em>", html=True)
@@ -0,0 +1,148 @@
+"""Testes para a linha do tempo de atividades"""
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from diario.atividades import linha_do_tempo, linha_do_tempo_seguidos
+from diario.models import Atividade, Entrada, Topico, Usuario
+from diario.remocao import marcar_usuario
+
+from .orcamento import OrcamentoConsultasMixin
+
+
+@override_settings(DIARIO_CACHE_FRAGMENTOS=False)
+class TestAtividades(OrcamentoConsultasMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username="usuario", email="usuario@teste.com", password="123dasilva4"
+        )
+        cls.outro = Usuario.objects.create(username="outro", email="outro@teste.com")
+        cls.django = Topico.objects.create(topico="Django", slug="django")
+        cls.python = Topico.objects.create(topico="Python", slug="python")
+        cls.rust = Topico.objects.create(topico="Rust", slug="rust")
+        # alternando os tópicos, para que a linha do tempo misture os dois
+        cls.entradas = [
+            Entrada.objects.create(
+                topico=topico, usuario=cls.usuario, texto_entrada=f"entrada {i}"
+            )
+            for i, topico in enumerate([cls.django, cls.python, cls.rust] * 3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def entradas_da_pagina(self, pagina):
+        return [atividade.entrada for atividade in pagina]
+
+    def test_criar_e_editar(self):
+        """Testa que criar e editar entradas acrescenta linhas na ordem"""
+        entrada = self.entradas[0]
+        self.client.force_login(self.usuario)
+        self.client.post(
+            reverse("editar_entrada", args=["django", entrada.pk]),
+            {"texto_entrada": "editada"},
+        )
+        # salvar só outro campo não é uma edição
+        entrada.save(update_fields=["data_edicao"])
+
+        ultima = Atividade.objects.last()
+        self.assertEqual(Atividade.objects.count(), 10)
+        self.assertEqual(ultima.entrada, entrada)
+        self.assertEqual(ultima.tipo, Atividade.EDITADA)
+
+        # criar pela view grava a entrada uma vez só, sem uma edição junto
+        self.client.post(
+            reverse("criar_entrada", args=["python"]), {"texto_entrada": "nova"}
+        )
+        nova = Entrada.objects.latest("pk")
+        self.assertEqual(
+            list(nova.atividades.values_list("tipo", flat=True)), [Atividade.CRIADA]
+        )
+
+    def test_paginar_linha_do_tempo(self):
+        """Testa as páginas da linha do tempo geral nos dois sentidos"""
+        recentes = self.entradas[::-1]
+        primeira = linha_do_tempo({}, por_pagina=4)
+        self.assertEqual(self.entradas_da_pagina(primeira), recentes[:4])
+        self.assertFalse(primeira.tem_recentes)
+
+        segunda = linha_do_tempo({"antes": primeira.cursor_anteriores}, por_pagina=4)
+        self.assertEqual(self.entradas_da_pagina(segunda), recentes[4:8])
+        terceira = linha_do_tempo({"antes": segunda.cursor_anteriores}, por_pagina=4)
+        self.assertEqual(self.entradas_da_pagina(terceira), recentes[8:])
+        self.assertFalse(terceira.tem_anteriores)
+
+        de_volta = linha_do_tempo({"depois": terceira.cursor_recentes}, por_pagina=4)
+        self.assertEqual(self.entradas_da_pagina(de_volta), recentes[4:8])
+        self.assertTrue(de_volta.tem_recentes)
+
+    def test_seguidos(self):
+        """Testa a linha do tempo só dos tópicos seguidos, juntando os dois"""
+        seguidos = [self.django.pk, self.rust.pk]
+        esperadas = [e for e in self.entradas[::-1] if e.topico_id in seguidos]
+
+        primeira = linha_do_tempo_seguidos(seguidos, {}, por_pagina=4)
+        self.assertEqual(self.entradas_da_pagina(primeira), esperadas[:4])
+        segunda = linha_do_tempo_seguidos(
+            seguidos, {"antes": primeira.cursor_anteriores}, por_pagina=4
+        )
+        self.assertEqual(self.entradas_da_pagina(segunda), esperadas[4:])
+        self.assertFalse(segunda.tem_anteriores)
+        de_volta = linha_do_tempo_seguidos(
+            seguidos, {"depois": segunda.cursor_recentes}, por_pagina=4
+        )
+        self.assertEqual(self.entradas_da_pagina(de_volta), esperadas[:4])
+
+    def test_seguir_e_deixar(self):
+        self.client.force_login(self.usuario)
+        url = reverse("atividades_seguidas")
+        self.client.post(reverse("seguir_topico", args=["python"]))
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.context["seguidos"], [self.python])
+        self.assertEqual(
+            {a.entrada.topico for a in resposta.context["atividades"]}, {self.python}
+        )
+
+        self.client.post(reverse("seguir_topico", args=["python"]), {"acao": "deixar"})
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.context["atividades"], [])
+
+    def test_esconde_apagados(self):
+        Entrada.objects.create(
+            topico=self.django, usuario=self.outro, texto_entrada="do outro"
+        )
+        marcar_usuario(self.usuario)
+        pagina = linha_do_tempo({})
+        self.assertEqual(
+            [entrada.usuario for entrada in self.entradas_da_pagina(pagina)],
+            [self.outro],
+        )
+
+    def test_consultas_constantes(self):
+        """Testa que as páginas não fazem consultas por atividade ou tópico"""
+        url = reverse("atividades")
+        with self.assertOrcamentoConsultas(2):
+            self.client.get(url)
+        self.assertConsultasConstantes(
+            lambda: self.client.get(url, {"antes": "MTA"}), self.criar_mais
+        )
+
+        self.client.force_login(self.usuario)
+        for topico in [self.django, self.python]:
+            self.usuario.topicos_seguidos.add(topico)
+        url = reverse("atividades_seguidas")
+        # sessão, tópicos seguidos, ids da página e as atividades
+        with self.assertOrcamentoConsultas(4):
+            self.client.get(url)
+        self.assertConsultasConstantes(lambda: self.client.get(url), self.criar_mais)
+
+    def criar_mais(self):
+        inicio = Usuario.objects.count()
+        for i in range(inicio, inicio + 5):
+            usuario = Usuario.objects.create(username=f"autor{i}")
+            for topico in [self.django, self.python, self.rust]:
+                Entrada.objects.create(
+                    topico=topico, usuario=usuario, texto_entrada="a"
+                )
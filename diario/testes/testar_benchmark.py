@@ -0,0 +1,69 @@
+"""Testes para as peças do comando `benchmark`"""
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+
+from diario.benchmark import (
+    Resultado,
+    Volumes,
+    comparar,
+    medir,
+    montar_cenarios,
+    popular,
+)
+from diario.models import Entrada, Topico, Usuario
+
+
+@override_settings(DIARIO_CACHE_FRAGMENTOS=False)
+class TestBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        popular(Volumes(usuarios=5, topicos=8, entradas=120), lote=50)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_popular(self):
+        """Testa os volumes criados e os contadores de entradas"""
+        self.assertEqual(Usuario.objects.count(), 5)
+        self.assertEqual(Topico.objects.count(), 8)
+        self.assertEqual(Entrada.objects.count(), 120)
+        total = Topico.objects.aggregate(total=Sum("num_entradas"))["total"]
+        self.assertEqual(total, 120)
+
+    def test_medir(self):
+        """Testa que cada cenário é medido com o número real de consultas"""
+        cenarios = {cenario.nome: cenario for cenario in montar_cenarios()}
+        self.assertIn("entradas_pagina_profunda", cenarios)
+
+        resultado = medir(self.client, cenarios["entradas"], repeticoes=3)
+        self.assertEqual(resultado.repeticoes, 3)
+        self.assertLessEqual(resultado.p50, resultado.p95)
+        self.assertLessEqual(resultado.p95, resultado.p99)
+        self.assertGreater(resultado.memoria_kib, 0)
+        with self.assertNumQueries(resultado.consultas):
+            self.client.get(cenarios["entradas"].url)
+
+    def test_comparar(self):
+        """Testa que só pioras além da tolerância contam como regressão"""
+        base = {
+            "entradas": {
+                "p50": 10,
+                "p95": 20,
+                "p99": 30,
+                "consultas": 3,
+                "memoria_kib": 100,
+            }
+        }
+        dentro = Resultado(12, 40, 90, 3, 110, 30)
+        self.assertEqual(comparar({"entradas": dentro}, base, tolerancia=0.25), [])
+
+        fora = Resultado(13, 20, 30, 4, 130, 30)
+        regressoes = comparar({"entradas": fora}, base, tolerancia=0.25)
+        self.assertEqual(len(regressoes), 3)
+        self.assertEqual(
+            comparar({"entradas": fora}, base, tolerancia=0.25, folga_ms=5)[0],
+            "entradas: memoria_kib 130 > 125.0 (base 100)",
+        )
+        self.assertEqual(comparar({"novo": fora}, base, tolerancia=0.25), [])
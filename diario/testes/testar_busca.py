@@ -0,0 +1,116 @@
+"""Testes para a busca textual nas entradas"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from diario.busca import buscar_entradas, preparar_consulta
+from diario.models import Entrada, Topico, Usuario
+
+
+class TestBusca(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.django = Topico.objects.create(topico="Django", slug="django")
+        cls.python = Topico.objects.create(topico="Python", slug="python")
+        cls.migracoes = Entrada.objects.create(
+            topico=cls.django,
+            usuario=cls.usuario,
+            texto_entrada="Migrações criam as tabelas no banco de dados",
+        )
+        cls.banco = Entrada.objects.create(
+            topico=cls.django,
+            usuario=cls.usuario,
+            texto_entrada="O banco padrão é o SQLite, um banco em arquivo",
+        )
+        cls.listas = Entrada.objects.create(
+            topico=cls.python,
+            usuario=cls.usuario,
+            texto_entrada="Listas guardam <b>vários</b> valores, o banco não",
+        )
+
+    def ids(self, resultado):
+        return [entrada.pk for entrada in resultado]
+
+    def test_preparar_consulta(self):
+        """Testa que operadores do FTS5 são neutralizados"""
+        self.assertEqual(preparar_consulta('banco AND "dados*'), '"banco" "AND" "dados"')
+        self.assertEqual(preparar_consulta("  ...  "), "")
+
+    def test_busca_global_ordenada(self):
+        """Testa que a entrada com mais ocorrências vem primeiro"""
+        resultado = buscar_entradas("banco")
+        self.assertEqual(self.ids(resultado)[0], self.banco.pk)
+        self.assertCountEqual(
+            self.ids(resultado), [self.migracoes.pk, self.banco.pk, self.listas.pk]
+        )
+
+    def test_busca_sem_acentos(self):
+        """Testa que a busca ignora acentos"""
+        self.assertEqual(self.ids(buscar_entradas("migracoes")), [self.migracoes.pk])
+
+    def test_busca_no_topico(self):
+        """Testa a busca restrita a um tópico"""
+        resultado = buscar_entradas("banco", topico=self.python)
+        self.assertEqual(self.ids(resultado), [self.listas.pk])
+
+    def test_trecho_destacado_e_escapado(self):
+        """Testa que o trecho marca o termo e escapa o HTML da entrada"""
+        (entrada,) = buscar_entradas("valores")
+        self.assertIn("<mark>valores</mark>", entrada.trecho)
+        self.assertIn("&lt;b&gt;", entrada.trecho)
+
+    def test_paginacao(self):
+        """Testa que a paginação por cursor percorre todos os resultados"""
+        vistos = []
+        cursor = None
+        while True:
+            resultado = buscar_entradas("banco", cursor=cursor, por_pagina=1)
+            vistos.extend(self.ids(resultado))
+            cursor = resultado.cursor_proximo
+            if cursor is None:
+                break
+        self.assertEqual(vistos, self.ids(buscar_entradas("banco")))
+
+    def test_indice_acompanha_edicao_e_remocao(self):
+        """Testa que os gatilhos mantêm o índice sincronizado"""
+        self.migracoes.texto_entrada = "Texto totalmente diferente"
+        self.migracoes.save()
+        self.assertEqual(self.ids(buscar_entradas("migracoes")), [])
+        self.assertEqual(self.ids(buscar_entradas("diferente")), [self.migracoes.pk])
+
+        self.migracoes.delete()
+        self.assertEqual(self.ids(buscar_entradas("diferente")), [])
+
+    def test_view_busca(self):
+        """Testa as views de busca global e por tópico"""
+        resposta = self.client.get(reverse("busca"), {"q": "sqlite"})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.ids(resposta.context["resultados"]), [self.banco.pk])
+
+        url = reverse("busca_topico", kwargs={"topico": "python"})
+        resposta = self.client.get(url, {"q": "sqlite"})
+        self.assertContains(resposta, "Nenhuma entrada encontrada")
+
+    def test_view_cursor_invalido(self):
+        """Testa que um cursor inválido resulta em 404"""
+        resposta = self.client.get(reverse("busca"), {"q": "banco", "cursor": "x"})
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_reindexar_busca(self):
+        """Testa o comando que reconstrói o índice"""
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM diario_entrada_fts_data WHERE id > 1")
+        saida = StringIO()
+        call_command("reindexar_busca", stdout=saida)
+        self.assertIn("Índice de busca pronto", saida.getvalue())
+        self.assertEqual(self.ids(buscar_entradas("sqlite")), [self.banco.pk])
+
+        call_command("reindexar_busca", "--verificar", stdout=saida)
+        self.assertIn("Índice de busca consistente", saida.getvalue())
@@ -0,0 +1,214 @@
+"""Testes para o cache versionado dos fragmentos das listas"""
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from diario import cache as fragmentos
+from diario.models import Entrada, Topico, Usuario
+
+
+class TestVersoes(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidar_muda_versao(self):
+        """Testa que invalidar um escopo muda só a versão dele"""
+        topico, usuario = fragmentos.obter_versoes(("topico", 1), ("usuario", 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            fragmentos.invalidar(("topico", 1))
+        novo_topico, novo_usuario = fragmentos.obter_versoes(("topico", 1), ("usuario", 1))
+        self.assertNotEqual(novo_topico, topico)
+        self.assertEqual(novo_usuario, usuario)
+
+    def test_versao_perdida_nao_reaproveita_valor(self):
+        """Testa que uma versão recriada nunca volta a um valor antigo"""
+        (antiga,) = fragmentos.obter_versoes(("topico", 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            fragmentos.invalidar(("topico", 1))
+        cache.delete(fragmentos._chave_versao(("topico", 1)))
+        (nova,) = fragmentos.obter_versoes(("topico", 1))
+        self.assertGreater(nova, antiga + 1)
+
+    def test_fragmento_e_estatisticas(self):
+        """Testa acertos e falhas de `fragmento_em_cache()`"""
+        gerados = []
+
+        def gerar():
+            gerados.append(1)
+            return "<p>oi</p>"
+
+        for _ in range(3):
+            fragmento = fragmentos.fragmento_em_cache("teste", [("topicos",)], "", gerar)
+        self.assertEqual(fragmento, "<p>oi</p>")
+        self.assertEqual(len(gerados), 1)
+        self.assertEqual(
+            fragmentos.estatisticas(),
+            {"acertos": 2, "falhas": 1, "taxa_acertos": 2 / 3},
+        )
+
+
+class TestCacheDasListas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.entrada = Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="primeira"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_acerto_nao_consulta_entradas(self):
+        """Testa que um acerto só busca o tópico e os validadores"""
+        url = self.topico.get_absolute_url()
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            resposta = self.client.get(url)
+        self.assertContains(resposta, "primeira")
+
+    def test_acerto_topicos_sem_consultas(self):
+        """Testa que a página de tópicos em cache não faz consultas"""
+        self.client.get(reverse("topicos"))
+        with self.assertNumQueries(0):
+            resposta = self.client.get(reverse("topicos"))
+        self.assertContains(resposta, "1 entrada")
+
+    def test_invalidacao_ao_criar_editar_e_apagar(self):
+        """Testa que as páginas mudam assim que uma entrada muda"""
+        urls = [
+            self.topico.get_absolute_url(),
+            self.usuario.get_absolute_url(),
+            reverse("topicos"),
+        ]
+        for url in urls:
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nova = Entrada.objects.create(
+                topico=self.topico, usuario=self.usuario, texto_entrada="segunda"
+            )
+        self.assertContains(self.client.get(urls[0]), "segunda")
+        self.assertContains(self.client.get(urls[1]), "segunda")
+        self.assertContains(self.client.get(urls[2]), "2 entradas")
+
+        nova.texto_entrada = "editada"
+        with self.captureOnCommitCallbacks(execute=True):
+            nova.save()
+        self.assertContains(self.client.get(urls[0]), "editada")
+        self.assertContains(self.client.get(urls[1]), "editada")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nova.delete()
+        self.assertNotContains(self.client.get(urls[0]), "editada")
+        self.assertNotContains(self.client.get(urls[1]), "editada")
+        self.assertContains(self.client.get(urls[2]), "1 entrada")
+
+    def test_invalidacao_ao_editar_topico(self):
+        """Testa que renomear o tópico invalida a lista de tópicos e os perfis"""
+        urls = [reverse("topicos"), self.usuario.get_absolute_url()]
+        for url in urls:
+            self.client.get(url)
+        self.topico.topico = "Django REST"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topico.save()
+        for url in urls:
+            self.assertContains(self.client.get(url), "Django REST")
+
+    def test_invalidacao_depois_do_commit(self):
+        """Testa que a versão só muda quando a transação é confirmada"""
+        (antiga,) = fragmentos.obter_versoes(("topico", self.topico.pk))
+        with self.captureOnCommitCallbacks() as callbacks:
+            Entrada.objects.create(
+                topico=self.topico, usuario=self.usuario, texto_entrada="segunda"
+            )
+            self.assertEqual(
+                fragmentos.obter_versoes(("topico", self.topico.pk)), [antiga]
+            )
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(
+            fragmentos.obter_versoes(("topico", self.topico.pk)), [antiga]
+        )
+
+    def test_autenticado_ve_rodape_do_dono(self):
+        """Testa que o dono não recebe os cards guardados para anônimos"""
+        url = self.topico.get_absolute_url()
+        self.assertNotContains(self.client.get(url), "Editar")
+
+        self.client.force_login(self.usuario)
+        self.assertContains(self.client.get(url), "Editar")
+
+    def test_estatisticas_apenas_staff(self):
+        """Testa que as estatísticas do cache só aparecem para a equipe"""
+        url = reverse("estatisticas_cache")
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        staff = Usuario.objects.create(
+            username="staff", email="staff@teste.com", password="123456", is_staff=True
+        )
+        self.client.force_login(staff)
+        self.client.get(reverse("topicos"))
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["falhas"], 1)
+
+
+class TestCacheDosCards(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.outro = Usuario.objects.create(
+            username="outro", email="outro@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.entrada = Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="primeira"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def cards_renderizados(self, resposta):
+        return [
+            template.name
+            for template in resposta.templates
+            if template.name == "includes/card_entrada.html"
+        ]
+
+    def test_cards_reaproveitados_com_rodape_do_dono(self):
+        """Testa que os cards em cache não levam o rodapé de quem os gerou"""
+        url = self.topico.get_absolute_url()
+        # logado, a página inteira não vai para o cache, só os cards
+        self.client.force_login(self.outro)
+        resposta = self.client.get(url)
+        self.assertEqual(len(self.cards_renderizados(resposta)), 1)
+        self.assertNotContains(resposta, "Editar")
+
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(url)
+        self.assertEqual(self.cards_renderizados(resposta), [])
+        self.assertContains(resposta, "primeira")
+        self.assertContains(resposta, "Editar")
+
+    def test_card_muda_com_edicao_e_autor(self):
+        """Testa que editar a entrada ou renomear o autor gera o card de novo"""
+        url = self.topico.get_absolute_url()
+        self.client.force_login(self.outro)
+        self.client.get(url)
+
+        self.entrada.texto_entrada = "editada"
+        self.entrada.save()
+        self.assertContains(self.client.get(url), "editada")
+
+        self.usuario.username = "renomeado"
+        self.usuario.save()
+        resposta = self.client.get(url)
+        self.assertContains(resposta, "renomeado")
+        self.assertContains(resposta, "/accounts/perfil/renomeado")
@@ -0,0 +1,163 @@
+"""Testes para a compressão do texto das entradas"""
+
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from diario import compressao
+from diario.busca import buscar_entradas, verificar_indice
+from diario.models import Entrada, Topico, Usuario
+
+LONGO = "anotações sobre migrações do banco de dados " * 20
+
+
+@override_settings(
+    DIARIO_CACHE_FRAGMENTOS=False,
+    DIARIO_COMPRESSAO="zlib",
+    DIARIO_COMPRESSAO_MINIMO=100,
+)
+class TestCompressao(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username="usuario", email="usuario@teste.com", password="123dasilva4"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+
+    def criar(self, texto):
+        return Entrada.objects.create(
+            topico=self.topico, usuario=self.usuario, texto_entrada=texto
+        )
+
+    def gravado(self, entrada):
+        """O valor de `texto_entrada` como está no banco"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT texto_entrada FROM diario_entrada WHERE id = %s", [entrada.pk]
+            )
+            return cursor.fetchone()[0]
+
+    def test_gravar_e_ler(self):
+        """Testa que textos longos são comprimidos e lidos de volta sem mudança"""
+        longa = self.criar(LONGO)
+        curta = self.criar("curta")
+
+        self.assertEqual(compressao.formato_de(self.gravado(longa)), "zlib")
+        self.assertLess(len(self.gravado(longa)), len(LONGO.encode()) / 5)
+        self.assertEqual(self.gravado(curta), "curta")
+        self.assertEqual(Entrada.objects.get(pk=longa.pk).texto_entrada, LONGO)
+        textos = Entrada.objects.filter(pk=longa.pk).values_list(
+            "texto_entrada", flat=True
+        )
+        self.assertEqual(list(textos), [LONGO])
+
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(longa.get_absolute_url())
+        self.assertContains(resposta, "anotações sobre migrações")
+
+    def test_busca(self):
+        """Testa que a busca indexa e destaca o texto, não os bytes comprimidos"""
+        entrada = self.criar(LONGO)
+        (encontrada,) = buscar_entradas("migracoes")
+        self.assertEqual(encontrada, entrada)
+        self.assertIn("<mark>migrações</mark>", encontrada.trecho)
+
+        self.client.force_login(self.usuario)
+        self.client.post(
+            reverse("editar_entrada", args=["django", entrada.pk]),
+            {"texto_entrada": "outro assunto " * 20},
+        )
+        self.assertEqual(len(buscar_entradas("migracoes")), 0)
+        self.assertEqual(len(buscar_entradas("assunto")), 1)
+        verificar_indice()
+
+    def test_comprimir_entradas(self):
+        """Testa que o comando comprime, troca e descomprime as entradas antigas"""
+        with self.settings(DIARIO_COMPRESSAO=""):
+            entradas = [self.criar(LONGO) for _ in range(3)]
+        self.criar("curta")
+        self.assertEqual(self.gravado(entradas[0]), LONGO)
+
+        saida = StringIO()
+        call_command("comprimir_entradas", "--lote", "2", stdout=saida)
+        self.assertIn("3 entrada(s) regravada(s) (zlib)", saida.getvalue())
+        self.assertEqual(compressao.formato_de(self.gravado(entradas[0])), "zlib")
+
+        # nada mais a fazer
+        saida = StringIO()
+        call_command("comprimir_entradas", stdout=saida)
+        self.assertIn("0 entrada(s) regravada(s)", saida.getvalue())
+
+        with self.settings(DIARIO_COMPRESSAO=""):
+            call_command("comprimir_entradas", stdout=StringIO())
+        self.assertEqual(self.gravado(entradas[0]), LONGO)
+        self.assertEqual(len(buscar_entradas("migracoes")), 3)
+        verificar_indice()
+
+    def test_reverter_migracao(self):
+        """Testa que voltar da migração exige descomprimir as entradas antes"""
+        migracao = import_module("diario.migrations.0012_compressao_das_entradas")
+        editor = SimpleNamespace(connection=connection)
+        entrada = self.criar(LONGO)
+        with self.assertRaisesMessage(RuntimeError, "comprimir_entradas"):
+            migracao.exigir_texto_descomprimido(apps, editor)
+
+        with self.settings(DIARIO_COMPRESSAO=""):
+            call_command("comprimir_entradas", stdout=StringIO())
+        self.assertEqual(self.gravado(entrada), LONGO)
+        migracao.exigir_texto_descomprimido(apps, editor)
+
+    def test_migracao_exige_funcao_texto(self):
+        """Testa que a migração recusa uma conexão sem `diario_texto()`"""
+        migracao = import_module("diario.migrations.0012_compressao_das_entradas")
+        editor = SimpleNamespace(connection=connection)
+        migracao.exigir_funcao_texto(apps, editor)
+
+        connection.connection.create_function("diario_texto", 1, None)
+        self.addCleanup(compressao._registrar_funcao, None, connection)
+        with self.assertRaisesMessage(RuntimeError, "diario_texto()"):
+            migracao.exigir_funcao_texto(apps, editor)
+
+    def test_relatorio(self):
+        """Testa o relatório de espaço e de tempo de CPU"""
+        with self.settings(DIARIO_COMPRESSAO=""):
+            self.criar(LONGO)
+        self.criar(LONGO)
+        self.criar("curta")
+
+        saida = StringIO()
+        call_command("comprimir_entradas", "--relatorio", stdout=saida)
+        relatorio = saida.getvalue()
+        self.assertIn("texto: 2 entrada(s)", relatorio)
+        self.assertIn("zlib: 1 entrada(s)", relatorio)
+        self.assertIn("Medição em 2 entrada(s)", relatorio)
+        self.assertIn("ms/MB", relatorio)
+        # o relatório não regrava nada
+        self.assertEqual(compressao.estado_armazenamento()["texto"]["entradas"], 2)
+
+    def test_cabecalho_desconhecido(self):
+        """Testa que um valor com cabeçalho desconhecido não é lido como texto"""
+        with self.assertRaises(ValueError):
+            compressao.descomprimir(b"\x09dados")
+
+    @skipUnless(compressao.zstandard, "o pacote `zstandard` não está instalado")
+    def test_zstd(self):
+        """Testa a compressão com zstd junto com entradas em zlib"""
+        em_zlib = self.criar(LONGO)
+        with self.settings(DIARIO_COMPRESSAO="zstd"):
+            em_zstd = self.criar(LONGO)
+        self.assertEqual(compressao.formato_de(self.gravado(em_zstd)), "zstd")
+        self.assertEqual(
+            [
+                e.texto_entrada
+                for e in Entrada.objects.filter(pk__in=[em_zlib.pk, em_zstd.pk])
+            ],
+            [LONGO, LONGO],
+        )
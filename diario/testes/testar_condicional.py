@@ -0,0 +1,153 @@
+"""Testes para o GET condicional (ETag/Last-Modified) das páginas de entradas"""
+
+from django.test import TestCase
+
+from diario.models import Entrada, Topico, Usuario
+from diario.paginacao import codificar_cursor
+from diario.remocao import marcar_usuario
+
+
+class TestGetCondicional(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.outro = Usuario.objects.create(
+            username="outro", email="outro@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.entrada = Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="oi"
+        )
+
+    def revalidar(self, url, resposta, **extra):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=resposta["ETag"], **extra)
+
+    def test_lista_304_sem_consultar_entradas(self):
+        """Testa o 304 da lista, feito só com o tópico e os validadores"""
+        url = self.topico.get_absolute_url()
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn("ETag", resposta)
+        self.assertIn("Last-Modified", resposta)
+        self.assertIn("public", resposta["Cache-Control"])
+        self.assertIn("no-cache", resposta["Cache-Control"])
+        self.assertIn("Cookie", resposta["Vary"])
+
+        with self.assertNumQueries(2):
+            revalidada = self.revalidar(url, resposta)
+        self.assertEqual(revalidada.status_code, 304)
+        self.assertEqual(revalidada["ETag"], resposta["ETag"])
+
+    def test_if_modified_since(self):
+        """Testa o 304 usando apenas a data da última edição"""
+        url = self.topico.get_absolute_url()
+        resposta = self.client.get(url)
+        revalidada = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=resposta["Last-Modified"]
+        )
+        self.assertEqual(revalidada.status_code, 304)
+
+    def test_lista_muda_com_entradas(self):
+        """Testa que criar, editar e apagar entradas muda o ETag"""
+        url = self.topico.get_absolute_url()
+        resposta = self.client.get(url)
+
+        nova = Entrada.objects.create(
+            topico=self.topico, usuario=self.usuario, texto_entrada="nova"
+        )
+        resposta_nova = self.revalidar(url, resposta)
+        self.assertEqual(resposta_nova.status_code, 200)
+
+        nova.texto_entrada = "editada"
+        nova.save()
+        resposta_editada = self.revalidar(url, resposta_nova)
+        self.assertEqual(resposta_editada.status_code, 200)
+
+        nova.delete()
+        self.assertEqual(self.revalidar(url, resposta_editada).status_code, 200)
+
+    def test_lista_muda_com_topico_e_autores(self):
+        """Testa que renomear o tópico ou um autor, ou apagar um autor, muda o ETag"""
+        url = self.topico.get_absolute_url()
+        Entrada.objects.create(topico=self.topico, usuario=self.outro, texto_entrada="b")
+        resposta = self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topico.topico = "Django 5"
+            self.topico.save()
+        renomeado = self.revalidar(url, resposta)
+        self.assertContains(renomeado, "Django 5")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.username = "renomeado"
+            self.usuario.save()
+        autor_renomeado = self.revalidar(url, renomeado)
+        self.assertContains(autor_renomeado, "renomeado")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            marcar_usuario(self.outro)
+        autor_apagado = self.revalidar(url, autor_renomeado)
+        self.assertEqual(autor_apagado.status_code, 200)
+        self.assertNotContains(autor_apagado, "outro")
+
+    def test_etag_depende_do_usuario(self):
+        """Testa que a página de outro usuário não é revalidada como a própria"""
+        url = self.topico.get_absolute_url()
+        anonima = self.client.get(url)
+
+        self.client.force_login(self.usuario)
+        logada = self.revalidar(url, anonima)
+        self.assertEqual(logada.status_code, 200)
+        self.assertIn("private", logada["Cache-Control"])
+        self.assertEqual(self.revalidar(url, logada).status_code, 304)
+
+        self.client.force_login(self.outro)
+        self.assertEqual(self.revalidar(url, logada).status_code, 200)
+
+    def test_etag_depende_da_pagina(self):
+        """Testa que páginas diferentes da lista têm ETags diferentes"""
+        url = self.topico.get_absolute_url()
+        cursor = codificar_cursor(self.entrada.data_pub, self.entrada.pk)
+        primeira = self.client.get(url)
+        segunda = self.client.get(url, {"antes": cursor})
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(primeira["ETag"], segunda["ETag"])
+
+    def test_perfil(self):
+        """Testa o GET condicional do perfil"""
+        url = self.usuario.get_absolute_url()
+        resposta = self.client.get(url)
+        self.assertEqual(self.revalidar(url, resposta).status_code, 304)
+
+        Entrada.objects.create(topico=self.topico, usuario=self.usuario, texto_entrada="b")
+        resposta = self.revalidar(url, resposta)
+        self.assertEqual(resposta.status_code, 200)
+
+        # as entradas do perfil mostram o nome do tópico
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topico.topico = "Django 5"
+            self.topico.save()
+        self.assertContains(self.revalidar(url, resposta), "Django 5")
+
+    def test_ver_entrada(self):
+        """Testa o GET condicional de uma entrada, depois do login"""
+        url = self.entrada.get_absolute_url()
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(url)
+        self.assertEqual(self.revalidar(url, resposta).status_code, 304)
+
+        self.entrada.texto_entrada = "mudou"
+        self.entrada.save()
+        resposta = self.revalidar(url, resposta)
+        self.assertEqual(resposta.status_code, 200)
+
+        self.outro.save()
+        self.assertEqual(self.revalidar(url, resposta).status_code, 304)
+        self.usuario.username = "renomeado"
+        self.usuario.save()
+        self.assertContains(self.revalidar(url, resposta), "renomeado")
+
+        self.client.logout()
+        self.assertEqual(self.revalidar(url, resposta).status_code, 302)
@@ -0,0 +1,97 @@
+"""Testes de orçamento de consultas SQL para as páginas de listagem"""
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from diario.models import Entrada, Topico, Usuario
+
+from .orcamento import OrcamentoConsultasMixin
+
+
+# os orçamentos valem para o caminho sem cache, veja `testar_cache.py`
+@override_settings(DIARIO_CACHE_FRAGMENTOS=False)
+class TestOrcamentoConsultas(OrcamentoConsultasMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.entrada = Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="oi"
+        )
+
+    def criar_mais_entradas(self):
+        """Cria entradas de outros usuários e tópicos para detectar N+1"""
+        for i in range(5):
+            usuario = Usuario.objects.create(
+                username=f"outro{i}", email=f"outro{i}@teste.com", password="123456"
+            )
+            topico = Topico.objects.create(topico=f"Tópico {i}", slug=f"topico-{i}")
+            Entrada.objects.create(topico=self.topico, usuario=usuario, texto_entrada="a")
+            Entrada.objects.create(topico=topico, usuario=self.usuario, texto_entrada="b")
+
+    def get(self, url):
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_topicos(self):
+        """`TopicoList` faz uma única consulta"""
+        url = reverse("topicos")
+        with self.assertOrcamentoConsultas(1):
+            self.get(url)
+        self.assertConsultasConstantes(lambda: self.get(url), self.criar_mais_entradas)
+
+    def test_entradas(self):
+        """`EntradaList` não faz consultas por card"""
+        url = self.topico.get_absolute_url()
+        # tópico, validadores do GET condicional e a página de entradas
+        with self.assertOrcamentoConsultas(3):
+            self.get(url)
+        self.assertConsultasConstantes(lambda: self.get(url), self.criar_mais_entradas)
+
+    @override_settings(DIARIO_CACHE_USUARIO_TIMEOUT=60)
+    def test_entradas_autenticado(self):
+        """`EntradaList` com usuário logado: sessão e usuário vêm do cache"""
+        self.client.force_login(self.usuario)
+        url = self.topico.get_absolute_url()
+        with self.assertOrcamentoConsultas(4):
+            self.get(url)
+        with self.assertOrcamentoConsultas(3):
+            self.get(url)
+        self.assertConsultasConstantes(lambda: self.get(url), self.criar_mais_entradas)
+
+    def test_perfil(self):
+        """`Perfil` não consulta o tópico de cada entrada"""
+        url = self.usuario.get_absolute_url()
+        # usuário, validadores, as duas somas das estatísticas e a página
+        with self.assertOrcamentoConsultas(5):
+            self.get(url)
+        self.assertConsultasConstantes(lambda: self.get(url), self.criar_mais_entradas)
+
+    def test_cards_sem_texto_inteiro(self):
+        """As listas de cards leem a prévia, não o texto inteiro das entradas"""
+        for url, orcamento in [
+            (self.topico.get_absolute_url(), 3),
+            (self.usuario.get_absolute_url(), 5),
+        ]:
+            with self.assertOrcamentoConsultas(orcamento) as contexto:
+                resposta = self.get(url)
+            self.assertContains(resposta, self.entrada.previa)
+            sql = contexto.captured_queries[-1]["sql"]
+            self.assertIn("previa", sql)
+            self.assertNotIn("texto_entrada", sql)
+            self.assertNotIn("texto_html", sql)
+
+    def test_ver_entrada(self):
+        """`EntradaDetail` busca usuário e tópico junto com a entrada"""
+        self.client.force_login(self.usuario)
+        with self.assertOrcamentoConsultas(3):
+            self.get(self.entrada.get_absolute_url())
+
+    def test_orcamento_estourado(self):
+        """Testa que a asserção falha quando o orçamento é ultrapassado"""
+        with self.assertRaises(AssertionError):
+            with self.assertOrcamentoConsultas(0):
+                Usuario.objects.count()
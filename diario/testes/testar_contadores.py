@@ -0,0 +1,96 @@
+"""Testes para o contador desnormalizado `Topico.num_entradas`"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from diario.models import Entrada, Topico, Usuario
+
+
+class TestContadorEntradas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.outro = Usuario.objects.create(
+            username="outro", email="outro@teste.com", password="123456"
+        )
+        cls.django = Topico.objects.create(topico="Django", slug="django")
+        cls.python = Topico.objects.create(topico="Python", slug="python")
+
+    def criar(self, topico, usuario=None, quantidade=1):
+        for i in range(quantidade):
+            Entrada.objects.create(
+                topico=topico, usuario=usuario or self.usuario, texto_entrada=str(i)
+            )
+
+    def contadores(self):
+        return dict(Topico.objects.values_list("slug", "num_entradas"))
+
+    def test_criar_e_apagar(self):
+        """Testa que criar e apagar entradas atualiza o contador"""
+        self.criar(self.django, quantidade=3)
+        self.assertEqual(self.contadores(), {"django": 3, "python": 0})
+
+        Entrada.objects.first().delete()
+        self.assertEqual(self.contadores(), {"django": 2, "python": 0})
+
+        Entrada.objects.all().delete()
+        self.assertEqual(self.contadores(), {"django": 0, "python": 0})
+
+    def test_editar_sem_mudar_topico(self):
+        """Testa que editar o texto não mexe no contador"""
+        self.criar(self.django)
+        entrada = Entrada.objects.get()
+        entrada.texto_entrada = "editada"
+        entrada.save()
+        self.assertEqual(self.contadores(), {"django": 1, "python": 0})
+
+    def test_mover_entrada(self):
+        """Testa mover uma entrada para outro tópico"""
+        self.criar(self.django, quantidade=2)
+        entrada = Entrada.objects.first()
+        entrada.topico = self.python
+        entrada.save()
+        self.assertEqual(self.contadores(), {"django": 1, "python": 1})
+
+    def test_criar_pela_view(self):
+        """Testa o contador ao criar uma entrada pela `EntradaCreate`"""
+        self.client.force_login(self.usuario)
+        url = reverse("criar_entrada", kwargs={"topico": "python"})
+        self.client.post(url, {"texto_entrada": "oi"})
+        self.assertEqual(self.contadores(), {"django": 0, "python": 1})
+
+    def test_apagar_usuario(self):
+        """Testa que apagar a conta desconta todas as entradas do usuário"""
+        self.criar(self.django, quantidade=3)
+        self.criar(self.python, quantidade=2)
+        self.criar(self.python, usuario=self.outro)
+
+        self.client.force_login(self.usuario)
+        self.client.post(reverse("apagar_conta"))
+        self.assertEqual(self.contadores(), {"django": 0, "python": 1})
+
+    def test_pagina_topicos(self):
+        """Testa que a página de tópicos mostra o contador"""
+        self.criar(self.django, quantidade=2)
+        resposta = self.client.get(reverse("topicos"))
+        self.assertContains(resposta, "2 entradas")
+        self.assertContains(resposta, "0 entradas")
+
+    def test_recontar_entradas(self):
+        """Testa que o comando `recontar_entradas` corrige contadores errados"""
+        self.criar(self.django, quantidade=2)
+        Topico.objects.filter(slug="django").update(num_entradas=7)
+        Topico.objects.filter(slug="python").update(num_entradas=1)
+
+        saida = StringIO()
+        call_command("recontar_entradas", "--verificar", stdout=saida)
+        self.assertIn("2 tópico(s) com contador errado", saida.getvalue())
+        self.assertEqual(self.contadores(), {"django": 7, "python": 1})
+
+        call_command("recontar_entradas", stdout=StringIO())
+        self.assertEqual(self.contadores(), {"django": 2, "python": 0})
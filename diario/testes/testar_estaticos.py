@@ -0,0 +1,163 @@
+"""Testes para os arquivos estáticos com hash, pré-comprimidos"""
+
+import gzip
+import re
+from io import BytesIO, StringIO
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from diario import estaticos
+from diario.checks import verificar_vendorizados
+from diario.estaticos import (
+    ARQUIVOS_VENDORIZADOS,
+    CACHE_IMUTAVEL,
+    CACHE_REVALIDAR,
+    PASTA_VENDOR,
+    ArmazenamentoEstaticos,
+    integridade,
+)
+
+
+class TestEstaticos(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.raiz = pasta.name
+        self.armazenamento = ArmazenamentoEstaticos(
+            location=self.raiz, base_url="/static/"
+        )
+        self.css = b"body { background: url('fundo.svg'); }\n" * 20
+        self.armazenamento.save("estilo.css", ContentFile(self.css))
+        self.armazenamento.save("fundo.svg", ContentFile(b"<svg></svg>"))
+        caminhos = {
+            nome: (self.armazenamento, nome) for nome in ["estilo.css", "fundo.svg"]
+        }
+        list(self.armazenamento.post_process(caminhos))
+        self.armazenamento.save_manifest()
+        self.css_com_hash = self.armazenamento.hashed_files["estilo.css"]
+        # a view consulta o armazenamento global, que aqui é o do teste
+        patcher = override_settings(STATIC_ROOT=self.raiz)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.staticfiles_storage = estaticos.staticfiles_storage
+        estaticos.staticfiles_storage = self.armazenamento
+        self.addCleanup(
+            setattr, estaticos, "staticfiles_storage", self.staticfiles_storage
+        )
+
+    def url(self, nome):
+        return reverse("estaticos", kwargs={"caminho": nome})
+
+    def test_versoes_comprimidas(self):
+        """Testa o gzip ao lado do arquivo com hash, e nada para os pequenos"""
+        self.assertNotEqual(self.css_com_hash, "estilo.css")
+        with self.armazenamento.open(self.css_com_hash + ".gz") as arquivo:
+            comprimido = arquivo.read()
+        with self.armazenamento.open(self.css_com_hash) as arquivo:
+            self.assertEqual(gzip.decompress(comprimido), arquivo.read())
+        svg = self.armazenamento.hashed_files["fundo.svg"]
+        self.assertFalse(self.armazenamento.exists(svg + ".gz"))
+        # a referência no CSS também aponta para o nome com hash
+        self.assertIn(svg.encode(), gzip.decompress(comprimido))
+
+    def test_servir_com_hash(self):
+        """Testa o cache de um ano e a escolha da versão comprimida"""
+        resposta = self.client.get(
+            # sem `br`, para não depender do pacote `brotli` estar instalado
+            self.url(self.css_com_hash),
+            headers={"accept-encoding": "gzip, deflate"},
+        )
+        self.assertEqual(resposta["Cache-Control"], CACHE_IMUTAVEL)
+        self.assertEqual(resposta["Content-Type"], "text/css")
+        self.assertEqual(resposta["Content-Encoding"], "gzip")
+        self.assertEqual(resposta["Vary"], "Accept-Encoding")
+        corpo = b"".join(resposta.streaming_content)
+        self.assertTrue(gzip.decompress(corpo).startswith(b"body"))
+
+        resposta = self.client.get(self.url(self.css_com_hash))
+        self.assertNotIn("Content-Encoding", resposta)
+
+    def test_servir_sem_hash(self):
+        """Testa que o nome original é sempre revalidado"""
+        resposta = self.client.get(self.url("estilo.css"))
+        self.assertEqual(resposta["Cache-Control"], CACHE_REVALIDAR)
+        revalidada = self.client.get(
+            self.url("estilo.css"),
+            headers={"if-modified-since": resposta["Last-Modified"]},
+        )
+        self.assertEqual(revalidada.status_code, 304)
+
+    def test_servir_inexistente(self):
+        """Testa o 404 para arquivos fora da pasta ou só comprimidos"""
+        for nome in ["nao-existe.css", "../settings.py", self.css_com_hash + ".gz"]:
+            self.assertEqual(self.client.get(self.url(nome)).status_code, 404)
+
+
+class TestPaginas(TestCase):
+    def test_sem_recursos_de_terceiros(self):
+        """Testa que as páginas não dependem de CDNs"""
+        resposta = self.client.get(reverse("index"))
+        self.assertNotContains(resposta, "cdn.jsdelivr.net")
+        self.assertNotContains(resposta, "fonts.googleapis.com")
+        self.assertContains(resposta, "/static/vendor/bootstrap/bootstrap.min.css")
+
+    def test_font_face(self):
+        """Testa que cada `@font-face` declara só o nome da família"""
+        css = (
+            Path(estaticos.__file__).parent / "static" / "stylesheet.css"
+        ).read_text()
+        familias = re.findall(r"@font-face\s*{[^}]*font-family:\s*([^;]+);", css)
+        self.assertEqual(len(familias), 3)
+        for familia in familias:
+            self.assertRegex(familia, r'^"[^",]+"$')
+
+
+class TestVendorizados(TestCase):
+    def test_verificacao(self):
+        """Testa o aviso do `check` enquanto faltam arquivos em `vendor/`"""
+        with tempfile.TemporaryDirectory() as pasta:
+            with mock.patch.object(estaticos, "PASTA_VENDOR", Path(pasta)):
+                (aviso,) = verificar_vendorizados(None)
+                self.assertEqual(aviso.id, "diario.W001")
+
+                for _, destino, _ in ARQUIVOS_VENDORIZADOS:
+                    caminho = Path(pasta) / destino
+                    caminho.parent.mkdir(parents=True, exist_ok=True)
+                    caminho.write_bytes(b"")
+                self.assertEqual(verificar_vendorizados(None), [])
+
+    def test_vendorizados_no_repositorio(self):
+        """Testa que os arquivos estão no repositório e conferem com a integridade"""
+        for _, destino, esperada in ARQUIVOS_VENDORIZADOS:
+            dados = (PASTA_VENDOR / destino).read_bytes()
+            self.assertEqual(integridade(dados), esperada, destino)
+
+    def vendorizar(self, arquivos, dados, **opcoes):
+        with tempfile.TemporaryDirectory() as pasta, mock.patch.multiple(
+            "diario.management.commands.vendorizar_estaticos",
+            ARQUIVOS_VENDORIZADOS=arquivos,
+            PASTA_VENDOR=Path(pasta),
+            urlopen=mock.MagicMock(return_value=BytesIO(dados)),
+        ):
+            call_command("vendorizar_estaticos", stdout=StringIO(), **opcoes)
+            return (Path(pasta) / "a.css").read_bytes()
+
+    def test_comando_confere_integridade(self):
+        """Testa que o comando recusa arquivos adulterados ou sem integridade"""
+        fixado = [("https://x.com/a.css", "a.css", integridade(b"a"))]
+        self.assertEqual(self.vendorizar(fixado, b"a"), b"a")
+        with self.assertRaisesMessage(CommandError, "não confere"):
+            self.vendorizar(fixado, b"b")
+
+        sem_hash = [("https://x.com/a.css", "a.css", None)]
+        with self.assertRaisesMessage(CommandError, "--aceitar-sem-integridade"):
+            self.vendorizar(sem_hash, b"a")
+        self.assertEqual(
+            self.vendorizar(sem_hash, b"a", aceitar_sem_integridade=True), b"a"
+        )
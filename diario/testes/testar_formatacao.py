@@ -0,0 +1,226 @@
+"""Testes para a formatação das entradas em Markdown"""
+
+from io import StringIO
+from time import perf_counter
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from diario import formatacao
+from diario.formatacao import renderizar
+from diario.models import Entrada, Topico, Usuario
+
+
+class TestRenderizar(SimpleTestCase):
+    def test_blocos(self):
+        """Testa títulos, parágrafos, listas, citações, código e linhas"""
+        texto = "\n".join(
+            [
+                "# Título",
+                "",
+                "primeira linha",
+                "segunda linha",
+                "",
+                "- um",
+                "- dois",
+                "",
+                "1. primeiro",
+                "2. segundo",
+                "",
+                "> citado",
+                "",
+                "```",
+                "if a < b:",
+                "    **não** é ênfase",
+                "```",
+                "---",
+            ]
+        )
+        self.assertHTMLEqual(
+            renderizar(texto),
+            "<h2>Título</h2>"
+            "<p>primeira linha<br>segunda linha</p>"
+            "<ul><li>um</li><li>dois</li></ul>"
+            "<ol><li>primeiro</li><li>segundo</li></ol>"
+            "<blockquote><p>citado</p></blockquote>"
+            "<pre><code>if a &lt; b:\n    **não** é ênfase</code></pre>"
+            "<hr>",
+        )
+
+    def test_inline(self):
+        """Testa ênfase, código e links dentro do texto"""
+        self.assertHTMLEqual(
+            renderizar(
+                "**negrito**, *itálico*, `x = *y*` e [docs](https://djangoproject.com)"
+            ),
+            "<p><strong>negrito</strong>, <em>itálico</em>, <code>x = *y*</code> e "
+            '<a href="https://djangoproject.com" rel="nofollow noopener">docs</a></p>',
+        )
+        # sublinhados no meio das palavras não são ênfase
+        self.assertHTMLEqual(renderizar("nome_de_variavel"), "<p>nome_de_variavel</p>")
+
+    def test_marcadores_sem_par(self):
+        """Testa ênfases aninhadas ou sem par, e o tempo com muitos marcadores"""
+        self.assertHTMLEqual(
+            renderizar("***a*** e **b *c* d**"),
+            "<p><em><strong>a</strong></em> e <strong>b <em>c</em> d</strong></p>",
+        )
+        self.assertHTMLEqual(renderizar("**a*"), "<p>*<em>a</em></p>")
+        self.assertHTMLEqual(renderizar("*a**"), "<p><em>a</em>*</p>")
+        # a ênfase não atravessa o link
+        self.assertHTMLEqual(
+            renderizar("*a [b*](https://x.com)"),
+            '<p>*a <a href="https://x.com" rel="nofollow noopener">b*</a></p>',
+        )
+        # cada marcador sem par não pode fazer o resto do texto ser relido
+        for unidade in ["_a ", "**a ", "*a ", "[a ", "[a]("]:
+            inicio = perf_counter()
+            renderizar(unidade * 20000)
+            self.assertLess(perf_counter() - inicio, 1, unidade)
+
+    def test_titulos(self):
+        """Testa o fechamento opcional dos títulos e o tempo com muitos `#`"""
+        self.assertHTMLEqual(renderizar("## Título ##"), "<h3>Título</h3>")
+        self.assertHTMLEqual(renderizar("# C#"), "<h2>C</h2>")
+        inicio = perf_counter()
+        renderizar("# " + "#" * 40000 + "a")
+        self.assertLess(perf_counter() - inicio, 1)
+
+    def test_citacoes_aninhadas(self):
+        """Testa que citações muito fundas viram texto em vez de estourar a pilha"""
+        self.assertHTMLEqual(
+            renderizar("> a\n> > b"),
+            "<blockquote><p>a</p><blockquote><p>b</p></blockquote></blockquote>",
+        )
+        html = renderizar(">" * 990 + " x")
+        profundidade = formatacao.PROFUNDIDADE_MAXIMA
+        self.assertEqual(html.count("<blockquote>"), profundidade)
+        self.assertIn("&gt;" * (990 - profundidade) + " x", html)
+
+    def test_sanitizar(self):
+        """Testa que HTML digitado e links perigosos não passam"""
+        html = renderizar(
+            '<script>alert(1)</script> <img src=x onerror="alert(1)">\n'
+            "[a](javascript:alert(1)) [b](/\x01javascript:alert(1)) "
+            '[c](https://x.com/"onmouseover="alert(1))'
+        )
+        self.assertNotIn("<script", html)
+        self.assertNotIn("<img", html)
+        self.assertNotIn('href="javascript', html)
+        self.assertNotIn('href="/\x01', html)
+        self.assertNotIn('"onmouseover', html)
+        self.assertIn("&lt;script&gt;", html)
+        # caminhos relativos ao protocolo levam para outro site
+        html = renderizar("[a](//x.com) [b](/\\x.com) [c](/topicos/)")
+        self.assertNotIn('href="//', html)
+        self.assertNotIn('href="/\\', html)
+        self.assertIn('href="/topicos/"', html)
+        # o caractere que marca os trechos reservados é removido do texto
+        self.assertNotIn("\x00", renderizar("\x000\x00 `código`"))
+
+
+class TestHtmlDasEntradas(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username="usuario", email="usuario@teste.com", password="123dasilva4"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def criar(self, texto="**oi**"):
+        return Entrada.objects.create(
+            topico=self.topico, usuario=self.usuario, texto_entrada=texto
+        )
+
+    def test_renderizar_so_quando_o_texto_muda(self):
+        """Testa que o HTML é gravado ao salvar e refeito só se o texto mudar"""
+        entrada = self.criar()
+        self.assertEqual(entrada.texto_html, "<p><strong>oi</strong></p>")
+
+        with mock.patch.object(
+            formatacao, "renderizar", wraps=formatacao.renderizar
+        ) as renderizar:
+            entrada.save()
+            Entrada.objects.get(pk=entrada.pk).save()
+            self.assertEqual(renderizar.call_count, 0)
+
+            self.client.post(
+                reverse("editar_entrada", args=["django", entrada.pk]),
+                {"texto_entrada": "*editada*"},
+            )
+            self.assertEqual(renderizar.call_count, 1)
+        self.assertEqual(
+            Entrada.objects.get(pk=entrada.pk).texto_html, "<p><em>editada</em></p>"
+        )
+
+    @override_settings(DIARIO_TAMANHO_MAXIMO_ENTRADA=10)
+    def test_tamanho_maximo(self):
+        """Testa que os formulários recusam textos acima do limite"""
+        url = reverse("criar_entrada", args=["django"])
+        resposta = self.client.post(url, {"texto_entrada": "a" * 11})
+        self.assertContains(resposta, 'maxlength="10"')
+        self.assertFalse(Entrada.objects.exists())
+
+        self.client.post(url, {"texto_entrada": "a" * 10})
+        entrada = Entrada.objects.get()
+        self.client.post(
+            reverse("editar_entrada", args=["django", entrada.pk]),
+            {"texto_entrada": "b" * 11},
+        )
+        entrada.refresh_from_db()
+        self.assertEqual(entrada.texto_entrada, "a" * 10)
+
+    def test_ver_entrada(self):
+        """Testa que a página da entrada mostra o HTML gravado"""
+        entrada = self.criar("# Título\n\n<b>texto</b>")
+        resposta = self.client.get(entrada.get_absolute_url())
+        self.assertContains(resposta, "<h2>Título</h2>", html=True)
+        self.assertContains(resposta, "&lt;b&gt;texto&lt;/b&gt;")
+
+    def test_citacoes_fundas(self):
+        """Testa que criar e ver uma entrada com citações fundas não dá erro"""
+        texto = ">" * 990 + " x"
+        resposta = self.client.post(
+            reverse("criar_entrada", args=["django"]), {"texto_entrada": texto}
+        )
+        self.assertEqual(resposta.status_code, 302)
+        entrada = Entrada.objects.get()
+        Entrada.objects.filter(pk=entrada.pk).update(hash_html="")
+        resposta = self.client.get(entrada.get_absolute_url())
+        self.assertContains(resposta, "<blockquote>")
+
+    def test_entradas_desatualizadas(self):
+        """Testa a renderização na leitura e o comando que grava as pendentes"""
+        entrada = self.criar()
+        # como um `bulk_create()` ou um `update()`, que não passam pelo `save()`
+        Entrada.objects.filter(pk=entrada.pk).update(texto_entrada="_nova_")
+
+        with mock.patch.object(
+            formatacao, "renderizar", wraps=formatacao.renderizar
+        ) as renderizar:
+            for _ in range(2):
+                resposta = self.client.get(entrada.get_absolute_url())
+                self.assertContains(resposta, "<em>nova</em>", html=True)
+            # a segunda leitura vem do cache, pelo hash do texto
+            self.assertEqual(renderizar.call_count, 1)
+
+        saida = StringIO()
+        call_command("renderizar_entradas", stdout=saida)
+        self.assertIn("1 entrada(s) renderizada(s)", saida.getvalue())
+        self.assertEqual(
+            Entrada.objects.get(pk=entrada.pk).texto_html, "<p><em>nova</em></p>"
+        )
+
+        saida = StringIO()
+        call_command("renderizar_entradas", stdout=saida)
+        self.assertIn("0 entrada(s) renderizada(s)", saida.getvalue())
+
+        with mock.patch.object(formatacao, "VERSAO", formatacao.VERSAO + 1):
+            self.assertEqual(formatacao.renderizar_pendentes(), 1)
@@ -0,0 +1,81 @@
+"""Testes que conferem os planos de execução das listas de entradas"""
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from diario.models import Entrada, Topico, Usuario
+from diario.paginacao import codificar_cursor
+
+
+@override_settings(DIARIO_CACHE_FRAGMENTOS=False)
+class TestPlanosDeConsulta(TestCase):
+    """Garante que as listas usam os índices compostos em vez de varrer a tabela
+
+    Cada consulta feita pela view é repetida com `EXPLAIN QUERY PLAN`, e o
+    teste falha se o SQLite escolher um `SCAN` (varredura completa) ou precisar
+    de uma B-tree temporária para o `ORDER BY`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.entrada = Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="oi"
+        )
+        cls.cursor = codificar_cursor(cls.entrada.data_pub, cls.entrada.pk)
+
+    def assertPlanosUsamIndices(self, url, parametros=None, percursos=()):
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(url, parametros)
+        self.assertEqual(resposta.status_code, 200)
+
+        with connection.cursor() as cursor:
+            for consulta in contexto.captured_queries:
+                sql = consulta["sql"]
+                if not sql.startswith("SELECT"):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plano = [linha[-1] for linha in cursor.fetchall()]
+                for passo in plano:
+                    if passo in percursos:
+                        continue
+                    self.assertFalse(
+                        passo.startswith("SCAN") or "TEMP B-TREE" in passo,
+                        f"Plano ruim para {sql}:\n" + "\n".join(plano),
+                    )
+
+    def test_plano_entradas(self):
+        url = self.topico.get_absolute_url()
+        self.assertPlanosUsamIndices(url)
+        self.assertPlanosUsamIndices(url, {"antes": self.cursor})
+        self.assertPlanosUsamIndices(url, {"depois": self.cursor})
+
+    def test_plano_perfil(self):
+        url = self.usuario.get_absolute_url()
+        # os tópicos das estatísticas são ordenados pela soma, que só existe
+        # depois de agrupar; as páginas seguintes não têm estatísticas e
+        # continuam sem B-tree temporária
+        soma = ["USE TEMP B-TREE FOR ORDER BY"]
+        self.assertPlanosUsamIndices(url, percursos=soma)
+        self.assertPlanosUsamIndices(url, {"antes": self.cursor})
+        self.assertPlanosUsamIndices(url, {"depois": self.cursor})
+
+    @override_settings(DIARIO_ADMIN_LIMITE_CONTAGEM=0)
+    def test_plano_admin_entradas(self):
+        admin = Usuario.objects.create_superuser(
+            username="admin", email="admin@teste.com", password="123456"
+        )
+        self.client.force_login(admin)
+        url = reverse("admin:diario_entrada_changelist")
+        # sem filtro, a lista percorre o índice na ordem e para no LIMIT
+        percurso = ["SCAN diario_entrada USING INDEX entrada_data_idx"]
+        self.assertPlanosUsamIndices(url, percursos=percurso)
+        self.assertPlanosUsamIndices(
+            url, {"data_pub__gte": "2020-01-01 00:00:00+00:00"}, percursos=percurso
+        )
+        self.assertPlanosUsamIndices(url, {"topico__id__exact": self.topico.pk})
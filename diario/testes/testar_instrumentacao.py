@@ -0,0 +1,124 @@
+"""Testes para a medição de desempenho por requisição"""
+
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from diario import instrumentacao
+from diario.models import Entrada, MetricaRota, Topico, Usuario
+
+
+@override_settings(
+    DIARIO_INSTRUMENTACAO=True,
+    DIARIO_CACHE_FRAGMENTOS=False,
+    DIARIO_LIMITE_REQUISICAO_LENTA_MS=60_000,
+    DIARIO_LIMITE_CONSULTA_LENTA_MS=60_000,
+    DIARIO_METRICAS_LOTE=1000,
+    DIARIO_METRICAS_INTERVALO_S=3600,
+)
+class TestInstrumentacao(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.staff = Usuario.objects.create(
+            username="staff", email="staff@teste.com", password="123456", is_staff=True
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="oi"
+        )
+
+    def setUp(self):
+        cache.clear()
+        instrumentacao._pendentes.retirar()
+
+    def test_server_timing(self):
+        """Testa o cabeçalho com o total, as consultas e os templates"""
+        # as métricas ficam em memória até completar o lote
+        with self.assertNumQueries(3) as contexto:
+            resposta = self.client.get(self.topico.get_absolute_url())
+        metricas = dict(
+            item.strip().split(";", 1) for item in resposta["Server-Timing"].split(",")
+        )
+        self.assertEqual(set(metricas), {"total", "sql", "templates"})
+        self.assertIn(
+            f'desc="{len(contexto.captured_queries)} consultas"', metricas["sql"]
+        )
+
+    def test_metricas_em_lote(self):
+        """Testa que as métricas só vão para o banco a cada lote ou intervalo"""
+        url = self.topico.get_absolute_url()
+        with self.settings(DIARIO_METRICAS_LOTE=3):
+            for _ in range(2):
+                self.client.get(url)
+            self.assertFalse(MetricaRota.objects.exists())
+            # a terceira completa o lote, gravado com uma linha por rota
+            self.client.get(url)
+        metrica = MetricaRota.objects.get(rota="entradas")
+        self.assertEqual(metrica.requisicoes, 3)
+        self.assertEqual(metrica.consultas, 9)
+
+        with self.settings(DIARIO_METRICAS_INTERVALO_S=0):
+            self.client.get(url)
+        metrica.refresh_from_db()
+        self.assertEqual(metrica.requisicoes, 4)
+
+    @override_settings(
+        ROOT_URLCONF="diario.testes.testar_async", DIARIO_METRICAS_LOTE=1
+    )
+    async def test_views_async(self):
+        """Testa que as consultas do ORM assíncrono também são contadas"""
+        resposta = await self.async_client.get(self.topico.get_absolute_url())
+        self.assertIn('desc="3 consultas"', resposta["Server-Timing"])
+        metrica = await MetricaRota.objects.aget(rota="entradas")
+        self.assertEqual(metrica.requisicoes, 1)
+
+    @override_settings(DIARIO_INSTRUMENTACAO=False)
+    def test_desligada(self):
+        """Testa que sem a configuração o middleware não é usado"""
+        resposta = self.client.get(reverse("topicos"))
+        self.assertNotIn("Server-Timing", resposta)
+
+    @override_settings(
+        DIARIO_LIMITE_REQUISICAO_LENTA_MS=0, DIARIO_LIMITE_CONSULTA_LENTA_MS=0
+    )
+    def test_logs_de_lentidao(self):
+        """Testa os logs estruturados de requisições e consultas lentas"""
+        with self.assertLogs("diario.instrumentacao", "WARNING") as logs:
+            self.client.get(self.topico.get_absolute_url())
+        eventos = [json.loads(registro.getMessage()) for registro in logs.records]
+
+        consultas = [e for e in eventos if e["evento"] == "consulta_lenta"]
+        self.assertEqual(len(consultas), 3)
+        self.assertIn("diario_entrada", consultas[-1]["sql"])
+
+        requisicao = eventos[-1]
+        self.assertEqual(requisicao["evento"], "requisicao_lenta")
+        self.assertEqual(requisicao["rota"], "entradas")
+        self.assertEqual(requisicao["status"], 200)
+        self.assertEqual(requisicao["consultas"], 3)
+
+    def test_histogramas_por_rota(self):
+        """Testa o endpoint de monitoramento, restrito à equipe"""
+        for _ in range(3):
+            self.client.get(self.topico.get_absolute_url())
+        self.client.get("/nao-existe/")
+        # ficam no banco, somadas entre os processos, e não no cache de cada um
+        cache.clear()
+
+        url = reverse("estatisticas_rotas")
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.staff)
+        dados = self.client.get(url).json()
+        entradas = dados["entradas"]
+        self.assertEqual(entradas["requisicoes"], 3)
+        self.assertEqual(entradas["media_consultas"], 3)
+        self.assertEqual(sum(entradas["histograma"].values()), 3)
+        self.assertIsNotNone(entradas["p95_ate_ms"])
+        self.assertEqual(dados["<nao-resolvida>"]["requisicoes"], 1)
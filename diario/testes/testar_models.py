@@ -1,6 +1,9 @@
+from importlib import import_module
+
+from django.apps import apps
 from django.test import TestCase
 
-from diario.models import Topico, Entrada, Usuario
+from diario.models import TAMANHO_PREVIA, Entrada, Topico, Usuario
 
 
 class UsuarioModelTest(TestCase):
@@ -49,6 +52,43 @@ class TopicoModelTest(TestCase):
         self.assertEqual(str(topico1), "Este é um tópico bem longo, algum p...")
         self.assertEqual(str(topico2), "Veja aqui o seu tópico")
 
+    def test_topico_slug_gerado(self):
+        """Testa a geração automática de slug quando nenhum é fornecido"""
+        topico = Topico.objects.create(topico="Programação Orientada a Objetos")
+        self.assertEqual(topico.slug, "programacao-orientada-a-objetos")
+
+    def test_topico_slug_repetido(self):
+        """Testa que slugs gerados para tópicos com o mesmo nome não colidem"""
+        topico1 = Topico.objects.create(topico="Física")
+        topico2 = Topico.objects.create(topico="Física")
+        topico3 = Topico.objects.create(topico="física!")
+        self.assertEqual(
+            [topico1.slug, topico2.slug, topico3.slug], ["fisica", "fisica-2", "fisica-3"]
+        )
+
+    def test_topico_slug_longo_repetido(self):
+        """Testa que o sufixo cabe no tamanho máximo do slug"""
+        nome = "a" * 80
+        topico1 = Topico.objects.create(topico=nome)
+        topico2 = Topico.objects.create(topico=nome)
+        self.assertEqual(len(topico1.slug), 50)
+        self.assertEqual(topico2.slug, "a" * 48 + "-2")
+
+    def test_migracao_mantem_slugs_preenchidos(self):
+        """Testa que a correção dos slugs na migração não troca os já usados"""
+        migracao = import_module("diario.migrations.0002_indices_e_slug_unico")
+        sem_slug = Topico.objects.create(topico="Django")
+        com_slug = Topico.objects.create(topico="Outro nome", slug="django-x")
+        # como um tópico antigo, sem slug, criado antes do que já usa "django"
+        Topico.objects.filter(pk=sem_slug.pk).update(slug="")
+        Topico.objects.filter(pk=com_slug.pk).update(slug="django")
+
+        migracao.corrigir_slugs_repetidos(apps, None)
+        sem_slug.refresh_from_db()
+        com_slug.refresh_from_db()
+        self.assertEqual(com_slug.slug, "django")
+        self.assertEqual(sem_slug.slug, "django-2")
+
 
 class EntradaModelTest(TestCase):
     """Testes para o modelo `Entrada`"""
@@ -84,3 +124,22 @@ class EntradaModelTest(TestCase):
             texto_entrada="Olha só o que eu digitei aqui",
         )
         self.assertEqual(str(entrada), "Olha só o que eu digitei aqui")
+
+    def test_entrada_previa(self):
+        """Testa que a prévia é limitada e acompanha as edições do texto"""
+        entrada = Entrada.objects.create(
+            topico=self.topico, usuario=self.usuario, texto_entrada="uma\n\nlinha"
+        )
+        self.assertEqual(entrada.previa, "uma linha")
+
+        entrada.texto_entrada = "palavra " * 100
+        entrada.save(update_fields=["texto_entrada"])
+        entrada.refresh_from_db()
+        self.assertEqual(len(entrada.previa), TAMANHO_PREVIA)
+        self.assertTrue(entrada.previa.endswith("…"))
+
+        # salvar com o texto adiado não apaga a prévia
+        adiada = Entrada.objects.defer("texto_entrada").get(pk=entrada.pk)
+        adiada.save()
+        adiada.refresh_from_db()
+        self.assertEqual(adiada.previa, entrada.previa)
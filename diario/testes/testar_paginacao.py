@@ -0,0 +1,91 @@
+"""Testes para a paginação por cursor das listas de entradas"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from diario.models import Entrada, Topico, Usuario
+from diario.paginacao import codificar_cursor, decodificar_cursor
+from diario.views import EntradaList
+
+
+class TestPaginacaoCursor(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        cls.url = reverse("entradas", kwargs={"topico": cls.topico.slug})
+
+        agora = timezone.now()
+        cls.entradas = []
+        for i in range(EntradaList.entradas_por_pagina * 2 + 3):
+            entrada = Entrada.objects.create(
+                topico=cls.topico, usuario=cls.usuario, texto_entrada=f"entrada {i}"
+            )
+            cls.entradas.append(entrada)
+        # datas controladas, com um empate para testar o desempate por id
+        for i, entrada in enumerate(cls.entradas):
+            entrada.data_pub = agora - timedelta(minutes=len(cls.entradas) - i)
+        cls.entradas[1].data_pub = cls.entradas[0].data_pub
+        Entrada.objects.bulk_update(cls.entradas, ["data_pub"])
+        cls.esperado = sorted(cls.entradas, key=lambda e: (e.data_pub, e.pk), reverse=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_ida_e_volta(self):
+        """Testa que um cursor codificado volta para a mesma posição"""
+        entrada = self.entradas[0]
+        cursor = codificar_cursor(entrada.data_pub, entrada.pk)
+        self.assertEqual(decodificar_cursor(cursor), (entrada.data_pub, entrada.pk))
+
+    def test_cursor_invalido(self):
+        """Testa que um cursor inválido resulta em 404"""
+        resposta = self.client.get(self.url, {"antes": "nao-e-um-cursor"})
+        self.assertEqual(resposta.status_code, 404)
+
+    def test_percorrer_todas_as_paginas(self):
+        """Testa ir até a última página e voltar sem perder nem repetir entradas"""
+        vistas = []
+        resposta = self.client.get(self.url)
+        self.assertFalse(resposta.context["pagina"].tem_recentes)
+        while True:
+            pagina = resposta.context["pagina"]
+            vistas.extend(resposta.context["entradas"])
+            if not pagina.tem_anteriores:
+                break
+            resposta = self.client.get(self.url, {"antes": pagina.cursor_anteriores})
+        self.assertEqual(vistas, self.esperado)
+
+        # voltando pelas páginas mais recentes
+        pagina = resposta.context["pagina"]
+        resposta = self.client.get(self.url, {"depois": pagina.cursor_recentes})
+        por_pagina = EntradaList.entradas_por_pagina
+        self.assertEqual(
+            list(resposta.context["entradas"]), self.esperado[por_pagina : por_pagina * 2]
+        )
+
+    def test_links_no_template(self):
+        """Testa que os links de navegação aparecem na página"""
+        resposta = self.client.get(self.url)
+        cursor = resposta.context["pagina"].cursor_anteriores
+        self.assertContains(resposta, f"?antes={cursor}")
+        self.assertNotContains(resposta, "?depois=")
+
+    def test_paginacao_perfil(self):
+        """Testa que o perfil também é paginado por cursor"""
+        url = self.usuario.get_absolute_url()
+        resposta = self.client.get(url)
+        por_pagina = EntradaList.entradas_por_pagina
+        self.assertEqual(list(resposta.context["entradas"]), self.esperado[:por_pagina])
+
+        cursor = resposta.context["pagina"].cursor_anteriores
+        resposta = self.client.get(url, {"antes": cursor})
+        self.assertEqual(
+            list(resposta.context["entradas"]), self.esperado[por_pagina : por_pagina * 2]
+        )
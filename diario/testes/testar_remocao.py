@@ -0,0 +1,118 @@
+"""Testes para a remoção em segundo plano de usuários e tópicos"""
+
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from diario.busca import buscar_entradas
+from diario.models import Entrada, Remocao, Topico, Usuario
+from diario.remocao import marcar_topico, marcar_usuario, purgar
+
+
+class TestRemocao(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username="usuario", email="usuario@teste.com", password="123dasilva4"
+        )
+        cls.outro = Usuario.objects.create(
+            username="outro", email="outro@teste.com", password="123456"
+        )
+        cls.django = Topico.objects.create(topico="Django", slug="django")
+        cls.python = Topico.objects.create(topico="Python", slug="python")
+        for topico in [cls.django, cls.python]:
+            for i in range(3):
+                Entrada.objects.create(
+                    topico=topico, usuario=cls.usuario, texto_entrada=f"palavra {i}"
+                )
+            Entrada.objects.create(
+                topico=topico, usuario=cls.outro, texto_entrada="palavra do outro"
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_apagar_conta_esconde_na_hora(self):
+        """Testa que a conta some das páginas, dos contadores e da busca"""
+        self.client.force_login(self.usuario)
+        self.client.get(self.django.get_absolute_url())
+        self.client.post(reverse("apagar_conta"))
+
+        self.assertEqual(Entrada.objects.count(), 8)
+        self.assertEqual(Topico.objects.get(pk=self.django.pk).num_entradas, 1)
+        self.assertFalse(
+            self.client.get(reverse("index")).context["user"].is_authenticated
+        )
+        self.assertEqual(
+            self.client.get(self.usuario.get_absolute_url()).status_code, 404
+        )
+        resposta = self.client.get(self.django.get_absolute_url())
+        self.assertEqual(
+            [entrada.usuario for entrada in resposta.context["entradas"]], [self.outro]
+        )
+        self.assertEqual(len(buscar_entradas("palavra")), 2)
+        self.assertFalse(self.client.login(username="usuario", password="123dasilva4"))
+
+    def test_purgar_em_lotes(self):
+        """Testa a remoção em lotes, com progresso, e o objeto apagado no fim"""
+        remocao = marcar_usuario(self.usuario)
+        self.assertEqual(remocao.total, 6)
+
+        vistos = []
+        purgar(remocao, lote=4, progresso=lambda r: vistos.append(r.apagadas))
+        self.assertEqual(vistos, [4, 6, 6])
+        self.assertEqual(Remocao.objects.get().apagadas, 6)
+        self.assertIsNotNone(Remocao.objects.get().concluida_em)
+        self.assertFalse(Usuario.objects.filter(pk=self.usuario.pk).exists())
+        # os contadores não são descontados de novo
+        self.assertEqual(
+            dict(Topico.objects.values_list("slug", "num_entradas")),
+            {"django": 1, "python": 1},
+        )
+        call_command("recontar_entradas", "--verificar", stdout=StringIO())
+
+    def test_apagar_topico(self):
+        """Testa que o tópico some na hora e é removido pelo comando"""
+        marcar_topico(self.django)
+        marcar_topico(self.django)  # marcar de novo não agenda outra remoção
+        self.assertEqual(Remocao.objects.count(), 1)
+
+        self.assertEqual(
+            self.client.get(self.django.get_absolute_url()).status_code, 404
+        )
+        resposta = self.client.get(reverse("topicos"))
+        self.assertEqual(list(resposta.context["topicos"]), [self.python])
+        resposta = self.client.get(self.outro.get_absolute_url())
+        self.assertEqual(
+            {entrada.topico for entrada in resposta.context["entradas"]}, {self.python}
+        )
+        dados = self.client.get(
+            reverse("api_usuario", kwargs={"username": "outro"})
+        ).json()
+        self.assertEqual(dados["num_entradas"], 1)
+
+        saida = StringIO()
+        call_command("purgar_removidos", "--pausa", "0", stdout=saida)
+        self.assertIn("1 remoção(ões) concluída(s)", saida.getvalue())
+        self.assertFalse(Topico.objects.filter(pk=self.django.pk).exists())
+        self.assertEqual(Entrada.objects.count(), 4)
+
+    def test_admin_marca_em_vez_de_apagar(self):
+        """Testa que apagar um tópico pelo admin só o marca"""
+        admin = Usuario.objects.create_superuser(
+            username="admin", email="admin@teste.com", password="123456"
+        )
+        self.client.force_login(admin)
+        url = reverse("admin:diario_topico_delete", args=[self.django.pk])
+        # a confirmação não percorre as entradas que seriam apagadas
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {"post": "yes"})
+
+        self.assertIsNotNone(Topico.objects.get(pk=self.django.pk).apagado_em)
+        self.assertEqual(Entrada.objects.count(), 8)
+        self.assertTrue(site.is_registered(Remocao))
@@ -0,0 +1,168 @@
+"""Testes para o roteamento das leituras para as réplicas"""
+
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from diario.models import Entrada, Topico, Usuario
+from diario.replicas import COOKIE_PRIMARIO, RoteadorReplicas, ler_de_replica
+
+
+@override_settings(DIARIO_REPLICAS=["replica1"])
+class TestRoteadorReplicas(SimpleTestCase):
+    def setUp(self):
+        self.roteador = RoteadorReplicas()
+
+    def test_leitura_fora_do_contexto_vai_ao_principal(self):
+        """Testa que só as views de leitura usam a réplica"""
+        self.assertEqual(self.roteador.db_for_read(Entrada), DEFAULT_DB_ALIAS)
+
+    def test_leitura_no_contexto_vai_a_replica(self):
+        """Testa a leitura dos modelos do diário dentro de `ler_de_replica()`"""
+        with ler_de_replica():
+            self.assertEqual(self.roteador.db_for_read(Entrada), "replica1")
+            self.assertEqual(self.roteador.db_for_read(Session), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.roteador.db_for_write(Entrada), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.roteador.db_for_read(Entrada), DEFAULT_DB_ALIAS)
+
+    def test_migracoes_so_no_principal(self):
+        """Testa que as réplicas não recebem migrações"""
+        self.assertFalse(self.roteador.allow_migrate("replica1", "diario"))
+        self.assertIsNone(self.roteador.allow_migrate(DEFAULT_DB_ALIAS, "diario"))
+
+    @override_settings(DIARIO_REPLICAS=[])
+    def test_sem_replicas(self):
+        """Testa que sem réplicas o roteador não interfere"""
+        with ler_de_replica():
+            self.assertIsNone(self.roteador.db_for_read(Entrada))
+
+
+class TestJanelaPrimario(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DIARIO_REPLICAS=["replica1"])
+    def test_escrita_fixa_no_principal(self):
+        """Testa que quem escreve lê a própria entrada do principal em seguida"""
+        self.client.force_login(self.usuario)
+        url = self.topico.get_absolute_url()
+        resposta = self.client.post(url + "/criar", {"texto_entrada": "nova"})
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(
+            resposta.cookies[COOKIE_PRIMARIO]["max-age"],
+            settings.DIARIO_JANELA_PRIMARIO,
+        )
+
+        # sem o cookie a página iria para a réplica "replica1", que não existe
+        resposta = self.client.get(url)
+        self.assertContains(resposta, "nova")
+
+    @override_settings(DIARIO_REPLICAS=[])
+    def test_sem_replicas_nao_cria_cookie(self):
+        """Testa que o cookie só é usado quando há réplicas configuradas"""
+        self.client.force_login(self.usuario)
+        url = self.topico.get_absolute_url() + "/criar"
+        resposta = self.client.post(url, {"texto_entrada": "nova"})
+        self.assertNotIn(COOKIE_PRIMARIO, resposta.cookies)
+
+
+class TestLeituraEmReplica(TestCase):
+    """Usa um segundo arquivo SQLite como réplica, com dados diferentes"""
+
+    # "__all__" é avaliado só no `setUpClass()`, depois de a réplica existir
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pasta = tempfile.TemporaryDirectory()
+        principal = connections[DEFAULT_DB_ALIAS]
+        connections.settings["replica_teste"] = {
+            **principal.settings_dict,
+            "NAME": os.path.join(cls.pasta.name, "replica.sqlite3"),
+        }
+        # a réplica começa com o esquema do banco de testes
+        principal.ensure_connection()
+        with sqlite3.connect(connections.settings["replica_teste"]["NAME"]) as copia:
+            principal.connection.backup(copia)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica_teste"].close()
+        del connections["replica_teste"]
+        del connections.settings["replica_teste"]
+        cls.pasta.cleanup()
+
+    @classmethod
+    def setUpTestData(cls):
+        for banco in (DEFAULT_DB_ALIAS, "replica_teste"):
+            usuario = Usuario(username="usuario", email="usuario@teste.com")
+            usuario.save(using=banco)
+            topico = Topico(topico="Django", slug="django")
+            topico.save(using=banco)
+            Entrada(
+                topico=topico, usuario=usuario, texto_entrada=f"lida de {banco}"
+            ).save(using=banco)
+        cls.usuario = usuario
+        cls.url = topico.get_absolute_url()
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(DIARIO_REPLICAS=["replica_teste"])
+    def test_paginas_de_leitura_usam_a_replica(self):
+        """Testa que a lista é lida da réplica, sem consultar o principal"""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as principal:
+            resposta = self.client.get(self.url)
+        self.assertContains(resposta, "lida de replica_teste")
+        self.assertEqual(len(principal), 0)
+
+    @override_settings(DIARIO_REPLICAS=["replica_teste"])
+    def test_usuario_logado_vem_do_principal(self):
+        """Testa que só o usuário da sessão é lido do principal"""
+        self.client.force_login(self.usuario)
+        with (
+            CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as principal,
+            CaptureQueriesContext(connections["replica_teste"]) as replica,
+        ):
+            resposta = self.client.get(self.url)
+        self.assertContains(resposta, "lida de replica_teste")
+        # a busca do usuário pela sessão (a lista também junta os autores)
+        sessao = 'FROM "diario_usuario" WHERE'
+        self.assertTrue(any(sessao in q["sql"] for q in principal))
+        self.assertFalse(any(sessao in q["sql"] for q in replica))
+
+    @override_settings(
+        DIARIO_REPLICAS=["replica_teste"], ROOT_URLCONF="diario.testes.testar_async"
+    )
+    async def test_views_async_usam_a_replica(self):
+        """Testa que o contexto da réplica vale para o ORM assíncrono"""
+        resposta = await self.async_client.get(self.url)
+        self.assertContains(resposta, "lida de replica_teste")
+
+    @override_settings(DIARIO_REPLICAS=["replica_teste"])
+    def test_cookie_fixa_no_principal(self):
+        """Testa que, logo após escrever, a leitura vem do principal"""
+        self.client.cookies[COOKIE_PRIMARIO] = "1"
+        resposta = self.client.get(self.url)
+        self.assertContains(resposta, "lida de default")
+
+    def test_sem_replicas(self):
+        """Testa que sem réplicas configuradas tudo é lido do principal"""
+        resposta = self.client.get(self.url)
+        self.assertContains(resposta, "lida de default")
@@ -0,0 +1,164 @@
+"""Testes para os resumos diários e as estatísticas do perfil"""
+
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from diario.models import Entrada, ResumoDiario, Topico, Usuario
+from diario.paginacao import codificar_cursor
+from diario.remocao import marcar_topico
+from diario.resumos import calcular_estatisticas, consultas_do_perfil, somar
+
+
+class TestResumos(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username="usuario", email="usuario@teste.com", password="123456"
+        )
+        cls.django = Topico.objects.create(topico="Django", slug="django")
+        cls.python = Topico.objects.create(topico="Python", slug="python")
+
+    def setUp(self):
+        cache.clear()
+
+    def resumos(self):
+        return dict(
+            ResumoDiario.objects.filter(entradas__gt=0).values_list(
+                "topico__slug", "entradas"
+            )
+        )
+
+    def criar(self, topico, quantidade=1):
+        return [
+            Entrada.objects.create(
+                topico=topico, usuario=self.usuario, texto_entrada=f"entrada {i}"
+            )
+            for i in range(quantidade)
+        ]
+
+    def test_manter_ao_criar_mover_e_apagar(self):
+        """Testa que os sinais mantêm os resumos a cada mudança"""
+        entrada, *_ = self.criar(self.django, 3)
+        self.criar(self.python)
+        self.assertEqual(self.resumos(), {"django": 3, "python": 1})
+        self.assertEqual(
+            ResumoDiario.objects.get(topico=self.django).dia, timezone.localdate()
+        )
+
+        entrada.topico = self.python
+        entrada.save()
+        self.assertEqual(self.resumos(), {"django": 2, "python": 2})
+
+        entrada.delete()
+        self.assertEqual(self.resumos(), {"django": 2, "python": 1})
+        self.assertEqual(ResumoDiario.objects.count(), 2)
+
+    def test_recalcular(self):
+        """Testa que o comando encontra e corrige resumos errados ou faltando"""
+        antigas = self.criar(self.django, 2)
+        ontem = timezone.now() - timedelta(days=1)
+        Entrada.objects.filter(pk__in=[e.pk for e in antigas]).update(data_pub=ontem)
+        ResumoDiario.objects.filter(topico=self.python).delete()
+        self.criar(self.python)
+        ResumoDiario.objects.filter(topico=self.python).update(entradas=5)
+
+        saida = StringIO()
+        call_command("recalcular_resumos", "--verificar", stdout=saida)
+        self.assertIn("3 resumo(s) errado(s)", saida.getvalue())
+        self.assertEqual(ResumoDiario.objects.get(topico=self.python).entradas, 5)
+
+        call_command("recalcular_resumos", stdout=StringIO())
+        dias = dict(
+            ResumoDiario.objects.filter(topico=self.django).values_list(
+                "dia", "entradas"
+            )
+        )
+        self.assertEqual(dias, {timezone.localdate(ontem): 2})
+        self.assertEqual(ResumoDiario.objects.get(topico=self.python).entradas, 1)
+
+        saida = StringIO()
+        call_command("recalcular_resumos", "--verificar", stdout=saida)
+        self.assertIn("0 resumo(s) errado(s)", saida.getvalue())
+
+    def test_consultas_do_perfil(self):
+        """Testa que as somas por dia e por tópico saem prontas do banco"""
+        self.criar(self.django, 3)
+        self.criar(self.python)
+        ontem = timezone.localdate() - timedelta(days=1)
+        ResumoDiario.objects.create(
+            usuario=self.usuario, topico=self.python, dia=ontem, entradas=5
+        )
+        por_dia, topicos = consultas_do_perfil(self.usuario)
+        self.assertEqual(list(por_dia), [(ontem, 5), (timezone.localdate(), 4)])
+        self.assertEqual(
+            list(topicos), [("Python", "python", 6), ("Django", "django", 3)]
+        )
+
+    def test_somar_sem_resumo(self):
+        """Testa que `somar()` cria o resumo que falta e soma no existente"""
+        dia = timezone.localdate()
+        somar(self.usuario.pk, self.django.pk, dia, 2)
+        with self.assertNumQueries(1):
+            somar(self.usuario.pk, self.django.pk, dia, 3)
+        self.assertEqual(ResumoDiario.objects.get(topico=self.django).entradas, 5)
+        # nunca fica negativo
+        somar(self.usuario.pk, self.django.pk, dia, -6)
+        self.assertEqual(ResumoDiario.objects.get(topico=self.django).entradas, 5)
+
+    def test_estatisticas(self):
+        """Testa total, sequências, tópicos e os últimos dias"""
+        hoje = date(2024, 5, 10)
+        por_dia = [
+            (date(2024, 5, 1), 2),
+            (date(2024, 5, 2), 1),
+            (date(2024, 5, 3), 1),
+            (date(2024, 5, 8), 1),
+            (date(2024, 5, 9), 4),
+        ]
+        topicos = [("Django", "django", 6), ("Python", "python", 3)]
+        estatisticas = calcular_estatisticas(por_dia, topicos, hoje=hoje)
+        self.assertEqual(estatisticas.total, 9)
+        self.assertEqual(estatisticas.dias_ativos, 5)
+        self.assertEqual(estatisticas.maior_sequencia, 3)
+        # ontem conta: a sequência só acaba se hoje passar sem entradas
+        self.assertEqual(estatisticas.sequencia_atual, 2)
+        self.assertEqual(
+            estatisticas.topicos, [("Django", "django", 6), ("Python", "python", 3)]
+        )
+        self.assertEqual(len(estatisticas.recentes), 30)
+        self.assertEqual(estatisticas.recentes[-1], (hoje, 0))
+        self.assertEqual(estatisticas.recentes[-2], (date(2024, 5, 9), 4))
+        self.assertEqual(estatisticas.maximo_recente, 4)
+
+        estatisticas = calcular_estatisticas(
+            por_dia, topicos, hoje=hoje + timedelta(days=2)
+        )
+        self.assertEqual(estatisticas.sequencia_atual, 0)
+
+    def test_perfil(self):
+        """Testa que o perfil mostra as estatísticas e ignora tópicos apagados"""
+        self.criar(self.django, 2)
+        self.criar(self.python)
+        resposta = self.client.get(self.usuario.get_absolute_url())
+        self.assertEqual(resposta.context["estatisticas"].total, 3)
+        self.assertContains(resposta, 'aria-label="Estatísticas"')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            marcar_topico(self.python)
+        _, topicos = consultas_do_perfil(self.usuario)
+        self.assertEqual(list(topicos), [("Django", "django", 2)])
+        resposta = self.client.get(self.usuario.get_absolute_url())
+        self.assertEqual(resposta.context["estatisticas"].total, 2)
+
+        # as páginas seguintes só trazem as entradas
+        entrada = Entrada.objects.earliest("pk")
+        resposta = self.client.get(
+            self.usuario.get_absolute_url(),
+            {"antes": codificar_cursor(entrada.data_pub, entrada.pk)},
+        )
+        self.assertNotIn("estatisticas", resposta.context)
@@ -0,0 +1,189 @@
+"""Testes para a fila de tarefas em segundo plano"""
+
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from diario.models import Entrada, Tarefa, Topico, Usuario
+from diario.tarefas import (
+    ESPERA_INICIAL,
+    agendar,
+    estatisticas_tarefas,
+    PRAZO_RESERVA,
+    executar,
+    processar,
+    prorrogar_reserva,
+    reservar,
+    tarefa,
+)
+
+executadas = []
+
+
+@tarefa
+def anotar(valor):
+    executadas.append(valor)
+
+
+@tarefa
+def falhar():
+    raise ValueError("sempre falha")
+
+
+@tarefa
+def contar_em_execucao():
+    executadas.append(Tarefa.objects.filter(estado=Tarefa.EXECUTANDO).count())
+
+
+@tarefa
+def demorar():
+    # como uma etapa longa, que deixou a reserva quase vencida
+    Tarefa.objects.update(reservada_ate=timezone.now())
+    executadas.append(prorrogar_reserva())
+    executadas.append(Tarefa.objects.get().reservada_ate - timezone.now())
+
+
+def nao_registrada():
+    pass
+
+
+class TestTarefas(TestCase):
+    def setUp(self):
+        cache.clear()
+        executadas.clear()
+
+    def test_agendar_e_processar(self):
+        """Testa que as tarefas rodam em ordem e saem da fila"""
+        agendar(anotar, valor=1)
+        agendar(anotar, valor=2)
+        agendar(anotar, valor=3, atraso=timedelta(minutes=1))
+
+        self.assertEqual(processar(lote=10), 2)
+        self.assertEqual(executadas, [1, 2])
+        self.assertEqual(Tarefa.objects.count(), 1)
+        self.assertEqual(processar(), 0)
+
+        # as métricas ficam no banco: o site, em outro processo e com outro
+        # cache, vê o que os processos de `processar_tarefas` executaram
+        cache.clear()
+        estatisticas = estatisticas_tarefas()
+        self.assertEqual(estatisticas["prontas"], 0)
+        dados = estatisticas["tarefas"]["diario.testes.testar_tarefas.anotar"]
+        self.assertEqual(dados["concluidas"], 2)
+        self.assertEqual(dados["falhas"], 0)
+        self.assertIsNotNone(dados["media_duracao_ms"])
+        self.assertEqual(dados["fila"], {"pendente": 1})
+
+    def test_chave_agenda_uma_vez(self):
+        """Testa que tarefas pendentes com a mesma chave viram uma só"""
+        primeira = agendar(anotar, chave="anotar", valor=1)
+        self.assertEqual(agendar(anotar, chave="anotar", valor=2), primeira)
+        processar()
+        agendar(anotar, chave="anotar", valor=3)
+        processar()
+        self.assertEqual(executadas, [1, 3])
+
+    def test_so_funcoes_registradas(self):
+        with self.assertRaises(LookupError):
+            agendar(nao_registrada)
+        with self.assertRaises(LookupError):
+            agendar("os.system", command="true")
+
+    def test_novas_tentativas_com_espera(self):
+        """Testa a espera crescente entre as tentativas e a falha definitiva"""
+        agendar(falhar, max_tentativas=3)
+        esperas = []
+        for _ in range(3):
+            with self.assertLogs("diario.tarefas"):
+                self.assertEqual(processar(), 1)
+            falha = Tarefa.objects.get()
+            esperas.append(falha.executar_em - timezone.now())
+            self.assertEqual(processar(), 0)
+            Tarefa.objects.update(executar_em=timezone.now())
+
+        self.assertAlmostEqual(esperas[0], ESPERA_INICIAL, delta=timedelta(seconds=1))
+        self.assertAlmostEqual(
+            esperas[1], ESPERA_INICIAL * 2, delta=timedelta(seconds=1)
+        )
+        self.assertEqual(falha.estado, Tarefa.FALHOU)
+        self.assertEqual(falha.tentativas, 3)
+        self.assertIn("sempre falha", falha.erro)
+        dados = estatisticas_tarefas()["tarefas"]["diario.testes.testar_tarefas.falhar"]
+        self.assertEqual((dados["concluidas"], dados["falhas"]), (0, 3))
+        self.assertEqual(processar(), 0)
+
+    def test_falha_com_copia_pendente(self):
+        """Testa que a nova tentativa dá lugar à cópia agendada durante a execução"""
+        agendar(falhar, chave="falhar")
+        (reservada,) = reservar()
+        copia = agendar(falhar, chave="falhar")
+        with self.assertLogs("diario.tarefas"):
+            self.assertFalse(executar(reservada))
+        self.assertEqual(list(Tarefa.objects.all()), [copia])
+
+    def test_reserva_por_processo(self):
+        """Testa que processos diferentes não pegam a mesma tarefa"""
+        for valor in range(3):
+            agendar(anotar, valor=valor)
+        primeiro = reservar(lote=2, trabalhador="a")
+        segundo = reservar(lote=2, trabalhador="b")
+        self.assertEqual(len(primeiro), 2)
+        self.assertEqual(len(segundo), 1)
+        self.assertEqual(reservar(trabalhador="c"), [])
+
+        # o processo "a" morreu: a reserva vence e outro processo pega
+        Tarefa.objects.filter(trabalhador="a").update(
+            reservada_ate=timezone.now() - timedelta(seconds=1)
+        )
+        terceiro = reservar(trabalhador="c")
+        self.assertEqual({t.pk for t in terceiro}, {t.pk for t in primeiro})
+        self.assertEqual({t.tentativas for t in terceiro}, {2})
+
+    def test_reserva_uma_de_cada_vez(self):
+        """Testa que as tarefas de um lote só são reservadas na sua vez"""
+        for _ in range(3):
+            agendar(contar_em_execucao)
+        self.assertEqual(processar(lote=10), 3)
+        self.assertEqual(executadas, [1, 1, 1])
+
+    def test_prorrogar_reserva(self):
+        """Testa que uma tarefa longa renova o prazo da própria reserva"""
+        agendar(demorar)
+        processar()
+        renovada, restante = executadas
+        self.assertTrue(renovada)
+        self.assertAlmostEqual(restante, PRAZO_RESERVA, delta=timedelta(seconds=5))
+        # fora de uma tarefa, não há o que renovar
+        self.assertTrue(prorrogar_reserva())
+
+    def test_remocao_agendada(self):
+        """Testa que apagar a conta agenda a remoção das entradas"""
+        usuario = Usuario.objects.create_user(username="usuario", password="123456")
+        topico = Topico.objects.create(topico="Django", slug="django")
+        Entrada.objects.create(topico=topico, usuario=usuario, texto_entrada="oi")
+        self.client.force_login(usuario)
+        self.client.post(reverse("apagar_conta"))
+        self.assertEqual(Tarefa.objects.count(), 1)
+
+        saida = StringIO()
+        call_command("processar_tarefas", stdout=saida)
+        self.assertIn("1 tarefa(s) executada(s)", saida.getvalue())
+        self.assertFalse(Usuario.objects.filter(pk=usuario.pk).exists())
+        self.assertFalse(Entrada.objects.exists())
+        self.assertFalse(Tarefa.objects.exists())
+
+    def test_estatisticas_so_para_staff(self):
+        url = reverse("estatisticas_tarefas")
+        staff = Usuario.objects.create(username="staff", is_staff=True)
+        comum = Usuario.objects.create(username="comum")
+        self.client.force_login(comum)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(staff)
+        agendar(anotar, valor=1)
+        dados = self.client.get(url).json()
+        self.assertEqual(dados["prontas"], 1)
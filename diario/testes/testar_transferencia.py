@@ -0,0 +1,232 @@
+"""Testes para os comandos `exportar_diario` e `importar_diario`"""
+
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from diario.busca import buscar_entradas
+from diario.models import (
+    Atividade,
+    Entrada,
+    ResumoDiario,
+    Topico,
+    Usuario,
+    preservando_datas,
+)
+from diario.remocao import marcar_topico, marcar_usuario
+
+
+class TestTransferencia(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username="usuario", email="usuario@teste.com", password="123dasilva4"
+        )
+        cls.topico = Topico.objects.create(topico="Django", slug="django")
+        Entrada.objects.create(
+            topico=cls.topico, usuario=cls.usuario, texto_entrada="migrações"
+        )
+        Entrada.objects.create(
+            topico=cls.topico,
+            usuario=cls.usuario,
+            texto_entrada='texto com "aspas", vírgula\ne linha',
+        )
+        cls.data_antiga = timezone.now() - timedelta(days=300)
+        Entrada.objects.update(data_pub=cls.data_antiga, data_edicao=cls.data_antiga)
+
+    def setUp(self):
+        self.pasta = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        for arquivo in self.pasta.iterdir():
+            arquivo.unlink()
+        self.pasta.rmdir()
+
+    def apagar_tudo(self):
+        Entrada.objects.all().delete()
+        Topico.objects.all().delete()
+        Usuario.objects.all().delete()
+
+    def conferir_importacao(self):
+        usuario = Usuario.objects.get(username="usuario")
+        self.assertTrue(usuario.check_password("123dasilva4"))
+        topico = Topico.objects.get(slug="django")
+        self.assertEqual(topico.num_entradas, 2)
+        self.assertEqual(
+            sorted(Entrada.objects.values_list("texto_entrada", flat=True)),
+            ["migrações", 'texto com "aspas", vírgula\ne linha'],
+        )
+        self.assertEqual(
+            set(Entrada.objects.values_list("data_pub", flat=True)), {self.data_antiga}
+        )
+        self.assertEqual(len(buscar_entradas("migracoes")), 1)
+        self.assertEqual(
+            sorted(Atividade.objects.values_list("entrada_id", flat=True)),
+            sorted(Entrada.objects.values_list("pk", flat=True)),
+        )
+        self.assertEqual(
+            list(ResumoDiario.objects.values_list("topico", "dia", "entradas")),
+            [(topico.pk, timezone.localdate(self.data_antiga), 2)],
+        )
+
+    def test_jsonl_ida_e_volta(self):
+        """Testa exportar e importar de volta em JSONL"""
+        arquivo = self.pasta / "diario.jsonl"
+        call_command("exportar_diario", str(arquivo), stderr=StringIO())
+
+        linhas = [json.loads(linha) for linha in arquivo.read_text().splitlines()]
+        self.assertEqual(
+            [linha["modelo"] for linha in linhas],
+            ["usuario", "topico", "entrada", "entrada"],
+        )
+
+        self.apagar_tudo()
+        saida = StringIO()
+        call_command("importar_diario", str(arquivo), "--lote", "1", stdout=saida)
+        self.assertIn("4 linhas lidas", saida.getvalue())
+        self.conferir_importacao()
+
+    def test_csv_ida_e_volta(self):
+        """Testa exportar e importar de volta em CSV, um arquivo por modelo"""
+        call_command(
+            "exportar_diario", str(self.pasta), "--formato", "csv", stderr=StringIO()
+        )
+        self.apagar_tudo()
+        arquivos = [
+            str(self.pasta / f"{m}.csv") for m in ("usuario", "topico", "entrada")
+        ]
+        call_command("importar_diario", *arquivos, stdout=StringIO())
+        self.conferir_importacao()
+
+    def test_sem_senhas(self):
+        """Testa que `--sem-senhas` não exporta os hashes"""
+        arquivo = self.pasta / "diario.jsonl"
+        call_command(
+            "exportar_diario",
+            str(arquivo),
+            "--sem-senhas",
+            "--modelos",
+            "usuario",
+            stderr=StringIO(),
+        )
+        (linha,) = [json.loads(texto) for texto in arquivo.read_text().splitlines()]
+        self.assertEqual(linha["password"], "!")
+
+    def test_reimportar_nao_duplica_usuarios_e_topicos(self):
+        """Testa que usuários e tópicos existentes são mantidos"""
+        arquivo = self.pasta / "diario.jsonl"
+        call_command(
+            "exportar_diario",
+            str(arquivo),
+            "--modelos",
+            "usuario,topico",
+            stderr=StringIO(),
+        )
+        saida = StringIO()
+        call_command("importar_diario", str(arquivo), stdout=saida)
+        self.assertEqual(Usuario.objects.count(), 1)
+        self.assertEqual(Topico.objects.count(), 1)
+        # o relatório conta só o que foi de fato inserido
+        self.assertIn("0 usuario(s), 0 topico(s)", saida.getvalue())
+
+    def test_reimportar_nao_duplica_entradas(self):
+        """Testa que entradas com o mesmo usuário, tópico e data não são repetidas"""
+        arquivo = self.pasta / "diario.jsonl"
+        call_command("exportar_diario", str(arquivo), stderr=StringIO())
+        # a mesma entrada duas vezes no arquivo, no mesmo lote
+        linhas = arquivo.read_text().splitlines()
+        arquivo.write_text("\n".join([*linhas, linhas[-1]]) + "\n")
+
+        saida = StringIO()
+        call_command("importar_diario", str(arquivo), stdout=saida)
+        self.assertIn("0 entrada(s)", saida.getvalue())
+        self.assertEqual(Entrada.objects.count(), 2)
+        self.assertEqual(Topico.objects.get().num_entradas, 2)
+
+        self.apagar_tudo()
+        call_command("importar_diario", str(arquivo), stdout=StringIO())
+        self.conferir_importacao()
+
+    def test_apagados_nao_sao_exportados(self):
+        """Testa que usuários e tópicos esperando remoção ficam de fora"""
+        outro = Usuario.objects.create_user(username="outro", email="o@teste.com")
+        topico = Topico.objects.create(topico="Apagado", slug="apagado")
+        Entrada.objects.create(topico=self.topico, usuario=outro, texto_entrada="a")
+        Entrada.objects.create(topico=topico, usuario=self.usuario, texto_entrada="b")
+        marcar_usuario(outro)
+        marcar_topico(topico)
+
+        arquivo = self.pasta / "diario.jsonl"
+        call_command("exportar_diario", str(arquivo), stderr=StringIO())
+        linhas = [json.loads(linha) for linha in arquivo.read_text().splitlines()]
+        self.assertEqual(
+            [linha.get("username") for linha in linhas if linha["modelo"] == "usuario"],
+            ["usuario"],
+        )
+        self.assertEqual(
+            [linha["slug"] for linha in linhas if linha["modelo"] == "topico"],
+            ["django"],
+        )
+        self.assertEqual(
+            sorted(
+                linha["texto_entrada"]
+                for linha in linhas
+                if linha["modelo"] == "entrada"
+            ),
+            ["migrações", 'texto com "aspas", vírgula\ne linha'],
+        )
+
+    def test_topicos_sem_slug_no_mesmo_lote(self):
+        """Testa que tópicos sem slug com o mesmo nome ganham slugs diferentes"""
+        arquivo = self.pasta / "topicos.jsonl"
+        arquivo.write_text(
+            "".join(
+                json.dumps({"modelo": "topico", "topico": "Django"}) + "\n"
+                for _ in range(2)
+            )
+        )
+        saida = StringIO()
+        call_command("importar_diario", str(arquivo), stdout=saida)
+        self.assertIn("2 topico(s)", saida.getvalue())
+        self.assertEqual(
+            sorted(Topico.objects.values_list("slug", flat=True)),
+            ["django", "django-2", "django-3"],
+        )
+
+    def test_entrada_sem_topico(self):
+        """Testa que entradas de tópicos inexistentes são ignoradas"""
+        arquivo = self.pasta / "entradas.jsonl"
+        arquivo.write_text(
+            json.dumps(
+                {
+                    "modelo": "entrada",
+                    "topico": "nao-existe",
+                    "usuario": "usuario",
+                    "texto_entrada": "oi",
+                }
+            )
+        )
+        saida = StringIO()
+        call_command("importar_diario", str(arquivo), stdout=saida)
+        self.assertIn("1 linha(s) ignorada(s)", saida.getvalue())
+        self.assertEqual(Entrada.objects.count(), 2)
+
+    def test_datas_preservadas_so_na_propria_thread(self):
+        """Testa que preservar as datas importadas não vale para outras threads"""
+        antigo = Topico(topico="Antigo", slug="antigo", data_pub=self.data_antiga)
+        outro = Topico(topico="Outro", slug="outro", data_pub=self.data_antiga)
+        with preservando_datas():
+            antigo.save()
+            # como uma requisição atendida enquanto a importação roda
+            campo = Topico._meta.get_field("data_pub")
+            with ThreadPoolExecutor(1) as executor:
+                executor.submit(campo.pre_save, outro, True).result()
+        self.assertEqual(antigo.data_pub, self.data_antiga)
+        self.assertGreater(outro.data_pub, self.data_antiga)
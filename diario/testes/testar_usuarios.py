@@ -1,9 +1,12 @@
 """Testes para as views de CRUD do modelo `Usuario`"""
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from diario.checks import verificar_cache_usuario
 from diario.models import Usuario, Topico, Entrada
+from diario.remocao import purgar_pendentes
 
 
 class TestUsuarioCreate(TestCase):
@@ -95,6 +98,9 @@ class TestUsuarioDelete(TestCase):
         self.assertEqual(resposta.status_code, 200)
 
         resposta = self.client.post(self.url)
+        # a conta some na hora e é removida de vez por `purgar_removidos`
+        self.assertFalse(Usuario.objects.visiveis().filter(username="usuario"))
+        purgar_pendentes()
         with self.assertRaises(Usuario.DoesNotExist):
             Usuario.objects.get(username="usuario")
 
@@ -141,3 +147,57 @@ class TestPerfil(TestCase):
         self.assertEqual(resposta.status_code, 200)
         self.assertIn("usuario", resposta.context)
         self.assertEqual(resposta.context["usuario"], self.outro_usuario)
+
+
+# os testes rodam com o LocMem, em que o cache do usuário fica desligado por padrão
+@override_settings(DIARIO_CACHE_USUARIO_TIMEOUT=60)
+class TestUsuarioEmCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(
+            username="usuario", email="email@teste.com", password="123dasilva4"
+        )
+        self.client.force_login(self.usuario)
+        # outra sessão do mesmo usuário, ex.: em outro navegador
+        self.outro_navegador = Client()
+        self.outro_navegador.force_login(self.usuario)
+
+    def test_sem_consultas_com_cache(self):
+        """Testa que sessão e usuário não consultam o banco depois da primeira vez"""
+        self.client.get(reverse("index"))
+        with self.assertNumQueries(0):
+            resposta = self.client.get(reverse("index"))
+        self.assertEqual(resposta.context["user"], self.usuario)
+
+    def test_trocar_senha_encerra_outras_sessoes(self):
+        """Testa que a cópia em cache não mantém as sessões antigas válidas"""
+        self.outro_navegador.get(reverse("index"))
+        resposta = self.client.post(
+            reverse("alterar_senha"),
+            {
+                "old_password": "123dasilva4",
+                "new_password1": "outrasenha567",
+                "new_password2": "outrasenha567",
+            },
+        )
+        self.assertEqual(resposta.status_code, 302)
+
+        resposta = self.outro_navegador.get(reverse("index"))
+        self.assertFalse(resposta.context["user"].is_authenticated)
+        resposta = self.client.get(reverse("index"))
+        self.assertTrue(resposta.context["user"].is_authenticated)
+
+    def test_apagar_conta_encerra_outras_sessoes(self):
+        """Testa que o usuário apagado sai do cache"""
+        self.outro_navegador.get(reverse("index"))
+        self.client.post(reverse("apagar_conta"))
+
+        resposta = self.outro_navegador.get(reverse("index"))
+        self.assertFalse(resposta.context["user"].is_authenticated)
+
+    def test_verificacao_cache_local(self):
+        """Testa o aviso do `check` para o cache do usuário em um cache local"""
+        (aviso,) = verificar_cache_usuario(None)
+        self.assertEqual(aviso.id, "diario.W002")
+        with self.settings(DIARIO_CACHE_USUARIO_TIMEOUT=0):
+            self.assertEqual(verificar_cache_usuario(None), [])
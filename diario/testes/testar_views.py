@@ -1,5 +1,6 @@
 """Testes para as views de CRUD do modelo `Entrada`"""
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
@@ -19,6 +20,10 @@ class TestEntradaList(TestCase):
         cls.topico = Topico.objects.create(topico="Django", slug="django")
         cls.url = reverse("entradas", kwargs={"topico": cls.topico.slug})
 
+    def setUp(self):
+        # o cache não é desfeito junto com a transação de cada teste
+        cache.clear()
+
     def test_sem_entradas(self):
         """Testa as respostas da página quando não há entradas"""
         resposta = self.client.get(self.url)
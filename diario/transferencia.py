@@ -0,0 +1,308 @@
+"""Leitura e escrita em fluxo dos dados do diário, em JSONL ou CSV.
+
+Usado pelos comandos `exportar_diario` e `importar_diario`. Nada aqui carrega
+uma tabela inteira na memória: a exportação lê o banco em blocos com
+`iterator()` e a importação acumula no máximo um lote de linhas por vez.
+"""
+
+import csv
+import json
+from collections import Counter
+from datetime import datetime
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .atividades import registrar_criadas
+from .cache import invalidar
+from .models import (
+    Entrada,
+    Topico,
+    Usuario,
+    gerar_previa,
+    gerar_slug_unico,
+    preservando_datas,
+)
+from .resumos import somar_entradas
+
+# na ordem em que precisam ser importados, por causa das chaves estrangeiras
+MODELOS = ("usuario", "topico", "entrada")
+
+CAMPOS = {
+    "usuario": [
+        "username",
+        "email",
+        "password",
+        "first_name",
+        "last_name",
+        "is_active",
+        "is_staff",
+        "is_superuser",
+        "date_joined",
+        "last_login",
+    ],
+    "topico": ["slug", "topico", "data_pub"],
+    "entrada": ["topico", "usuario", "texto_entrada", "data_pub", "data_edicao"],
+}
+
+_DATAS = {"date_joined", "last_login", "data_pub", "data_edicao"}
+_BOOLEANOS = {"is_active", "is_staff", "is_superuser"}
+
+# limite de chaves estrangeiras lembradas entre lotes, para a memória não
+# crescer com o arquivo
+_LIMITE_CACHE_CHAVES = 100_000
+
+
+def linhas_exportadas(
+    modelo, chunk_size=2000, using=DEFAULT_DB_ALIAS, sem_senhas=False
+):
+    """Gera um dicionário por linha do modelo, sem instanciar os modelos.
+
+    Usuários e tópicos apagados, esperando para ser removidos (veja
+    `diario.remocao`), ficam de fora junto com as suas entradas; senão
+    voltariam como dados normais ao serem importados.
+    """
+    campos = CAMPOS[modelo]
+    if modelo == "usuario":
+        consulta = Usuario.objects.db_manager(using).visiveis().values_list(*campos)
+    elif modelo == "topico":
+        consulta = Topico.objects.using(using).visiveis().values_list(*campos)
+    else:
+        consulta = (
+            Entrada.objects.using(using)
+            .visiveis()
+            .values_list("topico__slug", "usuario__username", *campos[2:])
+        )
+
+    for valores in consulta.order_by("pk").iterator(chunk_size=chunk_size):
+        linha = dict(zip(campos, valores))
+        if sem_senhas and modelo == "usuario":
+            linha["password"] = "!"
+        yield linha
+
+
+def _para_texto(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+class EscritorJSONL:
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+
+    def escrever(self, modelo, linha):
+        linha = {"modelo": modelo, **{k: _para_texto(v) for k, v in linha.items()}}
+        self.arquivo.write(json.dumps(linha, ensure_ascii=False) + "\n")
+
+
+class EscritorCSV:
+    """Escreve um único modelo por arquivo, com cabeçalho"""
+
+    def __init__(self, arquivo, modelo):
+        self.escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS[modelo])
+        self.escritor.writeheader()
+
+    def escrever(self, modelo, linha):
+        convertida = {}
+        for campo, valor in linha.items():
+            if valor is None:
+                valor = ""
+            elif isinstance(valor, bool):
+                valor = int(valor)
+            convertida[campo] = _para_texto(valor)
+        self.escritor.writerow(convertida)
+
+
+def ler_jsonl(arquivo):
+    """Gera pares `(modelo, linha)` de um arquivo JSONL"""
+    for numero, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            linha = json.loads(texto)
+        except json.JSONDecodeError as erro:
+            raise ValueError(f"linha {numero}: JSON inválido ({erro})")
+        modelo = linha.pop("modelo", None)
+        if modelo not in MODELOS:
+            raise ValueError(f"linha {numero}: modelo desconhecido {modelo!r}")
+        yield modelo, linha
+
+
+def ler_csv(arquivo, modelo):
+    """Gera pares `(modelo, linha)` de um arquivo CSV de um único modelo"""
+    for linha in csv.DictReader(arquivo):
+        yield modelo, {campo: (valor or None) for campo, valor in linha.items()}
+
+
+def _converter(campo, valor):
+    if valor is None:
+        return None
+    if campo in _DATAS and isinstance(valor, str):
+        return parse_datetime(valor)
+    if campo in _BOOLEANOS and isinstance(valor, str):
+        return valor.strip().lower() in ("1", "true", "t", "sim")
+    return valor
+
+
+class Importador:
+    """Importa linhas em lotes, cada lote em sua própria transação.
+
+    Usuários e tópicos que já existem (mesmo `username`/`slug`) são mantidos,
+    assim como entradas iguais a uma que já existe (mesmo usuário, tópico,
+    `data_pub` e texto), então importar o mesmo arquivo de novo não duplica
+    nada. O texto faz parte da chave porque arquivos com datas sem hora, ou
+    sem os microssegundos, têm várias entradas distintas na mesma `data_pub`.
+    Entradas cujo tópico ou usuário não existe são contadas em `ignoradas`.
+    """
+
+    def __init__(self, lote=1000, using=DEFAULT_DB_ALIAS):
+        self.lote = lote
+        self.using = using
+        self.pendentes = {modelo: [] for modelo in MODELOS}
+        self.importadas = Counter()
+        self.ignoradas = 0
+        self._topicos = {}
+        self._usuarios = {}
+
+    def adicionar(self, modelo, linha):
+        self.pendentes[modelo].append(
+            {campo: _converter(campo, linha.get(campo)) for campo in CAMPOS[modelo]}
+        )
+        if len(self.pendentes[modelo]) >= self.lote:
+            self.gravar()
+
+    def gravar(self):
+        """Grava tudo o que está pendente, respeitando a ordem das FKs"""
+        with transaction.atomic(using=self.using):
+            self._gravar_usuarios(self.pendentes["usuario"])
+            self._gravar_topicos(self.pendentes["topico"])
+            self._gravar_entradas(self.pendentes["entrada"])
+        self.pendentes = {modelo: [] for modelo in MODELOS}
+
+    def _gravar_usuarios(self, linhas):
+        if not linhas:
+            return
+        usuarios = [
+            Usuario(
+                **{campo: valor for campo, valor in linha.items() if valor is not None}
+            )
+            for linha in linhas
+            if linha["username"]
+        ]
+        for usuario in usuarios:
+            if not usuario.password:
+                usuario.set_unusable_password()
+        self.importadas["usuario"] += self._inserir(Usuario, "username", usuarios)
+        self.ignoradas += len(linhas) - len(usuarios)
+
+    def _gravar_topicos(self, linhas):
+        if not linhas:
+            return
+        topicos = [Topico(**linha) for linha in linhas]
+        # os slugs gerados não podem repetir os do próprio lote, que ainda não
+        # estão no banco
+        reservados = {topico.slug for topico in topicos if topico.slug}
+        for topico in topicos:
+            topico.data_pub = topico.data_pub or timezone.now()
+            topico.data_edicao = topico.data_pub
+            if not topico.slug:
+                topico.slug = gerar_slug_unico(topico.topico, reservados)
+                reservados.add(topico.slug)
+        with preservando_datas():
+            self.importadas["topico"] += self._inserir(Topico, "slug", topicos)
+        invalidar(("topicos",), using=self.using)
+
+    def _inserir(self, modelo, campo, objetos):
+        """Insere `objetos` mantendo os que já existem; retorna quantos entraram
+
+        `bulk_create(ignore_conflicts=True)` não diz quais linhas foram
+        ignoradas, então as chaves são contadas antes e depois.
+        """
+        chaves = {getattr(objeto, campo) for objeto in objetos}
+        existentes = modelo.objects.using(self.using).filter(**{f"{campo}__in": chaves})
+        antes = existentes.count()
+        modelo.objects.using(self.using).bulk_create(
+            objetos, batch_size=self.lote, ignore_conflicts=True
+        )
+        return existentes.count() - antes
+
+    def _resolver(self, cache, modelo, campo, chaves):
+        faltando = set(chaves) - cache.keys()
+        if not faltando:
+            return
+        if len(cache) + len(faltando) > _LIMITE_CACHE_CHAVES:
+            cache.clear()
+        cache.update(
+            modelo.objects.using(self.using)
+            .filter(**{f"{campo}__in": faltando})
+            .values_list(campo, "pk")
+        )
+
+    def _gravar_entradas(self, linhas):
+        if not linhas:
+            return
+        slugs = [linha["topico"] for linha in linhas]
+        self._resolver(self._topicos, Topico, "slug", slugs)
+        usernames = [linha["usuario"] for linha in linhas]
+        self._resolver(self._usuarios, Usuario, "username", usernames)
+
+        agora = timezone.now()
+        novas = {}
+        for linha in linhas:
+            topico_id = self._topicos.get(linha["topico"])
+            usuario_id = self._usuarios.get(linha["usuario"])
+            if topico_id is None or usuario_id is None:
+                self.ignoradas += 1
+                continue
+            data_pub = linha["data_pub"] or agora
+            texto = linha["texto_entrada"] or ""
+            # a primeira de duas linhas iguais no mesmo lote é a que fica
+            novas.setdefault(
+                (usuario_id, topico_id, data_pub, texto),
+                Entrada(
+                    topico_id=topico_id,
+                    usuario_id=usuario_id,
+                    texto_entrada=texto,
+                    previa=gerar_previa(texto),
+                    data_pub=data_pub,
+                    data_edicao=linha["data_edicao"] or data_pub,
+                ),
+            )
+        # o texto pode estar comprimido no banco, então é comparado aqui, já
+        # convertido pelo campo, e não no filtro
+        existentes = set(
+            Entrada.objects.using(self.using)
+            .filter(
+                usuario_id__in={chave[0] for chave in novas},
+                topico_id__in={chave[1] for chave in novas},
+                data_pub__in={chave[2] for chave in novas},
+            )
+            .values_list("usuario_id", "topico_id", "data_pub", "texto_entrada")
+        )
+        entradas = [
+            entrada for chave, entrada in novas.items() if chave not in existentes
+        ]
+
+        with preservando_datas():
+            Entrada.objects.using(self.using).bulk_create(
+                entradas, batch_size=self.lote
+            )
+        self.importadas["entrada"] += len(entradas)
+        registrar_criadas(entradas, self.using)
+        somar_entradas(entradas, self.using)
+
+        # `bulk_create()` não dispara os sinais que mantêm contadores e cache
+        por_topico = Counter(entrada.topico_id for entrada in entradas)
+        for topico_id, total in por_topico.items():
+            Topico.objects.using(self.using).filter(pk=topico_id).update(
+                num_entradas=F("num_entradas") + total
+            )
+        invalidar(
+            ("topicos",),
+            *(("topico", topico_id) for topico_id in por_topico),
+            *(("usuario", entrada.usuario_id) for entrada in entradas),
+            using=self.using,
+        )
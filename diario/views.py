@@ -1,76 +1,433 @@
-from django.contrib.auth import login
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Count
+import hashlib
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import login, logout
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.db.models import Count, Max
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.template.response import SimpleTemplateResponse
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
 from django.views import generic
 
+from . import cache, formatacao
+from .atividades import LIMITE_SEGUIDOS, linha_do_tempo, linha_do_tempo_seguidos
+from .instrumentacao import estatisticas_rotas
+from .busca import buscar_entradas
 from .models import Entrada, Topico, Usuario
-from .forms import UsuarioCreationForm
+from .forms import EntradaForm, UsuarioCreationForm
+from .paginacao import paginar_por_cursor
+from .remocao import marcar_usuario
+from .replicas import deve_usar_replica, ler_de_replica
+from .resumos import calcular_estatisticas, consultas_do_perfil
+from .tarefas import estatisticas_tarefas
+
+
+class LeituraEmReplicaMixin:
+    """Faz as leituras da view irem para uma réplica (veja `diario/replicas.py`).
+
+    A resposta é renderizada ainda dentro de `ler_de_replica()`, para que as
+    consultas feitas pelo template também sejam lidas da réplica. O usuário
+    logado é lido antes, do principal: uma réplica atrasada poderia devolver
+    uma conta já desativada ou com a senha antiga. Views que não usam
+    `request.user` podem desligar isso com `resolver_usuario = False`.
+    """
+
+    resolver_usuario = True
+
+    def dispatch(self, request, *args, **kwargs):
+        if not deve_usar_replica(request):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._dispatch_em_replica(request, *args, **kwargs)
+        if self.resolver_usuario:
+            # `request.user` é preguiçoso; sem isso, seria buscado na réplica
+            request.user.is_authenticated
+        with ler_de_replica():
+            resposta = super().dispatch(request, *args, **kwargs)
+            if isinstance(resposta, SimpleTemplateResponse):
+                resposta.render()
+        return resposta
+
+    async def _dispatch_em_replica(self, request, *args, **kwargs):
+        if self.resolver_usuario:
+            request.user = await request.auser()
+        with ler_de_replica():
+            resposta = super().dispatch(request, *args, **kwargs)
+            if inspect.isawaitable(resposta):
+                resposta = await resposta
+        return resposta
+
+
+class CardsEmCacheMixin:
+    """Renderiza os cards da página à parte e guarda o HTML em cache.
+
+    O fragmento só é guardado quando não depende do usuário logado (por padrão,
+    apenas para visitantes anônimos). As consultas ficam em
+    `get_contexto_cards()`, que só é chamado quando o fragmento não está no
+    cache, e a chave depende das versões de `get_escopos_cards()`. Os cards são
+    renderizados em `render_to_response()`, então `get_context_data()` não
+    precisa consultar o banco.
+    """
+
+    template_cards = None
+    nome_cards = None
+    parametros_cards = ("antes", "depois")
+    cards_dependem_do_usuario = True
+
+    def get_escopos_cards(self):
+        raise NotImplementedError
+
+    def get_contexto_cards(self):
+        return {}
+
+    async def aget_contexto_cards(self):
+        return {}
+
+    def usar_cache_cards(self):
+        return settings.DIARIO_CACHE_FRAGMENTOS and not (
+            self.cards_dependem_do_usuario and self.request.user.is_authenticated
+        )
+
+    def buscar_cards(self):
+        """Retorna `(chave, html)` do cache, ou `(None, None)` se não usar cache"""
+        if not self.usar_cache_cards():
+            return None, None
+
+        return cache.buscar_fragmento(
+            self.nome_cards, self.get_escopos_cards(), self.get_variacao_cards()
+        )
+
+    async def abuscar_cards(self):
+        if not self.usar_cache_cards():
+            return None, None
+
+        return await cache.abuscar_fragmento(
+            self.nome_cards, self.get_escopos_cards(), self.get_variacao_cards()
+        )
+
+    def get_variacao_cards(self):
+        return "&".join(
+            f"{nome}={self.request.GET.get(nome, '')}" for nome in self.parametros_cards
+        )
+
+    def _gerar_cards(self, chave, context):
+        fragmento = render_to_string(self.template_cards, context, request=self.request)
+        if chave is not None:
+            cache.guardar_fragmento(chave, fragmento)
+        return fragmento
+
+    def renderizar_cards(self, context):
+        chave, fragmento = self.buscar_cards()
+        if fragmento is None:
+            context.update(self.get_contexto_cards())
+            fragmento = self._gerar_cards(chave, context)
+        return mark_safe(fragmento)
+
+    async def arenderizar_cards(self, context):
+        chave, fragmento = await self.abuscar_cards()
+        if fragmento is None:
+            context.update(await self.aget_contexto_cards())
+            # as tags de `diario.templatetags.cards` usam o cache síncrono
+            fragmento = await sync_to_async(self._gerar_cards)(chave, context)
+        return mark_safe(fragmento)
+
+    def render_to_response(self, context, **response_kwargs):
+        if "cards" not in context:
+            context["cards"] = self.renderizar_cards(context)
+        return super().render_to_response(context, **response_kwargs)
+
+
+def _mais_recente(*datas):
+    return max((data for data in datas if data is not None), default=None)
+
+
+class GetCondicionalMixin:
+    """Responde `304 Not Modified` antes de fazer as consultas da página.
+
+    `get_validadores()` deve ser barato e retornar a data da última edição e
+    o total de entradas mostradas. A última edição é a mais recente de tudo
+    que aparece na página: as entradas, o tópico e os autores (ex.: renomear
+    um tópico ou um usuário). Com elas, o usuário e a query string, é montado
+    o ETag; a data da última edição vira o Last-Modified. Como apagar uma
+    entrada (ou esconder as de um usuário apagado) não muda a última edição,
+    só o ETag percebe remoções, e por isso ele tem prioridade sobre o
+    `If-Modified-Since`.
+    """
+
+    def get_validadores(self):
+        raise NotImplementedError
+
+    def get_etag(self, ultima_edicao, total):
+        usuario = self.request.user
+        partes = [
+            ultima_edicao.isoformat() if ultima_edicao else "",
+            str(total),
+            str(usuario.pk) if usuario.is_authenticated else "anonimo",
+            self.request.GET.urlencode(),
+        ]
+        if usuario.is_authenticated:
+            # a página traz o token CSRF, que muda a cada login
+            partes.append(self.request.session.session_key or "")
+        resumo = hashlib.md5("|".join(partes).encode(), usedforsecurity=False)
+        return quote_etag(resumo.hexdigest())
+
+    def verificar_condicional(self, ultima_edicao, total):
+        """Guarda os validadores e retorna a resposta 304/412, se for o caso"""
+        self.etag = self.get_etag(ultima_edicao, total)
+        self.last_modified = (
+            int(ultima_edicao.timestamp()) if ultima_edicao else None
+        )
+        return get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+
+    def completar_cabecalhos(self, resposta):
+        resposta.headers.setdefault("ETag", self.etag)
+        if self.last_modified is not None:
+            resposta.headers.setdefault("Last-Modified", http_date(self.last_modified))
+        # páginas de usuários logados têm dados pessoais e o token CSRF
+        publica = not self.request.user.is_authenticated
+        patch_cache_control(resposta, no_cache=True, public=publica, private=not publica)
+        patch_vary_headers(resposta, ["Cookie"])
+        return resposta
+
+    def get(self, request, *args, **kwargs):
+        resposta = self.verificar_condicional(*self.get_validadores())
+        if resposta is None:
+            resposta = super().get(request, *args, **kwargs)
+        return self.completar_cabecalhos(resposta)
 
 
 class IndexView(generic.TemplateView):
     template_name = "index.html"
 
 
-class TopicoList(generic.ListView):
+class TopicoList(LeituraEmReplicaMixin, CardsEmCacheMixin, generic.ListView):
     model = Topico
     template_name = "topicos.html"
     context_object_name = "topicos"
+    template_cards = "includes/cards_topicos.html"
+    nome_cards = "topicos"
+    parametros_cards = ()
+    cards_dependem_do_usuario = False
 
     def get_queryset(self):
-        topicos = Topico.objects.annotate(num_entradas=Count("entrada")).order_by("-data_pub")
+        topicos = Topico.objects.visiveis().order_by("-data_pub")
         return topicos
 
+    def get_escopos_cards(self):
+        return [("topicos",)]
 
-class EntradaList(generic.ListView):
+
+class EntradaList(
+    LeituraEmReplicaMixin, GetCondicionalMixin, CardsEmCacheMixin, generic.ListView
+):
     model = Entrada
     template_name = "entradas.html"
     context_object_name = "entradas"
+    template_cards = "includes/cards_entradas.html"
+    nome_cards = "entradas"
+    entradas_por_pagina = 24
+
+    def get_topico(self):
+        if not hasattr(self, "topico"):
+            topicos = Topico.objects.visiveis()
+            self.topico = get_object_or_404(topicos, slug=self.kwargs["topico"])
+        return self.topico
+
+    def get_agregados_validadores(self):
+        # os cards mostram o nome de cada autor
+        return {
+            "ultima_edicao": Max("data_edicao"),
+            "autores": Max("usuario__data_edicao"),
+            "total": Count("pk"),
+        }
+
+    def validadores_de(self, dados):
+        ultima_edicao = _mais_recente(
+            dados["ultima_edicao"], dados["autores"], self.topico.data_edicao
+        )
+        return ultima_edicao, dados["total"]
+
+    def get_validadores(self):
+        dados = self.get_topico().entrada_set.visiveis().aggregate(
+            **self.get_agregados_validadores()
+        )
+        return self.validadores_de(dados)
 
     def get_queryset(self):
-        topico = get_object_or_404(Topico, slug=self.kwargs["topico"])
-        entradas = Entrada.objects.filter(topico=topico).order_by("-data_pub")
+        self.topico = self.get_topico()
+        # o related manager já associa `self.topico` a cada entrada, evitando
+        # uma consulta extra por card em `get_absolute_url()`; os cards só
+        # mostram a prévia, então o texto inteiro não é lido
+        entradas = (
+            self.topico.entrada_set.visiveis()
+            .select_related("usuario")
+            .defer("texto_entrada", "texto_html")
+            .order_by("-data_pub", "-pk")
+        )
         return entradas
 
+    def get_escopos_cards(self):
+        return [("topico", self.topico.pk)]
+
+    def get_contexto_cards(self):
+        pagina = paginar_por_cursor(
+            self.object_list, self.request.GET, self.entradas_por_pagina
+        )
+        return {"entradas": pagina.objetos, "pagina": pagina}
+
     def get_context_data(self, *, object_list=None, **kwargs):
-        context = super().get_context_data()
-        t = get_object_or_404(Topico, slug=self.kwargs["topico"])
-        context["nome_topico"] = t.topico
+        context = super().get_context_data(**kwargs)
+        context["nome_topico"] = self.topico.topico
         context["topico"] = self.kwargs["topico"]
         return context
 
 
+class BuscaEntradas(generic.TemplateView):
+    """Busca nas entradas de todos os tópicos ou de um tópico específico"""
+
+    template_name = "busca.html"
+    resultados_por_pagina = 20
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        topico = None
+        if "topico" in self.kwargs:
+            topico = get_object_or_404(
+                Topico.objects.visiveis(), slug=self.kwargs["topico"]
+            )
+        termos = self.request.GET.get("q", "").strip()
+
+        context["topico"] = topico
+        context["termos"] = termos
+        context["resultados"] = buscar_entradas(
+            termos,
+            topico=topico,
+            cursor=self.request.GET.get("cursor"),
+            por_pagina=self.resultados_por_pagina,
+        )
+        return context
+
+
+class Atividades(LeituraEmReplicaMixin, generic.TemplateView):
+    """Entradas criadas e editadas em todo o diário, da mais recente para trás"""
+
+    template_name = "atividades.html"
+
+    def get_pagina(self):
+        return linha_do_tempo(self.request.GET)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        pagina = self.get_pagina()
+        context["pagina"] = pagina
+        context["atividades"] = pagina.objetos
+        context["entradas"] = [atividade.entrada for atividade in pagina]
+        return context
+
+
+class AtividadesSeguidas(LoginRequiredMixin, Atividades):
+    """A linha do tempo só dos tópicos que o usuário segue"""
+
+    def get_pagina(self):
+        self.seguidos = list(
+            self.request.user.topicos_seguidos.visiveis().order_by("topico")
+        )
+        return linha_do_tempo_seguidos(
+            [topico.pk for topico in self.seguidos], self.request.GET
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["seguidos"] = self.seguidos
+        return context
+
+
+class SeguirTopico(LoginRequiredMixin, generic.View):
+    """Passa a seguir o tópico, ou deixa de seguir com `acao=deixar`"""
+
+    def post(self, request, *args, **kwargs):
+        topico = get_object_or_404(Topico.objects.visiveis(), slug=kwargs["topico"])
+        seguidos = request.user.topicos_seguidos
+        if request.POST.get("acao") == "deixar":
+            seguidos.remove(topico)
+        elif seguidos.count() >= LIMITE_SEGUIDOS:
+            messages.error(
+                request, f"Não é possível seguir mais de {LIMITE_SEGUIDOS} tópicos."
+            )
+        else:
+            seguidos.add(topico)
+        return redirect("atividades_seguidas")
+
+
 class EntradaCreate(LoginRequiredMixin, generic.CreateView):
     model = Entrada
-    fields = ["texto_entrada"]
+    form_class = EntradaForm
     template_name = "criar_entrada.html"
 
     def get_success_url(self):
         return reverse_lazy("entradas", kwargs={"topico": self.kwargs["topico"]})
 
     def form_valid(self, form):
-        entrada = form.save(commit=False)
-        topico = Topico.objects.get(slug=self.kwargs["topico"])
-        entrada.topico = topico
-        entrada.usuario = self.request.user
-        entrada.save()
+        # `super().form_valid()` grava a entrada; salvá-la aqui antes faria
+        # uma segunda gravação, registrada como edição
+        form.instance.topico = get_object_or_404(
+            Topico.objects.visiveis(), slug=self.kwargs["topico"]
+        )
+        form.instance.usuario = self.request.user
         return super().form_valid(form)
 
 
-class EntradaDetail(LoginRequiredMixin, generic.DetailView):
+class EntradaDetail(
+    LoginRequiredMixin, LeituraEmReplicaMixin, GetCondicionalMixin, generic.DetailView
+):
     model = Entrada
     template_name = "ver_entrada.html"
     context_object_name = "entrada"
 
     def get_object(self, queryset=None):
-        return get_object_or_404(Entrada, pk=self.kwargs["pk"])
+        if not hasattr(self, "entrada"):
+            entradas = Entrada.objects.visiveis().select_related("usuario", "topico")
+            self.entrada = get_object_or_404(entradas, pk=self.kwargs["pk"])
+        return self.entrada
+
+    def get_validadores(self):
+        entrada = self.get_object()
+        ultima_edicao = _mais_recente(
+            entrada.data_edicao, entrada.topico.data_edicao, entrada.usuario.data_edicao
+        )
+        return ultima_edicao, 1
+
+    def get_etag(self, ultima_edicao, total):
+        # o HTML muda com a versão do renderizador, mesmo sem edição
+        etag = super().get_etag(ultima_edicao, total).strip('"')
+        return quote_etag(f"{etag}-md{formatacao.VERSAO}")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if "texto_html" not in context:
+            context["texto_html"] = formatacao.html_da_entrada(self.object)
+        return context
 
 
 class EntradaUpdate(LoginRequiredMixin, generic.UpdateView):
     model = Entrada
     template_name = "editar_entrada.html"
-    fields = ["texto_entrada"]
+    form_class = EntradaForm
 
     def get_success_url(self):
         return reverse_lazy("entradas", kwargs={"topico": self.kwargs["topico"]})
@@ -103,6 +460,12 @@ class UsuarioDelete(LoginRequiredMixin, generic.DeleteView):
     def get_object(self, queryset=None):
         return self.request.user
 
+    def form_valid(self, form):
+        # as entradas são removidas aos poucos por `purgar_removidos`
+        marcar_usuario(self.object)
+        logout(self.request)
+        return redirect(self.get_success_url())
+
 
 class UsuarioConfirmarDelete(LoginRequiredMixin, generic.DeleteView):
     template_name = 'accounts/confirmar.html'
@@ -113,18 +476,100 @@ class UsuarioConfirmarDelete(LoginRequiredMixin, generic.DeleteView):
         return context
 
 
-class Perfil(generic.DetailView):
+class Perfil(
+    LeituraEmReplicaMixin, GetCondicionalMixin, CardsEmCacheMixin, generic.DetailView
+):
     template_name = "accounts/perfil.html"
     model = Usuario
     context_object_name = "usuario"
+    template_cards = "includes/cards_perfil.html"
+    nome_cards = "perfil"
+    entradas_por_pagina = 24
 
     def get_object(self, queryset=None):
-        username = self.kwargs["username"]
-        usuario = get_object_or_404(Usuario, username=username)
-        return usuario
-
-    def get_context_data(self, **kwargs):
-        usuario = self.get_object()
-        context = super().get_context_data(**kwargs)
-        context["entradas"] = usuario.entradas.filter()
-        return context
\ No newline at end of file
+        if not hasattr(self, "usuario"):
+            username = self.kwargs["username"]
+            self.usuario = get_object_or_404(
+                Usuario.objects.visiveis(), username=username
+            )
+        return self.usuario
+
+    def get_agregados_validadores(self):
+        # as entradas mostram o nome do tópico
+        return {
+            "ultima_edicao": Max("data_edicao"),
+            "topicos": Max("topico__data_edicao"),
+            "total": Count("pk"),
+        }
+
+    def validadores_de(self, dados):
+        ultima_edicao = _mais_recente(
+            dados["ultima_edicao"], dados["topicos"], self.usuario.data_edicao
+        )
+        return ultima_edicao, dados["total"]
+
+    def get_validadores(self):
+        dados = self.get_object().entradas.visiveis().aggregate(
+            **self.get_agregados_validadores()
+        )
+        return self.validadores_de(dados)
+
+    def get_etag(self, ultima_edicao, total):
+        # a sequência e os últimos dias das estatísticas mudam com a data
+        etag = super().get_etag(ultima_edicao, total).strip('"')
+        return quote_etag(f"{etag}-{timezone.localdate():%Y%m%d}")
+
+    def get_escopos_cards(self):
+        return [("usuario", self.object.pk)]
+
+    def get_variacao_cards(self):
+        return f"{super().get_variacao_cards()}&hoje={timezone.localdate()}"
+
+    def mostrar_estatisticas(self):
+        """As estatísticas só aparecem na primeira página de entradas"""
+        return not any(self.request.GET.get(nome) for nome in self.parametros_cards)
+
+    def get_contexto_cards(self):
+        contexto = {}
+        if self.mostrar_estatisticas():
+            contexto["estatisticas"] = calcular_estatisticas(
+                *consultas_do_perfil(self.object)
+            )
+        pagina = paginar_por_cursor(
+            self.object.entradas.visiveis()
+            .select_related("topico")
+            .defer("texto_entrada", "texto_html"),
+            self.request.GET,
+            self.entradas_por_pagina,
+        )
+        return {**contexto, "entradas": pagina.objetos, "pagina": pagina}
+
+
+class EstatisticasCache(UserPassesTestMixin, generic.View):
+    """Acertos e falhas do cache de fragmentos, para monitoramento"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(cache.estatisticas())
+
+
+class EstatisticasRotas(UserPassesTestMixin, generic.View):
+    """Histogramas de tempo e consultas por rota, de `InstrumentacaoMiddleware`"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(estatisticas_rotas())
+
+
+class EstatisticasTarefas(UserPassesTestMixin, generic.View):
+    """Tamanho da fila e tempos de espera e execução das tarefas em segundo plano"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(estatisticas_tarefas())
@@ -0,0 +1,123 @@
+"""Versões assíncronas das views de leitura, para quando o projeto roda via ASGI.
+
+Cada classe herda da view de mesmo nome em `diario.views`, então usa os mesmos
+templates, o mesmo contexto e o mesmo cache de fragmentos, mas faz as
+consultas com o ORM assíncrono. Assim uma requisição esperando o banco não
+ocupa uma das threads de `sync_to_async`. `config/urls.py` escolhe entre os
+dois módulos pela configuração `DIARIO_VIEWS_ASYNC`.
+"""
+
+import inspect
+
+from django.shortcuts import aget_object_or_404
+
+from . import formatacao, views
+from .models import Entrada, Topico, Usuario
+from .paginacao import apaginar_por_cursor
+from .resumos import calcular_estatisticas, consultas_do_perfil
+
+
+class LeituraAsyncMixin:
+    """Resolve `request.user` sem bloquear e renderiza a resposta na hora.
+
+    Depois de `auser()`, os mixins síncronos (ex.: `LoginRequiredMixin`) podem
+    consultar `request.user` sem tocar no banco. A resposta é renderizada
+    dentro da view porque, se ficasse para o handler, ele a renderizaria em
+    uma thread à parte.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        resposta = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(resposta):
+            resposta = await resposta
+        return resposta
+
+    def responder(self, context):
+        resposta = self.render_to_response(context)
+        resposta.render()
+        return resposta
+
+
+class TopicoList(LeituraAsyncMixin, views.TopicoList):
+    async def aget_contexto_cards(self):
+        return {"topicos": [topico async for topico in self.object_list]}
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        context = self.get_context_data()
+        context["cards"] = await self.arenderizar_cards(context)
+        return self.responder(context)
+
+
+class EntradaList(LeituraAsyncMixin, views.EntradaList):
+    async def get(self, request, *args, **kwargs):
+        self.topico = await aget_object_or_404(
+            Topico.objects.visiveis(), slug=self.kwargs["topico"]
+        )
+        dados = await self.topico.entrada_set.visiveis().aaggregate(
+            **self.get_agregados_validadores()
+        )
+        resposta = self.verificar_condicional(*self.validadores_de(dados))
+        if resposta is None:
+            self.object_list = self.get_queryset()
+            context = self.get_context_data()
+            context["cards"] = await self.arenderizar_cards(context)
+            resposta = self.responder(context)
+        return self.completar_cabecalhos(resposta)
+
+    async def aget_contexto_cards(self):
+        pagina = await apaginar_por_cursor(
+            self.object_list, self.request.GET, self.entradas_por_pagina
+        )
+        return {"entradas": pagina.objetos, "pagina": pagina}
+
+
+class EntradaDetail(LeituraAsyncMixin, views.EntradaDetail):
+    async def get(self, request, *args, **kwargs):
+        entradas = Entrada.objects.visiveis().select_related("usuario", "topico")
+        self.entrada = await aget_object_or_404(entradas, pk=self.kwargs["pk"])
+        # com `self.entrada` já buscada, os validadores não consultam o banco
+        resposta = self.verificar_condicional(*self.get_validadores())
+        if resposta is None:
+            self.object = self.entrada
+            context = self.get_context_data(
+                object=self.object,
+                texto_html=await formatacao.ahtml_da_entrada(self.entrada),
+            )
+            resposta = self.responder(context)
+        return self.completar_cabecalhos(resposta)
+
+
+class Perfil(LeituraAsyncMixin, views.Perfil):
+    async def get(self, request, *args, **kwargs):
+        self.usuario = await aget_object_or_404(
+            Usuario.objects.visiveis(), username=self.kwargs["username"]
+        )
+        dados = await self.usuario.entradas.visiveis().aaggregate(
+            **self.get_agregados_validadores()
+        )
+        resposta = self.verificar_condicional(*self.validadores_de(dados))
+        if resposta is None:
+            self.object = self.usuario
+            context = self.get_context_data(object=self.object)
+            context["cards"] = await self.arenderizar_cards(context)
+            resposta = self.responder(context)
+        return self.completar_cabecalhos(resposta)
+
+    async def aget_contexto_cards(self):
+        contexto = {}
+        if self.mostrar_estatisticas():
+            por_dia, topicos = consultas_do_perfil(self.object)
+            contexto["estatisticas"] = calcular_estatisticas(
+                [linha async for linha in por_dia],
+                [linha async for linha in topicos],
+            )
+        pagina = await apaginar_por_cursor(
+            self.object.entradas.visiveis()
+            .select_related("topico")
+            .defer("texto_entrada", "texto_html"),
+            self.request.GET,
+            self.entradas_por_pagina,
+        )
+        return {**contexto, "entradas": pagina.objetos, "pagina": pagina}